@@ -22,11 +22,15 @@ import io_scene_g3d
 
 if "bpy" in locals():
     import importlib
-    if "g3d_exporter" in locals():
+    importlib.reload(io_scene_g3d.g3d_operators)
+    if hasattr(io_scene_g3d, "g3d_exporter"):
         importlib.reload(io_scene_g3d.g3d_exporter)
 
+import os
+import sys
+
 import bpy
-from .g3d_exporter import G3DJExporterOperator, G3DBExporterOperator
+from .g3d_operators import G3DJExporterOperator, G3DBExporterOperator
 
 bl_info = {
     "name": "LibGDX G3D Exporter",
@@ -39,11 +43,16 @@ bl_info = {
     "wiki_url": "https://github.com/Dancovich/libgdx_blender_g3d_exporter/wiki",
     "category": "Import-Export"}
 
-try:
-    import pydevd
-    pydevd.settrace(stdoutToServer=True, stderrToServer=True, suspend=False)
-except ImportError:
-    pass
+# Set to attach the PyDev debugger when the add-on is enabled
+DEBUGGER_ENVIRONMENT_VARIABLE = "IO_SCENE_G3D_PYDEVD"
+
+
+def attachDebugger():
+    try:
+        import pydevd
+        pydevd.settrace(stdoutToServer=True, stderrToServer=True, suspend=False)
+    except ImportError:
+        print("%s is set but pydevd can't be imported" % DEBUGGER_ENVIRONMENT_VARIABLE)
 
 
 class Mesh(object):
@@ -61,11 +70,24 @@ def menu_func(self, context):
 
 
 def register():
+    if os.environ.get(DEBUGGER_ENVIRONMENT_VARIABLE):
+        attachDebugger()
+
+    # Only the operators are loaded here, the exporter loads and registers its handlers on the first export
     bpy.utils.register_module(__name__)
     bpy.types.INFO_MT_file_export.append(menu_func)
 
 
 def unregister():
+    # Handlers of modules the exporter loaded
+    watchMode = sys.modules.get(__name__ + ".watch_mode")
+    if watchMode is not None:
+        watchMode.unregisterHandlers()
+
+    exportCache = sys.modules.get(__name__ + ".export_cache")
+    if exportCache is not None:
+        exportCache.unregisterHandlers()
+
     bpy.utils.unregister_module(__name__)
     bpy.types.INFO_MT_file_export.remove(menu_func)
 
@@ -18,11 +18,12 @@
 
 # <pep8 compliant>
 
+import hashlib
 import math
+from array import array
 
 from io_scene_g3d import util
 from io_scene_g3d.util import Util, ROUND_STRING
-from io_scene_g3d.profile import profile
 
 
 class Vertex(object):
@@ -82,7 +83,12 @@ class Vertex(object):
         if self._attributes is not None:
             self._attributes.sort(key=util.attributeSort)
 
-    @profile('hashVertex')
+    def __getstate__(self):
+        # String hashes change between Python sessions, so the cached hash isn't pickled
+        state = self.__dict__.copy()
+        state.pop("_hashCache", None)
+        return state
+
     def __hash__(self):
         if self._hashCache is None or self._hashCache == 0:
             self._hashCache = 0
@@ -96,7 +102,6 @@ class Vertex(object):
                         self._hashCache = 31 * self._hashCache + hash(attr)
         return self._hashCache
 
-    @profile('eqVertex')
     def __eq__(self, another):
         if another is None or not isinstance(another, Vertex):
             raise TypeError("'another' must be a Vertex")
@@ -193,7 +198,6 @@ class VertexAttribute(object):
         self._value = value
         self._hashCache = None
 
-    @profile('hashVertexAttribute')
     def __hash__(self):
         if self._hashCache is None or self._hashCache == 0:
             self._hashCache = 0
@@ -208,7 +212,6 @@ class VertexAttribute(object):
 
         return self._hashCache
 
-    @profile('eqVertexAttribute')
     def __eq__(self, another):
         """Compare this attribute with another for value"""
         if another is None or not isinstance(another, VertexAttribute):
@@ -246,6 +249,11 @@ class VertexAttribute(object):
     def __ne__(self, another):
         return not self.__eq__(another)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_hashCache", None)
+        return state
+
     def __repr__(self):
         value = "{!s} {{{!r}}}".format(self.name, self.value)
         return value
@@ -404,6 +412,11 @@ class NodePart(object):
 
         self._bones.append(bone)
 
+    def setBones(self, bones):
+        self._bones = None
+        for bone in bones:
+            self.addBone(bone)
+
     @property
     def bones(self):
         return self._bones
@@ -473,12 +486,20 @@ class Mesh(object):
     # This stores positions of each vertex on the _vertices attribute, so searches are faster
     _vertexIndex = None
 
+    # Once packed, name and number of floats of each attribute in the order they
+    # are interleaved, and the vertex buffer with all vertices. The vertex objects are dropped.
+    _layout = None
+
+    _buffer = None
+
     def __init__(self):
         self._id = ""
         self._vertices = []
         self._parts = []
         self._attributes = []
         self._vertexIndex = {}
+        self._layout = None
+        self._buffer = None
 
     @property
     def id(self):
@@ -490,11 +511,41 @@ class Mesh(object):
 
     @property
     def vertices(self):
+        """Vertex objects of this mesh, None once it's packed"""
         return self._vertices
 
     def getAttributes(self):
         return self._attributes
 
+    @property
+    def packed(self):
+        return self._buffer is not None
+
+    @property
+    def layout(self):
+        return self._layout
+
+    @property
+    def buffer(self):
+        """Interleaved float32 values of all vertices, None until the mesh is packed"""
+        return self._buffer
+
+    @property
+    def vertexSize(self):
+        """Number of floats of each vertex"""
+        if self._layout is not None:
+            return sum(size for _, size in self._layout)
+        if len(self._vertices) > 0:
+            return sum(len(attr.value) for attr in self._vertices[0].attributes)
+        return 0
+
+    @property
+    def vertexCount(self):
+        if self._buffer is not None:
+            vertexSize = self.vertexSize
+            return len(self._buffer) // vertexSize if vertexSize > 0 else 0
+        return len(self._vertices)
+
     def getVertexIndex(self, vertex):
         if vertex is None or not isinstance(vertex, Vertex):
             raise TypeError("'vertex' must be of type Vertex")
@@ -559,6 +610,37 @@ class Mesh(object):
             return foundVertex
         """
 
+    def computeContentHash(self):
+        """
+        Returns a digest of the vertex and index buffers of this mesh. Meshes with
+        the same digest export the same data, whatever their ids are.
+        """
+        digest = hashlib.sha1()
+        digest.update(",".join(self._attributes).encode("utf-8"))
+
+        for vertex in self._vertices:
+            for attr in vertex.attributes:
+                digest.update(("%s=%s;" % (attr.name, ",".join(Util.floatListToString(attr.value)))).encode("utf-8"))
+
+        for part in self._parts:
+            digest.update(("|%s:" % part.type).encode("utf-8"))
+            digest.update(",".join(str(index) for index in part.getIndices()).encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def reorderVertices(self, order):
+        """
+        Rearranges the vertices of this mesh. 'order' has, for each new position,
+        the current position of the vertex that goes there.
+        """
+        if len(order) != len(self._vertices):
+            raise ValueError("'order' must have one entry per vertex")
+
+        self._vertices = [self._vertices[oldPosition] for oldPosition in order]
+        self._vertexIndex = {}
+        for position, vertex in enumerate(self._vertices):
+            self._vertexIndex[hash(vertex)] = position
+
     @property
     def parts(self):
         return self._parts
@@ -570,6 +652,103 @@ class Mesh(object):
         self._parts.append(meshPart)
         meshPart.parentMesh = self
 
+    def replacePart(self, meshPart, newParts):
+        """Replaces a part of this mesh by a list of parts, in the same position"""
+        position = self._parts.index(meshPart)
+        self._parts[position:position + 1] = newParts
+        for newPart in newParts:
+            newPart.parentMesh = self
+
+    def reindexVertices(self):
+        """
+        Updates this mesh after attributes of its vertices changed. Vertices that became
+        equal are merged and the attribute name cache is rebuilt.
+        """
+        uniqueVertices = {}
+        for part in self._parts:
+            if part.vertices is not None:
+                for position, vertex in enumerate(part.vertices):
+                    part.vertices[position] = uniqueVertices.setdefault(hash(vertex), vertex)
+
+        oldVertices = self._vertices
+        self._vertices = []
+        self._vertexIndex = {}
+        self._attributes = []
+        for vertex in oldVertices:
+            self.addVertex(uniqueVertices.setdefault(hash(vertex), vertex))
+
+    def removeUnusedVertices(self):
+        """Removes vertices not referenced by any part"""
+        usedVertices = set()
+        for part in self._parts:
+            if part.vertices is not None:
+                usedVertices.update(id(vertex) for vertex in part.vertices)
+
+        if len(usedVertices) == len(self._vertices):
+            return
+
+        self._vertices = [vertex for vertex in self._vertices if id(vertex) in usedVertices]
+        self._vertexIndex = {}
+        for position, vertex in enumerate(self._vertices):
+            self._vertexIndex[hash(vertex)] = position
+
+    def pack(self):
+        """
+        Moves the vertices of this mesh to one interleaved float32 buffer, laid out as
+        the attribute name cache, and the vertices of its parts to index arrays.
+        Values are rounded as the writers did. The vertex objects are dropped, so
+        passes working on them must run before.
+        """
+        if self._buffer is not None:
+            return
+
+        attributeSizes = {}
+        for vertex in self._vertices:
+            for attr in vertex.attributes:
+                attributeSizes.setdefault(attr.name, len(attr.value))
+            if len(attributeSizes) == len(self._attributes):
+                break
+
+        layout = [(name, attributeSizes.get(name, 0)) for name in self._attributes]
+        names = [name for name, _ in layout]
+        missingValues = dict((name, [0.0] * size) for name, size in layout)
+
+        buffer = array('f')
+        for vertex in self._vertices:
+            attributes = vertex.attributes
+            if len(attributes) == len(names) and all(attr.name == name for attr, name in zip(attributes, names)):
+                for attr in attributes:
+                    buffer.extend(Util.limitFloatListPrecision(attr.value))
+            else:
+                # Values go to the slots of the layout, whatever order the vertex has them in
+                values = dict((attr.name, attr.value) for attr in attributes)
+                for name in names:
+                    buffer.extend(Util.limitFloatListPrecision(values.get(name, missingValues[name])))
+
+        for part in self._parts:
+            part.packIndices(len(self._vertices))
+
+        self._layout = layout
+        self._buffer = buffer
+        self._vertices = None
+        self._vertexIndex = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_vertexIndex", None)
+        return state
+
+    def __setstate__(self, state):
+        # Vertex hashes aren't stable between Python sessions, so the index is rebuilt
+        self.__dict__.update(state)
+        if self._vertices is None:
+            self._vertexIndex = None
+            return
+
+        self._vertexIndex = {}
+        for position, vertex in enumerate(self._vertices):
+            self._vertexIndex[hash(vertex)] = position
+
     def normalizeAttributes(self):
         """
         Makes sure all vertices have the same number of attributes.
@@ -619,6 +798,9 @@ class Mesh(object):
                 vertex.add(newAttribute)
 
     def __repr__(self):
+        if self._buffer is not None:
+            return "LAYOUT:\n{!r}\n\nVERTICES: {:d}\n\nPARTS:\n{!r}\n\n".format(self._layout, self.vertexCount, self._parts)
+
         value = "VERTICES:\n{!r}\n\nPARTS:\n{!r}\n\n".format(self._vertices, self._parts)
         return value
 
@@ -634,11 +816,15 @@ class MeshPart(object):
 
     _parentMesh = None
 
+    # Positions of the vertices of this part in the parent mesh, once the mesh is packed
+    _indices = None
+
     def __init__(self, meshPartId="", meshType="TRIANGLES", vertices=None, parentMesh=None):
         self._id = meshPartId
         self._type = meshType
         self._vertices = vertices
         self._parentMesh = parentMesh
+        self._indices = None
 
     @property
     def id(self):
@@ -678,12 +864,44 @@ class MeshPart(object):
 
     @property
     def vertices(self):
+        """Vertex objects of this part, None once its mesh is packed"""
         return self._vertices
 
+    @property
+    def indices(self):
+        """Index array of this part, None until its mesh is packed"""
+        return self._indices
+
+    def getIndices(self):
+        """Returns the position of each vertex of this part in the parent mesh"""
+        if self._indices is not None:
+            return self._indices.tolist()
+
+        if self._vertices is None:
+            return []
+
+        return [self._parentMesh.getVertexIndex(vertex) for vertex in self._vertices]
+
+    def setIndices(self, indices):
+        """Replaces the vertices of this part by the parent mesh vertices at the given positions"""
+        if self._indices is not None:
+            self._indices = array(self._indices.typecode, indices)
+            return
+
+        meshVertices = self._parentMesh.vertices
+        self._vertices = [meshVertices[index] for index in indices]
+
+    def packIndices(self, vertexCount):
+        """Moves the vertices of this part to an index array, of shorts if 'vertexCount' vertices fit in them"""
+        self._indices = array('H' if vertexCount <= 65536 else 'I', self.getIndices())
+        self._vertices = None
+
     def __repr__(self):
         reprStr = "{{\n    ID: {!s}\n    TYPE: {!s}\n".format(self.id, self.type)
 
-        if self.parentMesh is not None and self._vertices is not None:
+        if self._indices is not None:
+            reprStr = reprStr + ("    TOTAL INDICES: {:d}\n".format(len(self._indices)))
+        elif self.parentMesh is not None and self._vertices is not None:
             reprStr = reprStr + ("    TOTAL INDICES: {:d}\n    VERTICES:\n    [".format(len(self._vertices)))
             for ver in self._vertices:
                 reprStr = reprStr + ("        {!r}\n".format(ver))
@@ -837,14 +1055,43 @@ class Animation(object):
 
 
 class NodeAnimation(object):
+    """
+    Keyframes of a bone. Keytimes and the translation, rotation and scale of each keyframe
+    are stored one after another in float arrays, with a mask per transform telling which
+    keyframes set it. Transforms a keyframe doesn't set hold rest values, never exported.
+    """
 
     _boneId = ""
 
-    _keyframes = None
+    _keytimes = None
+
+    _translations = None
+
+    _rotations = None
+
+    _scales = None
+
+    _translationMask = None
+
+    _rotationMask = None
+
+    _scaleMask = None
+
+    _REST_TRANSLATION = (0.0, 0.0, 0.0)
+
+    _REST_ROTATION = (1.0, 0.0, 0.0, 0.0)
+
+    _REST_SCALE = (1.0, 1.0, 1.0)
 
     def __init__(self):
         self._boneId = ""
-        self._keyframes = None
+        self._keytimes = array('d')
+        self._translations = array('d')
+        self._rotations = array('d')
+        self._scales = array('d')
+        self._translationMask = bytearray()
+        self._rotationMask = bytearray()
+        self._scaleMask = bytearray()
 
     @property
     def boneId(self):
@@ -855,72 +1102,74 @@ class NodeAnimation(object):
         self._boneId = boneId
 
     @property
-    def keyframes(self):
-        return self._keyframes
-
-    @keyframes.setter
-    def keyframes(self, keyframes):
-        if keyframes is None or not isinstance(keyframes, list):
-            raise TypeError("'keyframes' must be of type list")
+    def keyframeCount(self):
+        return len(self._keytimes)
 
-        self._keyframes = keyframes
-
-    def addKeyframe(self, keyframe):
-        if keyframe is None or not isinstance(keyframe, Keyframe):
-            raise TypeError("'keyframe' must be of type Keyframe")
-
-        if self._keyframes is None:
-            self._keyframes = []
-
-        self._keyframes.append(keyframe)
+    @property
+    def keytimes(self):
+        return self._keytimes
 
+    @property
+    def translations(self):
+        """Three floats per keyframe"""
+        return self._translations
 
-class Keyframe(object):
-    _keytime = 0.0
+    @translations.setter
+    def translations(self, translations):
+        self._checkTrack(translations, 3)
+        self._translations = translations
 
-    _translation = None
+    @property
+    def rotations(self):
+        """Four floats per keyframe"""
+        return self._rotations
 
-    _rotation = None
+    @rotations.setter
+    def rotations(self, rotations):
+        self._checkTrack(rotations, 4)
+        self._rotations = rotations
 
-    _scale = None
+    @property
+    def scales(self):
+        """Three floats per keyframe"""
+        return self._scales
 
-    def __init__(self):
-        self._keytime = 0.0
-        self._rotation = None
-        self._translation = None
-        self._scale = None
+    @scales.setter
+    def scales(self, scales):
+        self._checkTrack(scales, 3)
+        self._scales = scales
 
     @property
-    def keytime(self):
-        return self._keytime
+    def translationMask(self):
+        return self._translationMask
 
-    @keytime.setter
-    def keytime(self, keytime):
-        self._keytime = keytime
+    @property
+    def rotationMask(self):
+        return self._rotationMask
 
     @property
-    def rotation(self):
-        return self._rotation
+    def scaleMask(self):
+        return self._scaleMask
 
-    @rotation.setter
-    def rotation(self, rotation):
-        self._rotation = rotation
+    def _checkTrack(self, track, width):
+        if not isinstance(track, array):
+            raise TypeError("Track must be of type array")
 
-    @property
-    def translation(self):
-        return self._translation
+        if len(track) != len(self._keytimes) * width:
+            raise ValueError("Track must have %d values per keyframe" % width)
 
-    @translation.setter
-    def translation(self, translation):
-        self._translation = translation
+    def addKeyframe(self, keytime, translation=None, rotation=None, scale=None):
+        """Appends a keyframe. Transforms left as None aren't set by it."""
+        self._keytimes.append(keytime)
 
-    @property
-    def scale(self):
-        return self._scale
+        self._translationMask.append(translation is not None)
+        self._translations.extend(self._REST_TRANSLATION if translation is None else translation)
 
-    @scale.setter
-    def scale(self, scale):
-        self._scale = scale
+        self._rotationMask.append(rotation is not None)
+        self._rotations.extend(self._REST_ROTATION if rotation is None else rotation)
+
+        self._scaleMask.append(scale is not None)
+        self._scales.extend(self._REST_SCALE if scale is None else scale)
 
 
 class G3DModel(object):
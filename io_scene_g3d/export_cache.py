@@ -0,0 +1,304 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Caches of export results kept between exports.
+
+ExportCache entries live on disk and are addressed by a hash of everything
+that went into computing them, so a changed input simply misses the cache and
+stale entries age out. SESSION_CACHE lives in memory for the Blender session,
+is addressed by datablock names and forgets entries when Blender reports a
+change to a datablock they depend on.
+"""
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import bpy
+
+from io_scene_g3d.util import Util
+
+# Changes whenever the layout of cached objects changes, so older entries are never read
+CACHE_VERSION = 3
+
+CACHE_EXTENSION = ".g3dcache"
+
+
+def defaultCacheDirectory():
+    """Folder of the export cache in the Blender user data folder, or in the user cache folder"""
+    directory = ""
+    userResource = getattr(bpy.utils, "user_resource", None)
+    if userResource is not None:
+        directory = userResource('DATAFILES', path="io_scene_g3d_cache")
+    if not directory:
+        directory = os.path.join(os.path.expanduser("~"), ".cache", "io_scene_g3d")
+    return directory
+
+
+def checkCacheDirectory(directory):
+    """
+    Creates the cache folder readable only by the user. Entries are unpickled, which runs
+    code, so a folder other users own or can write to is refused with a PermissionError.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    # Windows has no user ids, there the folder permissions are left to the system
+    if not hasattr(os, "getuid"):
+        return
+
+    stat = os.stat(directory)
+    if stat.st_uid != os.getuid():
+        raise PermissionError("Export cache folder %s is owned by another user" % directory)
+    if stat.st_mode & 0o002:
+        raise PermissionError("Export cache folder %s can be written by other users" % directory)
+
+
+class CacheKey(object):
+    """Hash of the inputs of a cached result"""
+
+    def __init__(self, *values):
+        self._digest = hashlib.sha1()
+        self.add(CACHE_VERSION, *values)
+
+    def add(self, *values):
+        """Adds values with a stable repr (numbers, strings and containers of them)"""
+        self._digest.update(repr(values).encode("utf-8"))
+
+    def addBuffer(self, buffer):
+        """Adds the raw bytes of an array"""
+        self._digest.update(buffer.tobytes())
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+class ExportCache(object):
+    """
+    Directory of pickled export results. When the directory grows above 'maxBytes'
+    the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+
+        # Size of each entry by key, least recently used first
+        self._entries = OrderedDict()
+
+        checkCacheDirectory(directory)
+        files = []
+        for fileName in os.listdir(directory):
+            if fileName.endswith(CACHE_EXTENSION):
+                stat = os.stat(os.path.join(directory, fileName))
+                files.append((stat.st_mtime, fileName[:-len(CACHE_EXTENSION)], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """Returns the value stored for 'key', or None"""
+        if key not in self._entries:
+            self.misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cacheFile:
+                value = pickle.load(cacheFile)
+        except Exception as readError:
+            Util.warn("Discarding unreadable cache entry {!s} ({!r})", path, readError)
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        # Modification time orders entries by last use for the next session
+        os.utime(path, None)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores 'value' for 'key'. The file is written under a temporary name and renamed, so readers
+        never see it half written. If it can't be written the value is just not cached.
+        """
+        path = self._path(key)
+        temporaryPath = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(temporaryPath, "wb") as cacheFile:
+                pickle.dump(value, cacheFile, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaryPath, path)
+        except (OSError, pickle.PicklingError) as writeError:
+            Util.warn("Couldn't write cache entry {!s} ({!r})", path, writeError)
+            try:
+                os.remove(temporaryPath)
+            except OSError:
+                pass
+            return
+
+        self._entries[key] = os.path.getsize(path)
+        self._entries.move_to_end(key)
+
+    def trim(self):
+        """Deletes least recently used entries until the cache fits in 'maxBytes'"""
+        totalBytes = sum(self._entries.values())
+        while totalBytes > self.maxBytes and len(self._entries) > 0:
+            key = next(iter(self._entries))
+            totalBytes -= self._entries[key]
+            self._remove(key)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class SessionCache(object):
+    """
+    Pickled export results kept in memory. Results are pickled so the exporter can
+    modify what it gets back, and so the memory they take is known.
+    """
+
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+
+        # Pickled value and names of the datablocks it depends on by key, least recently used first
+        self._entries = OrderedDict()
+        self._totalBytes = 0
+
+    def configure(self, maxBytes):
+        """Sets the size limit and resets the counters at the start of an export"""
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self._trim()
+
+    def get(self, key):
+        """Returns a copy of the value stored for 'key', or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return pickle.loads(entry[0])
+
+    def put(self, key, dependencies, value):
+        """Stores 'value' for 'key' until one of the 'dependencies' datablock names changes"""
+        self._discard(key)
+
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._entries[key] = (data, frozenset(dependencies))
+        self._totalBytes += len(data)
+        self._trim()
+
+    def invalidate(self, names):
+        """Forgets entries that depend on any of the datablock names"""
+        for key in [key for key, entry in self._entries.items() if not entry[1].isdisjoint(names)]:
+            self._discard(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._totalBytes = 0
+
+    def _trim(self):
+        while self._totalBytes > self.maxBytes and len(self._entries) > 0:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._totalBytes -= len(entry[0])
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SESSION_CACHE = SessionCache(256 * 1024 * 1024)
+
+
+def changedDatablockNames(scene, depsgraph=None):
+    """
+    Names of the datablocks changed since the last update handler call. Blender 2.8
+    and later list them in the depsgraph, Blender 2.7x flags them with 'is_updated'.
+    """
+    if depsgraph is not None:
+        return set(update.id.name for update in depsgraph.updates)
+
+    changedNames = set()
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.armatures, bpy.data.actions):
+        if collection.is_updated:
+            for datablock in collection:
+                if datablock.is_updated or getattr(datablock, "is_updated_data", False):
+                    changedNames.add(datablock.name)
+
+    if scene.is_updated:
+        changedNames.add(scene.name)
+
+    return changedNames
+
+
+@bpy.app.handlers.persistent
+def _onDataChange(scene, depsgraph=None):
+    if len(SESSION_CACHE) == 0:
+        return
+
+    changedNames = changedDatablockNames(scene, depsgraph)
+    if len(changedNames) > 0:
+        SESSION_CACHE.invalidate(changedNames)
+
+
+@bpy.app.handlers.persistent
+def _onFileChange(*args):
+    """Loading a file, undo and redo can change anything"""
+    SESSION_CACHE.clear()
+
+
+def _handlerLists():
+    handlers = bpy.app.handlers
+    updateHandlers = handlers.depsgraph_update_post if hasattr(handlers, "depsgraph_update_post") else handlers.scene_update_post
+    return [(updateHandlers, _onDataChange)] + [(getattr(handlers, name), _onFileChange) for name in ("load_post", "undo_post", "redo_post")
+                                                if hasattr(handlers, name)]
+
+
+def registerHandlers():
+    """Starts invalidating the session cache on data changes"""
+    for handlerList, handler in _handlerLists():
+        if handler not in handlerList:
+            handlerList.append(handler)
+
+
+def unregisterHandlers():
+    for handlerList, handler in _handlerLists():
+        if handler in handlerList:
+            handlerList.remove(handler)
+    SESSION_CACHE.clear()
@@ -0,0 +1,156 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Statistics of an exported model, written next to it as '<file>.report.json'.
+
+Counters only the pipeline knows (loops read, frames sampled, bytes of each
+section) are collected in ExportMetrics while exporting. Everything else is
+read from the finished model. Keys are stable and sorted the same way on every
+export, so reports of two exports of an asset can be diffed.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+from io_scene_g3d.domain_classes import VertexAttribute
+
+# Changes whenever keys of the report change meaning
+REPORT_VERSION = 1
+
+REPORT_EXTENSION = ".report.json"
+
+# Every vertex attribute value is written as 32 bit floats
+BYTES_PER_FLOAT = 4
+
+
+class ExportMetrics(object):
+    """Counters collected while exporting"""
+
+    def __init__(self):
+        # Loops read and vertices left after merging equal ones, by Blender mesh name
+        self.meshReads = OrderedDict()
+
+        # Frames evaluated for each bone, by action name
+        self.actionFrames = OrderedDict()
+
+        # Bytes each top level section takes in the written file
+        self.sectionBytes = OrderedDict()
+
+    def countMeshRead(self, meshName, loops, uniqueVertices):
+        self.meshReads[meshName] = (loops, uniqueVertices)
+
+    def countActionFrames(self, actionName, frames):
+        self.actionFrames[actionName] = frames
+
+    def buildReport(self, g3dModel, filepath, fileFormat):
+        """Report of the finished model as an ordered dictionary"""
+        report = OrderedDict()
+        report["version"] = REPORT_VERSION
+        report["file"] = os.path.basename(filepath)
+        report["format"] = fileFormat
+
+        sources = OrderedDict()
+        for meshName, (loops, uniqueVertices) in self.meshReads.items():
+            source = OrderedDict()
+            source["loopsRead"] = loops
+            source["uniqueVertices"] = uniqueVertices
+            source["dedupRatio"] = round(loops / float(uniqueVertices), 4) if uniqueVertices > 0 else 0.0
+            sources[meshName] = source
+        report["sources"] = sources
+
+        partBones = self.countPartBones(g3dModel.nodes or [])
+        meshes = [self.reportMesh(mesh, partBones) for mesh in g3dModel.meshes or []]
+        report["meshes"] = meshes
+
+        animations = [self.reportAnimation(animation) for animation in g3dModel.animations or []]
+        report["animations"] = animations
+
+        totals = OrderedDict()
+        totals["meshes"] = len(meshes)
+        totals["parts"] = sum(len(mesh["parts"]) for mesh in meshes)
+        totals["loopsRead"] = sum(source["loopsRead"] for source in sources.values())
+        totals["vertices"] = sum(mesh["vertices"] for mesh in meshes)
+        totals["vertexBytes"] = sum(mesh["vertices"] * mesh["vertexStride"] for mesh in meshes)
+        totals["indices"] = sum(part["indices"] for mesh in meshes for part in mesh["parts"])
+        totals["materials"] = len(g3dModel.materials or [])
+        totals["animations"] = len(animations)
+        totals["framesSampled"] = sum(animation["framesSampled"] for animation in animations)
+        totals["keyframesKept"] = sum(animation["keyframesKept"] for animation in animations)
+        totals["bytes"] = os.path.getsize(filepath) if os.path.exists(filepath) else sum(self.sectionBytes.values())
+        report["totals"] = totals
+
+        report["sections"] = OrderedDict(self.sectionBytes)
+        return report
+
+    def countPartBones(self, nodes):
+        """Most bones any node part using each mesh part binds, by mesh part id"""
+        partBones = {}
+        pendingNodes = list(nodes)
+        while len(pendingNodes) > 0:
+            node = pendingNodes.pop()
+            for nodePart in node.parts or []:
+                boneCount = len(nodePart.bones) if nodePart.bones is not None else 0
+                partBones[nodePart.meshPartId] = max(boneCount, partBones.get(nodePart.meshPartId, 0))
+            pendingNodes.extend(node.children or [])
+        return partBones
+
+    def reportMesh(self, mesh, partBones):
+        meshReport = OrderedDict()
+        meshReport["id"] = mesh.id
+        meshReport["attributes"] = list(mesh.getAttributes())
+        meshReport["vertices"] = mesh.vertexCount
+        meshReport["vertexStride"] = mesh.vertexSize * BYTES_PER_FLOAT
+        meshReport["blendWeights"] = len([name for name in mesh.getAttributes() if name.startswith(VertexAttribute.BLENDWEIGHT)])
+
+        parts = []
+        for part in mesh.parts:
+            partReport = OrderedDict()
+            partReport["id"] = part.id
+            partReport["indices"] = len(part.indices) if part.indices is not None else len(part.getIndices())
+            partReport["bones"] = partBones.get(part.id, 0)
+            parts.append(partReport)
+        meshReport["parts"] = parts
+        return meshReport
+
+    def reportAnimation(self, animation):
+        framesSampled = self.actionFrames.get(animation.id, 0)
+
+        bones = []
+        for nodeAnimation in animation.bones or []:
+            boneReport = OrderedDict()
+            boneReport["boneId"] = nodeAnimation.boneId
+            boneReport["framesSampled"] = framesSampled
+            boneReport["keyframesKept"] = nodeAnimation.keyframeCount
+            bones.append(boneReport)
+
+        animationReport = OrderedDict()
+        animationReport["id"] = animation.id
+        animationReport["framesSampled"] = framesSampled * len(bones)
+        animationReport["keyframesKept"] = sum(bone["keyframesKept"] for bone in bones)
+        animationReport["bones"] = bones
+        return animationReport
+
+
+def writeReport(report, filepath):
+    """Writes the report of the model exported to 'filepath' next to it"""
+    with open(filepath + REPORT_EXTENSION, "w") as reportFile:
+        json.dump(report, reportFile, indent=2)
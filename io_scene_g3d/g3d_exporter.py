@@ -18,13 +18,19 @@
 
 # <pep8 compliant>
 
+import math
+import operator
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
 import bpy
 import mathutils
-from bpy.props import BoolProperty, IntProperty
-from bpy_extras.io_utils import ExportHelper, orientation_helper_factory, path_reference
+from bpy_extras.io_utils import path_reference
 
-from io_scene_g3d import g3d_file_writer
-from .profile import profile, print_stats
+from io_scene_g3d import g3d_file_writer, mesh_optimizer, export_cache, export_report, watch_mode
+from .profile import profile, span, PROFILER, MEMORY_TRACKER
 from . import util
 from .util import Util
 from .domain_classes import (Texture,
@@ -33,7 +39,6 @@ from .domain_classes import (Texture,
                              NodePart,
                              Node,
                              Bone,
-                             Keyframe,
                              Material,
                              VertexAttribute,
                              Vertex,
@@ -42,95 +47,66 @@ from .domain_classes import (Texture,
                              G3DModel)
 from io_scene_g3d.util import FLOAT_ROUND
 
-IOG3DOrientationHelper = orientation_helper_factory("IOG3DOrientationHelper", axis_forward='-Z', axis_up='Y')
 
+class G3DExporter(object):
+    """
+    Exports the scene to a G3D file. The operators in 'g3d_operators' create one when
+    something is exported, so this module and the ones it imports load on the first export.
+    """
 
-class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
     # This is our model
     g3dModel = None
 
-    filename_ext = ""
-
-    useSelection = BoolProperty(
-        name="Selection Only",
-        description="Export only selected objects",
-        default=False
-    )
-    
-    applyModifiers = BoolProperty(
-        name="Apply Modifiers",
-        description="Apply modifiers to each mesh before exporting, doesn't affect original meshes",
-        default=True
-    )
-
-    exportArmature = BoolProperty(
-        name="Export Armatures",
-        description="Export armature nodes (bones)",
-        default=True
-    )
-
-    bonesPerVertex = IntProperty(
-        name="Bone Weights per Vertex",
-        description="Maximum number of BLENDWEIGHT attributes per vertex. LibGDX default is 4.",
-        default=4,
-        soft_min=1, soft_max=8
-    )
-
-    exportAnimation = BoolProperty(
-        name="Export Actions as Animations",
-        description="Export bone actions as animations",
-        default=True,
-    )
-
-    generateTangentBinormal = BoolProperty(
-        name="Calculate Tangent and Binormal Vectors",
-        description="Calculate and export tangent and binormal vectors for normal mapping. Requires UV mapping the mesh.",
-        default=False
-    )
-    
-    # This is overriden by the G3DB subclass of this exporter. For the G3DJ this isn't
-    # used and is here with it's default value to pass to methods.
-    oldFormatJson = True
-
-    order = [
-        "filepath",
-        "check_existing",
-        "useSelection",
-        "applyModifiers",
-        "exportArmature",
-        "bonesPerVertex",
-        "exportAnimation",
-        "generateTangentBinormal",
-    ]
-
-    vector3AxisMapper = {}
-
-    vector4AxisMapper = {}
+    vector3AxisMapper = None
+
+    vector4AxisMapper = None
+
+    # Seconds between timer events of the modal export, and how long each event runs export steps
+    MODAL_TIMER_INTERVAL = 0.05
+    MODAL_TIME_SLICE = 0.1
 
     # Constants
     P_LOCATION = 'location'
     P_ROTATION = 'rotation_quaternion'
     P_SCALE = 'scale'
 
+    def __init__(self, operator):
+        self.operator = operator
+
+        # Filled by 'setupAxisConversion'. Each export has its own, exports can be paused while another one runs.
+        self.vector3AxisMapper = {}
+        self.vector4AxisMapper = {}
+
+        # Options are read for every loop and keyframe, plain attributes are faster than the operator properties
+        for name in operator.order + ["axis_forward", "axis_up", "filename_ext", "oldFormatJson"]:
+            setattr(self, name, getattr(operator, name))
+
+    def __getattr__(self, name):
+        # Anything else (ex: 'bl_idname', 'report') is the operator's
+        if name == "operator":
+            raise AttributeError(name)
+        return getattr(self.operator, name)
+
     def execute(self, context):
+        # Session cache and watch mode follow data changes once something was exported
+        export_cache.registerHandlers()
+        watch_mode.registerHandlers()
+
+        if self.exportInBackground and not bpy.app.background and context.window_manager is not None:
+            return self.startModalExport(context)
         return self.startExport(context)
 
-    @profile('totalAddonExecution')
     def startExport(self, context):
         """Main method run by Blender to export a G3D file"""
+        try:
+            return self.runExport(context)
+        except Exception:
+            self.abortExport()
+            raise
 
-        # Defines our mapping from Blender Z-Up to whatever the user selected
-        self.setupAxisConversion(self.axis_forward, self.axis_up)
+    def runExport(self, context):
+        self.beginExport(context)
 
-        # Changes Blender to "object" mode
-        bpy.ops.object.mode_set(mode='OBJECT')
-
-        # define our return state
-        result = {'FINISHED'}
-
-        # Initialize our model
-        self.g3dModel = G3DModel()
-        
         # Generate the mesh list of the model
         meshes = self.generateMeshes(context)
         if meshes is not None:
@@ -152,263 +128,1491 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
             self.g3dModel.animations = animations
 
         # Export to the final file
-        exporter = None
-        if self.filename_ext == ".g3dj":
-            exporter = g3d_file_writer.G3DJWriter()
-        elif self.filename_ext == ".g3db":
-            exporter = g3d_file_writer.G3DBWriter(old_format=self.oldFormatJson)
-
+        exporter = self.createWriter()
         if exporter is not None:
             Util.info("Writing output file")
             exporter.export(self.g3dModel, self.filepath)
+            self.exportMetrics.sectionBytes = exporter.sectionBytes
+
+        return self.finishExport(context)
+
+    def beginExport(self, context):
+        """Sets up the state used while exporting"""
+        watch_mode.exportStarted(self)
+
+        # The whole export is the outermost span, closed in 'finishExport'
+        if self.profileExport:
+            PROFILER.start()
+            PROFILER.enter("export", bpy.path.basename(self.filepath))
+        else:
+            PROFILER.stop()
+
+        # Heap tracing stays on only while exporting, it slows everything down
+        if self.trackMemory:
+            MEMORY_TRACKER.start()
+            MEMORY_TRACKER.enter("export")
+        else:
+            MEMORY_TRACKER.stop()
+
+        # Defines our mapping from Blender Z-Up to whatever the user selected
+        self.setupAxisConversion(self.axis_forward, self.axis_up)
+
+        # Changes Blender to "object" mode
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        # Initialize our model
+        self.g3dModel = G3DModel()
+
+        # Counters of the export report
+        self.exportMetrics = export_report.ExportMetrics()
+
+        # Mesh parts replaced by others while generating meshes, by original part id.
+        # Nodes referencing the original part reference the new ones instead.
+        self.meshPartSplits = {}
+
+        # Part ids of each level of detail generated for a mesh part, by original part id
+        self.meshPartLods = {}
+
+        # Grid cells a static mesh part was split into, by original part id
+        self.meshPartChunks = {}
+
+        # Parts each skinned mesh part was split into, with the bones they use, by original part id
+        self.meshPartBonePalettes = {}
+
+        # Rigid part and bone node of mesh parts weighted to a single bone, by original part id
+        self.meshPartRigid = {}
+        self.rigidNodes = []
+
+        # Mesh part ids of meshes skipped for having the same content of another, pointing
+        # to the part of the exported mesh
+        self.meshPartAliases = {}
+
+        # Static objects merged into batches, which have their own nodes and meshes
+        self.batchedObjectNames = set()
+        self.staticBatches = OrderedDict()
+        self.staticBatchNodes = []
+
+        # Results of previous exports with the same inputs are read back instead of computed
+        self.exportCache = None
+        if self.useExportCache:
+            cacheDirectory = self.exportCacheDirectory or export_cache.defaultCacheDirectory()
+            try:
+                self.exportCache = export_cache.ExportCache(cacheDirectory, self.exportCacheSize * 1024 * 1024)
+            except OSError as cacheError:
+                Util.warn("Not using the export cache: {!s}", cacheError)
+
+        if self.useSessionCache:
+            export_cache.SESSION_CACHE.configure(self.sessionCacheSize * 1024 * 1024)
+
+        self.optionsCacheKey = self.getOptionsCacheKey()
+
+    def createWriter(self):
+        if self.filename_ext == ".g3dj":
+            return g3d_file_writer.G3DJWriter()
+        elif self.filename_ext == ".g3db":
+            return g3d_file_writer.G3DBWriter(old_format=self.oldFormatJson)
+        return None
+
+    def finishExport(self, context):
+        """Cleans up after the file is written"""
+        if self.useSessionCache:
+            Util.info("Session cache: {:d} hits, {:d} misses", export_cache.SESSION_CACHE.hits, export_cache.SESSION_CACHE.misses)
+
+        if self.exportCache is not None:
+            Util.info("Export cache: {:d} hits, {:d} misses", self.exportCache.hits, self.exportCache.misses)
+            self.exportCache.trim()
+            self.exportCache = None
+
+        # Watched files are exported again by the watcher when what went into them changes
+        if self.watchForChanges:
+            self.watchExportedFile(context)
+        else:
+            watch_mode.WATCHER.unwatch(self.filepath)
+
+        if self.trackMemory:
+            MEMORY_TRACKER.exit()
+            highestPeak = MEMORY_TRACKER.highestPeak()
+            if highestPeak is not None:
+                Util.info("Highest Python heap {:.1f} MB, during {!s}", highestPeak["peakBytes"] / 1048576.0, highestPeak["stage"])
+
+        if self.writeExportReport or self.trackMemory:
+            report = self.exportMetrics.buildReport(self.g3dModel, self.filepath, self.filename_ext[1:])
+            if self.trackMemory:
+                report["memory"] = MEMORY_TRACKER.stages
+            export_report.writeReport(report, self.filepath)
+            Util.info("Export report written to {!s}{!s}", self.filepath, export_report.REPORT_EXTENSION)
+
+        MEMORY_TRACKER.stop()
 
         # Clean up after export
         self.g3dModel = None
+        self.exportMetrics = None
+        watch_mode.exportEnded(self)
 
-        if util.LOG_LEVEL >= util._DEBUG_:
-            print_stats()
+        if self.profileExport:
+            PROFILER.exit()
+            PROFILER.stop()
+            PROFILER.writeReports(self.filepath)
+            Util.info("Export profile written to {!s}.profile.json", self.filepath)
+            if util.LOG_LEVEL >= util._DEBUG_:
+                PROFILER.printStats()
 
         Util.info("Finished")
-        return result
+        return {'FINISHED'}
+
+    def abortExport(self):
+        """Drops the state of an export that failed or was cancelled"""
+        watch_mode.exportEnded(self)
+        PROFILER.stop()
+        MEMORY_TRACKER.stop()
+        self.g3dModel = None
+        self.exportMetrics = None
+        self.exportCache = None
+
+    def runSteps(self, steps):
+        """Runs export steps to the end and returns their result"""
+        try:
+            while True:
+                next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+    def exportSteps(self, context):
+        """
+        The whole export in short steps, for the modal export. Yields a status text after
+        each step, or None while the file is being written in the background.
+        """
+        self.beginExport(context)
+        with span("generateMeshes", memory=True):
+            self.g3dModel.meshes = yield from self.meshSteps(context)
 
-    @profile('generateMeshes')
+        yield "Exporting materials"
+        self.g3dModel.materials = self.generateMaterials(context)
+
+        yield "Exporting nodes"
+        self.g3dModel.nodes = self.generateNodes(context)
+
+        with span("generateAnimations", memory=True):
+            self.g3dModel.animations = yield from self.animationSteps(context)
+
+        # Writing only reads the model, so it runs in a thread while Blender handles events
+        exporter = self.createWriter()
+        if exporter is not None:
+            Util.info("Writing output file")
+            writeErrors = []
+            writeThread = threading.Thread(target=self.writeModel, args=(exporter, writeErrors))
+            self.exportWriteThread = writeThread
+            writeThread.start()
+            while writeThread.is_alive():
+                yield None
+
+            if len(writeErrors) > 0:
+                raise writeErrors[0]
+
+            self.exportMetrics.sectionBytes = exporter.sectionBytes
+
+        self.finishExport(context)
+
+    def writeModel(self, exporter, writeErrors):
+        try:
+            exporter.export(self.g3dModel, self.filepath)
+        except Exception as writeError:
+            writeErrors.append(writeError)
+
+    def countExportSteps(self):
+        """Number of steps 'exportSteps' yields, not counting the wait for the file to be written"""
+        meshCount = len(set(blObject.data.name for blObject in bpy.data.objects
+                            if blObject.type == 'MESH' and (blObject.select or not self.useSelection)))
+        armatureCount = len([blObject for blObject in bpy.data.objects if blObject.type == 'ARMATURE'])
+        actionCount = len([blAction for blAction in bpy.data.actions if blAction.users > 0]) if self.exportAnimation else 0
+        return meshCount + 3 + armatureCount * actionCount
+
+    def startModalExport(self, context):
+        """Runs the export steps from a timer, so Blender stays responsive and Esc cancels the export"""
+        self.exportStepIterator = self.exportSteps(context)
+        self.exportStepCount = self.countExportSteps()
+        self.exportStepsDone = 0
+        self.exportWriteThread = None
+
+        windowManager = context.window_manager
+        windowManager.progress_begin(0, self.exportStepCount)
+        self.exportTimer = windowManager.event_timer_add(self.MODAL_TIMER_INTERVAL, context.window)
+        windowManager.modal_handler_add(self.operator)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            # The file is replaced in one rename once written, so writing it is left to finish
+            if self.exportWriteThread is None:
+                self.endModalExport(context)
+                self.exportStepIterator.close()
+                self.abortExport()
+                Util.warn("Export cancelled")
+                self.report({'WARNING'}, "G3D export cancelled")
+                return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # Run at least one step, and more while this timer event has time left
+        stopTime = time.perf_counter() + self.MODAL_TIME_SLICE
+        try:
+            while True:
+                status = next(self.exportStepIterator)
+                if status is None:
+                    break
+
+                self.exportStepsDone += 1
+                if time.perf_counter() >= stopTime:
+                    break
+        except StopIteration:
+            self.endModalExport(context)
+            return {'FINISHED'}
+        except Exception:
+            self.endModalExport(context)
+            self.abortExport()
+            raise
+
+        context.window_manager.progress_update(min(self.exportStepsDone, self.exportStepCount))
+        self.setExportStatus(context, status if status is not None else "Writing %s" % self.filepath)
+        return {'RUNNING_MODAL'}
+
+    def endModalExport(self, context):
+        context.window_manager.event_timer_remove(self.exportTimer)
+        context.window_manager.progress_end()
+        self.setExportStatus(context, None)
+
+    def setExportStatus(self, context, text):
+        """Shows the export status in the status bar (Blender 2.8+) or the area header (Blender 2.7x)"""
+        workspace = getattr(context, "workspace", None)
+        if workspace is not None:
+            workspace.status_text_set(text)
+        elif context.area is not None:
+            if text is None:
+                context.area.header_text_set()
+            else:
+                context.area.header_text_set(text)
+
+    @profile('generateMeshes', memory=True)
     def generateMeshes(self, context):
         """Reads all MESH type objects and exported the selected ones (or all if 'only selected' isn't checked"""
+        return self.runSteps(self.meshSteps(context))
+
+    def meshSteps(self, context):
+        """Steps of 'generateMeshes', one per mesh. Returns the list of meshes."""
         Util.info("Exporting meshes")
         generatedMeshes = []
+        processedMeshNames = set()
+        meshesByContent = {}
 
         for currentObjNode in bpy.data.objects:
             if currentObjNode.type != 'MESH' or (self.useSelection and not currentObjNode.select):
                 continue
 
             # If we already processed the mesh data associated with this object, continue (ex: multiple objects pointing to same mesh data)
-            duplicatedMesh = False
-            for mesh in generatedMeshes:
-                if (mesh.id == currentObjNode.data.name):
-                    duplicatedMesh = True
-                    break
-            if duplicatedMesh or self.g3dModel.hasMesh(currentObjNode.data.name):
+            if currentObjNode.data.name in processedMeshNames or self.g3dModel.hasMesh(currentObjNode.data.name):
                 Util.debug("Mesh '{!s}' already exported from another object", currentObjNode.data.name)
                 continue
 
-            # This is the mesh object we are generating
-            generatedMesh = Mesh()
             currentBlMeshName = currentObjNode.data.name
-            generatedMesh.id = currentBlMeshName
+            processedMeshNames.add(currentBlMeshName)
+            yield "Exporting mesh '%s'" % currentBlMeshName
+
+            # Everything done to this mesh is timed as one span, so the profile tells meshes apart
+            with span("mesh", currentBlMeshName):
+                # Exported objects using this mesh data
+                meshUsers = [blObject for blObject in bpy.data.objects
+                             if blObject.type == 'MESH' and blObject.data.name == currentBlMeshName and (blObject.select or not self.useSelection)]
+                batchedUsers = []
+                if self.batchStaticMeshes:
+                    batchedUsers = [blObject for blObject in meshUsers if self.canBatchObject(blObject)]
+
+                # Static meshes can only be split in world space if a single object uses them
+                chunkMatrix = None
+                if self.chunkStaticMeshes and len(batchedUsers) == 0 and self.isStaticObject(currentObjNode):
+                    if len(meshUsers) == 1:
+                        chunkMatrix = currentObjNode.matrix_world.copy()
+                    else:
+                        Util.debug("Mesh '{!s}' is used by more than one object, not splitting it in chunks", currentBlMeshName)
+
+                # Parts weighted to a single bone are baked in the space of the bone, which depends
+                # on the object transform, so a single object must use the mesh
+                rigidArmature = None
+                if self.exportArmature and self.bakeRigidParts and len(meshUsers) == 1:
+                    rigidArmature = currentObjNode.find_armature()
+                    if rigidArmature is not None and currentObjNode.parent is not rigidArmature:
+                        rigidArmature = None
+
+                # Read the mesh from Blender, or take it from a cache if nothing it depends on changed
+                builtMesh = self.getCachedResult(("mesh", currentObjNode.name, currentBlMeshName, rigidArmature is not None, self.optionsCacheKey),
+                                                 self.getMeshDependencies(currentObjNode),
+                                                 lambda: self.getMeshCacheKey(currentObjNode, rigidArmature),
+                                                 lambda: self.buildMesh(context, currentObjNode, rigidArmature))
+                if builtMesh is None:
+                    continue
+
+                generatedMesh, partBoneNames, (loopsRead, uniqueVertices) = builtMesh
+                self.exportMetrics.countMeshRead(currentBlMeshName, loopsRead, uniqueVertices)
+
+                # Parts that don't need skinning go to meshes of their own
+                rigidMeshes = []
+                if rigidArmature is not None:
+                    rigidMeshes = self.extractRigidParts(generatedMesh, meshUsers[0], rigidArmature, partBoneNames)
+
+                # Keep parts under the number of bones the shader supports
+                if self.exportArmature and self.maxBonesPerPart > 0:
+                    self.partitionMeshBones(generatedMesh)
+
+                for rigidMesh in rigidMeshes:
+                    if self.optimizeVertexCache:
+                        self.optimizeMeshVertexCache(rigidMesh)
+
+                    if self.optimizeVertexFetch:
+                        self.optimizeMeshVertexFetch(rigidMesh)
+
+                    generatedMeshes.extend(self.finishMesh(rigidMesh))
 
-            # Clone mesh to a temporary object. Wel'll apply modifiers and triangulate the
-            # clone before exporting.
-            currentObjNode = currentObjNode.copy()
+                if len(generatedMesh.parts) == 0:
+                    Util.debug("All parts of mesh '{!s}' are rigid", currentBlMeshName)
+                    continue
+
+                # Static objects using this mesh are baked into batches
+                for blObject in batchedUsers:
+                    self.addToStaticBatches(generatedMesh, blObject)
+
+                if len(batchedUsers) == len(meshUsers) and len(meshUsers) > 0:
+                    Util.debug("Mesh '{!s}' only used by batched objects", currentBlMeshName)
+                    continue
+
+                # Separate copies of the same mesh (ex: Shift+D duplicates) are only exported once
+                if self.mergeIdenticalMeshes:
+                    contentHash = generatedMesh.computeContentHash()
+                    identicalMesh = meshesByContent.get(contentHash)
+                    if identicalMesh is not None:
+                        Util.info("Mesh '{!s}' is identical to '{!s}', exporting it only once", currentBlMeshName, identicalMesh.id)
+                        for meshPart, identicalPart in zip(generatedMesh.parts, identicalMesh.parts):
+                            self.meshPartAliases[meshPart.id] = identicalPart.id
+                        continue
+                    meshesByContent[contentHash] = generatedMesh
+
+                # Simplified levels of detail are exported as extra meshes
+                meshLevels = [generatedMesh]
+                if self.generateLods:
+                    meshLevels.extend(self.generateMeshLods(generatedMesh))
+
+                # Full detail level of static meshes is split in grid cells
+                if chunkMatrix is not None:
+                    meshLevels[0:1] = self.chunkStaticMesh(generatedMesh, chunkMatrix)
+
+                for levelMesh in meshLevels:
+                    # Reorder triangles for the post-transform vertex cache
+                    if self.optimizeVertexCache:
+                        self.optimizeMeshVertexCache(levelMesh)
+
+                    # Lay vertices out in the order the index buffers read them
+                    if self.optimizeVertexFetch:
+                        self.optimizeMeshVertexFetch(levelMesh)
+
+                    # Add generated mesh to returned list
+                    generatedMeshes.extend(self.finishMesh(levelMesh))
+
+        # Batches get the same treatment, except they can't have LODs
+        yield "Exporting static batches"
+        with span("staticBatches"):
+            for batchMesh in self.generateStaticBatchMeshes():
+                batchLevels = [batchMesh]
+                if self.chunkStaticMeshes:
+                    batchLevels = self.chunkStaticMesh(batchMesh, mathutils.Matrix())
+
+                for levelMesh in batchLevels:
+                    if self.optimizeVertexCache:
+                        self.optimizeMeshVertexCache(levelMesh)
+
+                    if self.optimizeVertexFetch:
+                        self.optimizeMeshVertexFetch(levelMesh)
+
+                    generatedMeshes.extend(self.finishMesh(levelMesh))
+
+        # Return list of all meshes
+        return generatedMeshes
+
+    def finishMesh(self, mesh):
+        """
+        Splits a mesh no pass will change anymore if short indices can't address all of
+        its vertices, and packs the resulting meshes in vertex and index buffers, freeing
+        their vertex objects before the next mesh is read. Returns the packed meshes.
+        """
+        splitMeshes = self.splitOversizedMesh(mesh)
+        for splitMesh in splitMeshes:
+            splitMesh.pack()
+        return splitMeshes
+
+    @profile('buildMesh')
+    def buildMesh(self, context, blObject, rigidArmature):
+        """
+        Reads the mesh of an object into a Mesh, with the attributes of the vertices merged
+        and reduced. Returns the mesh, the bone names of its parts and the number of loops read
+        and of vertices they merged into, or None if it has no materials.
+        """
+        currentBlMeshName = blObject.data.name
+
+        # Clone mesh to a temporary object. Wel'll apply modifiers and triangulate the
+        # clone before exporting.
+        currentObjNode = blObject.copy()
+        with span("toMesh"):
             currentBlMesh = currentObjNode.to_mesh(context.scene, self.applyModifiers, 'PREVIEW', calc_tessface=False)
-            self.meshTriangulate(currentBlMesh)
+        try:
+            with span("triangulate"):
+                self.meshTriangulate(currentBlMesh)
             currentObjNode.data = currentBlMesh
+            builtMesh = self.readMesh(currentObjNode, currentBlMesh, currentBlMeshName, rigidArmature)
+        finally:
+            # Clean cloned mesh, also if reading it failed
+            bpy.data.objects.remove(currentObjNode)
+            bpy.data.meshes.remove(currentBlMesh)
 
-            # We can only export polygons that are associated with a material, so we loop
-            # through the list of materials for this mesh
+        if builtMesh is None:
+            return None
 
-            # Loop through the polygons of this mesh
-            if currentBlMesh.materials is None:
-                Util.warn("Ignored mesh %r, no materials found" % currentBlMesh)
-                continue
+        generatedMesh, partBoneNames = builtMesh
 
-            for blMaterialIndex in range(0, len(currentBlMesh.materials)):
-                if currentBlMesh.materials[blMaterialIndex] is None or currentBlMesh.materials[blMaterialIndex].type != 'SURFACE':
-                    Util.debug("Ignoring mesh part for material '{!s}', type is not SURFACE (is {!s})", currentBlMesh.materials[blMaterialIndex].name, currentBlMesh.materials[blMaterialIndex].type)
-                else:
-                    Util.debug("Processing mesh part for material '{!s}'", currentBlMesh.materials[blMaterialIndex].name)
+        # Every loop read added one index, equal loops share a vertex
+        readCounts = (sum(len(part.vertices or []) for part in generatedMesh.parts), len(generatedMesh.vertices))
 
-                # Fills the part here
-                currentMeshPart = MeshPart(meshPartId=currentBlMeshName + "_part" + str(blMaterialIndex))
+        # Normalize attributes so mesh has same number of them for all vertices
+        with span("normalizeAttributes"):
+            generatedMesh.normalizeAttributes()
 
-                # Here we get only vertex groups used in this part
-                vertexGroupsForMaterial = self.listPartVertexGroups(currentObjNode, currentBlMesh, blMaterialIndex)
+        # Merge vertices rounding kept apart
+        if self.weldVertices:
+            self.weldMeshVertices(generatedMesh)
+
+        # Use as few BLENDWEIGHT attributes as the error budget allows
+        if self.exportArmature:
+            self.reduceBlendWeights(generatedMesh)
+
+        return generatedMesh, partBoneNames, readCounts
+
+    @profile('readMesh')
+    def readMesh(self, currentObjNode, currentBlMesh, currentBlMeshName, rigidArmature):
+        """Reads the vertices of each material of a triangulated mesh into a Mesh, returning it with the bone names of its parts"""
+
+        # This is the mesh object we are generating
+        generatedMesh = Mesh()
+        generatedMesh.id = currentBlMeshName
+
+        # BLENDWEIGHT bone indices of each part point to these bones. Only needed to bake rigid parts.
+        partBoneNames = {}
+
+        # Attributes no material of this mesh uses are not exported
+        exportedUvLayers = self.getExportedUVLayers(currentBlMesh)
+        exportTangents = self.generateTangentBinormal and (not self.stripUnusedAttributes or self.meshUsesNormalMaps(currentBlMesh))
+        exportColors = not self.stripUnusedAttributes or self.meshUsesVertexColors(currentBlMesh)
+
+        if self.stripUnusedAttributes:
+            strippedAttributes = []
+            if len(exportedUvLayers) < len(currentBlMesh.uv_layers):
+                strippedAttributes.append("%d of %d UV layers" % (len(currentBlMesh.uv_layers) - len(exportedUvLayers), len(currentBlMesh.uv_layers)))
+            if self.generateTangentBinormal and not exportTangents:
+                strippedAttributes.append("tangents and binormals")
+            if not exportColors and currentBlMesh.vertex_colors.active is not None:
+                strippedAttributes.append("vertex colors")
+            if len(strippedAttributes) > 0:
+                Util.info("Mesh '{!s}' materials don't use {!s}, not exporting them", currentBlMeshName, ", ".join(strippedAttributes))
+
+        # We can only export polygons that are associated with a material, so we loop
+        # through the list of materials for this mesh
+
+        # Loop through the polygons of this mesh
+        if currentBlMesh.materials is None:
+            Util.warn("Ignored mesh %r, no materials found" % currentBlMesh)
+            return None
 
-                for poly in currentBlMesh.polygons:
-                    if (poly.material_index != blMaterialIndex):
-                        continue
+        for blMaterialIndex in range(0, len(currentBlMesh.materials)):
+            if currentBlMesh.materials[blMaterialIndex] is None or currentBlMesh.materials[blMaterialIndex].type != 'SURFACE':
+                Util.debug("Ignoring mesh part for material '{!s}', type is not SURFACE (is {!s})", currentBlMesh.materials[blMaterialIndex].name, currentBlMesh.materials[blMaterialIndex].type)
+            else:
+                Util.debug("Processing mesh part for material '{!s}'", currentBlMesh.materials[blMaterialIndex].name)
 
-                    for loopIndex in poly.loop_indices:
-                        blLoop = currentBlMesh.loops[loopIndex]
-                        blVertex = currentBlMesh.vertices[blLoop.vertex_index]
-                        currentVertex = Vertex()
+            # Fills the part here
+            currentMeshPart = MeshPart(meshPartId=currentBlMeshName + "_part" + str(blMaterialIndex))
 
-                        ############
-                        # Vertex position is the minimal attribute
-                        attribute = VertexAttribute(VertexAttribute.POSITION,
-                                                    self.convertVectorCoordinate(blVertex.co))
-                        if not currentVertex.add(attribute):
-                            Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
-                        ############
-
-                        ############
-                        # Exporting tangent and binormals. We calculate those prior to normals because
-                        # if we want tangent and binormals then we'll be also using split normals, which
-                        # will be exported next section
-                        doneCalculatingTangentBinormal = False
-                        splitNormalValue = None
-                        if self.generateTangentBinormal and currentBlMesh.uv_layers is not None and len(currentBlMesh.uv_layers) > 0:
-                            # TODO We only use first UV layer for now, might think of some way to ask the user
-                            uv = currentBlMesh.uv_layers[0]
-
-                            try:
-                                currentBlMesh.calc_tangents(uvmap=uv.name)
-                                doneCalculatingTangentBinormal = True
-                            except:
-                                doneCalculatingTangentBinormal = False
-
-                            if doneCalculatingTangentBinormal:
-                                tangent = [None] * 3
-                                tangent[0], tangent[1], tangent[2] = blLoop.tangent
-                                attribute = VertexAttribute(name=VertexAttribute.TANGENT, value=self.convertVectorCoordinate(tangent))
+            # Here we get only vertex groups used in this part
+            vertexGroupsForMaterial = self.listPartVertexGroups(currentObjNode, currentBlMesh, blMaterialIndex)
 
-                                if not currentVertex.add(attribute):
-                                    Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
+            # BLENDWEIGHT bone indices of this part point to these bones
+            if rigidArmature is not None:
+                partBoneNames[currentMeshPart.id] = [vertexGroup.name for vertexGroup in vertexGroupsForMaterial
+                                                     if rigidArmature.data.bones.get(vertexGroup.name) is not None]
 
-                                binormal = [None] * 3
-                                binormal[0], binormal[1], binormal[2] = blLoop.bitangent
-                                attribute = VertexAttribute(name=VertexAttribute.BINORMAL, value=self.convertVectorCoordinate(binormal))
+            for poly in currentBlMesh.polygons:
+                if (poly.material_index != blMaterialIndex):
+                    continue
 
-                                if not currentVertex.add(attribute):
-                                    Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
+                for loopIndex in poly.loop_indices:
+                    blLoop = currentBlMesh.loops[loopIndex]
+                    blVertex = currentBlMesh.vertices[blLoop.vertex_index]
+                    currentVertex = Vertex()
+
+                    ############
+                    # Vertex position is the minimal attribute
+                    attribute = VertexAttribute(VertexAttribute.POSITION,
+                                                self.convertVectorCoordinate(blVertex.co))
+                    if not currentVertex.add(attribute):
+                        Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
+                    ############
+
+                    ############
+                    # Exporting tangent and binormals. We calculate those prior to normals because
+                    # if we want tangent and binormals then we'll be also using split normals, which
+                    # will be exported next section
+                    doneCalculatingTangentBinormal = False
+                    splitNormalValue = None
+                    if exportTangents and currentBlMesh.uv_layers is not None and len(currentBlMesh.uv_layers) > 0:
+                        # TODO We only use first UV layer for now, might think of some way to ask the user
+                        uv = currentBlMesh.uv_layers[0]
+
+                        try:
+                            currentBlMesh.calc_tangents(uvmap=uv.name)
+                            doneCalculatingTangentBinormal = True
+                        except:
+                            doneCalculatingTangentBinormal = False
+
+                        if doneCalculatingTangentBinormal:
+                            tangent = [None] * 3
+                            tangent[0], tangent[1], tangent[2] = blLoop.tangent
+                            attribute = VertexAttribute(name=VertexAttribute.TANGENT, value=self.convertVectorCoordinate(tangent))
 
-                                splitNormalValue = [None] * 3
-                                splitNormalValue[0], splitNormalValue[1], splitNormalValue[2] = blLoop.normal
+                            if not currentVertex.add(attribute):
+                                Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
 
-                                currentBlMesh.free_tangents()
+                            binormal = [None] * 3
+                            binormal[0], binormal[1], binormal[2] = blLoop.bitangent
+                            attribute = VertexAttribute(name=VertexAttribute.BINORMAL, value=self.convertVectorCoordinate(binormal))
 
-                        ############
+                            if not currentVertex.add(attribute):
+                                Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
 
-                        ############
-                        # Read normals. We also determine if we'll user per-face (flat shading)
-                        # or per-vertex normals (gouraud shading) here.
-                        attribute = VertexAttribute(name=VertexAttribute.NORMAL)
-                        if doneCalculatingTangentBinormal and splitNormalValue is not None:
+                            splitNormalValue = [None] * 3
+                            splitNormalValue[0], splitNormalValue[1], splitNormalValue[2] = blLoop.normal
 
-                            attribute.value = self.convertVectorCoordinate(splitNormalValue)
-                        elif poly.use_smooth:
+                            currentBlMesh.free_tangents()
 
-                            attribute.value = self.convertVectorCoordinate(blVertex.normal)
-                        else:
+                    ############
+
+                    ############
+                    # Read normals. We also determine if we'll user per-face (flat shading)
+                    # or per-vertex normals (gouraud shading) here.
+                    attribute = VertexAttribute(name=VertexAttribute.NORMAL)
+                    if doneCalculatingTangentBinormal and splitNormalValue is not None:
+
+                        attribute.value = self.convertVectorCoordinate(splitNormalValue)
+                    elif poly.use_smooth:
+
+                        attribute.value = self.convertVectorCoordinate(blVertex.normal)
+                    else:
+
+                        attribute.value = self.convertVectorCoordinate(poly.normal)
 
-                            attribute.value = self.convertVectorCoordinate(poly.normal)
+                    if not currentVertex.add(attribute):
+                        Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
+                    ############
+
+                    ############
+                    # Defining vertex color
+                    colorMap = currentBlMesh.vertex_colors.active
+                    if colorMap is not None and exportColors:
+                        color = [None] * 4
+                        color[0], color[1], color[2] = colorMap.data[loopIndex].color
+                        color[3] = 1.0
+
+                        attribute = VertexAttribute(name=VertexAttribute.COLOR, value=color)
 
                         if not currentVertex.add(attribute):
                             Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
-                        ############
 
-                        ############
-                        # Defining vertex color
-                        colorMap = currentBlMesh.vertex_colors.active
-                        if colorMap is not None:
-                            color = [None] * 4
-                            color[0], color[1], color[2] = colorMap.data[loopIndex].color
-                            color[3] = 1.0
+                    ############
+
+                    ############
+                    # Exporting UV coordinates
+                    if currentBlMesh.uv_layers is not None and len(currentBlMesh.uv_layers) > 0:
+                        texCoordCount = 0
+                        for uvIndex in exportedUvLayers:
+                            uv = currentBlMesh.uv_layers[uvIndex]
+
+                            # We need to flip UV's because Blender use bottom-left as Y=0 and G3D use top-left
+                            flippedUV = [uv.data[loopIndex].uv[0], 1.0 - uv.data[loopIndex].uv[1]]
+
+                            texCoordAttrName = VertexAttribute.TEXCOORD + str(texCoordCount)
+                            attribute = VertexAttribute(texCoordAttrName, flippedUV)
 
-                            attribute = VertexAttribute(name=VertexAttribute.COLOR, value=color)
+                            texCoordCount = texCoordCount + 1
 
                             if not currentVertex.add(attribute):
                                 Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
+                    ############
 
-                        ############
+                    ############
+                    # Exporting bone weights. We only export the 'self.bonesPerVertex' strongest
+                    # bones for a single vertex, ignoring weights below 'self.blendWeightThreshold'.
+                    if self.exportArmature:
+                        zeroWeight = Util.floatToString(0.0)
+                        blendWeightAttrName = VertexAttribute.BLENDWEIGHT + "%d"
 
-                        ############
-                        # Exporting UV coordinates
-                        if currentBlMesh.uv_layers is not None and len(currentBlMesh.uv_layers) > 0:
-                            texCoordCount = 0
-                            for uv in currentBlMesh.uv_layers:
-                                # We need to flip UV's because Blender use bottom-left as Y=0 and G3D use top-left
-                                flippedUV = [uv.data[loopIndex].uv[0], 1.0 - uv.data[loopIndex].uv[1]]
+                        armatureObj = currentObjNode.find_armature()
+                        if armatureObj is not None:
+                            boneIndex = -1
+                            boneWeights = []
 
-                                texCoordAttrName = VertexAttribute.TEXCOORD + str(texCoordCount)
-                                attribute = VertexAttribute(texCoordAttrName, flippedUV)
+                            for vertexGroupIndex in range(0, len(vertexGroupsForMaterial)):
+                                vertexGroup = vertexGroupsForMaterial[vertexGroupIndex]
+
+                                # Search for a bone with the same name as a vertex group
+                                bone = None
+                                try:
+                                    bone = armatureObj.data.bones[vertexGroup.name]
+                                except:
+                                    bone = None
+                                    pass
 
-                                texCoordCount = texCoordCount + 1
+                                if bone is not None:
+                                    boneIndex = boneIndex + 1
+
+                                    try:
+                                        # We get the weight associated with this vertex group. Zeros are ignored
+                                        boneWeight = vertexGroup.weight(blLoop.vertex_index)
+
+                                        if Util.floatToString(boneWeight) != zeroWeight:
+                                            boneWeights.append((boneWeight, boneIndex))
+
+                                    except Exception:
+                                        # Util.warn("Error trying to export bone weight for vertex index %d (%r)" % (blLoop.vertex_index, boneWeightException))
+                                        pass
+
+                            # Strongest weights first. The strongest one is kept even if it's below the threshold.
+                            boneWeights.sort(key=lambda boneWeight: boneWeight[0], reverse=True)
+                            boneWeights = boneWeights[:1] + [boneWeight for boneWeight in boneWeights[1:self.bonesPerVertex]
+                                                             if boneWeight[0] >= self.blendWeightThreshold]
+
+                            for blendWeightIndex, (boneWeight, weightBoneIndex) in enumerate(boneWeights):
+                                blendWeightValue = [float(weightBoneIndex), boneWeight]
+                                attribute = VertexAttribute((blendWeightAttrName % blendWeightIndex), blendWeightValue)
 
                                 if not currentVertex.add(attribute):
                                     Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
-                        ############
 
-                        ############
-                        # Exporting bone weights. We only export at most 'self.bonesPerVertex' bones
-                        # for a single vertex.
-                        if self.exportArmature:
-                            zeroWeight = Util.floatToString(0.0)
-                            blendWeightAttrName = VertexAttribute.BLENDWEIGHT + "%d"
+                        # In the end we normalize the bone weights
+                        currentVertex.normalizeBlendWeight()
+                    ############
+
+                    # Sort vertex attributes to match default order for some devices
+                    currentVertex.sortAttributes()
+
+                    # Adding vertex to global pool of vertices. If vertex is already added
+                    # (it is shared by another polygon and has no different attributes) then the
+                    # already added vertex is returned instead.
+                    currentVertex = generatedMesh.addVertex(currentVertex)
+
+                    # Make this vertex part of this mesh part.
+                    currentMeshPart.addVertex(currentVertex)
+
+            # Add current part to final mesh
+            generatedMesh.addPart(currentMeshPart)
+            Util.debug("\nFinished creating mesh part.\nMesh part data:\n###\n{!r}\n###", currentMeshPart)
+
+        return generatedMesh, partBoneNames
+
+    @profile('weldMeshVertices')
+    def weldMeshVertices(self, mesh):
+        """Merges vertices that are equal within the weld tolerances and removes triangles that collapse"""
+        positions = []
+        normals = []
+        uvs = []
+        keys = []
+        for vertex in mesh.vertices:
+            normal = None
+            vertexUvs = []
+            key = []
+            for attr in vertex.attributes:
+                if attr.name == VertexAttribute.POSITION:
+                    positions.append(attr.value)
+                elif attr.name == VertexAttribute.NORMAL:
+                    normal = attr.value
+                elif attr.name.startswith(VertexAttribute.TEXCOORD, 0, len(VertexAttribute.TEXCOORD)):
+                    vertexUvs.extend(attr.value)
+                else:
+                    key.append((attr.name, tuple(Util.floatListToString(attr.value))))
+            normals.append(normal if normal is not None else (0.0, 0.0, 0.0))
+            uvs.append(vertexUvs)
+            keys.append(tuple(key))
+
+        remap = mesh_optimizer.weldVertices(positions, normals, uvs, keys, self.weldPositionTolerance,
+                                            math.cos(math.radians(self.weldNormalAngle)), self.weldUvTolerance)
+
+        welded = sum(1 for vertex, target in enumerate(remap) if vertex != target)
+        if welded == 0:
+            return
+
+        removedTriangles = 0
+        for meshPart in mesh.parts:
+            indices = [remap[index] for index in meshPart.getIndices()]
+            weldedIndices = mesh_optimizer.removeDegenerateTriangles(indices)
+            removedTriangles += (len(indices) - len(weldedIndices)) // 3
+            meshPart.setIndices(weldedIndices)
+
+        mesh.removeUnusedVertices()
+        Util.info("Mesh '{!s}' welded {:d} vertices, removing {:d} degenerate triangles", mesh.id, welded, removedTriangles)
+
+    @profile('reduceBlendWeights')
+    def reduceBlendWeights(self, mesh):
+        """
+        Finds the fewest BLENDWEIGHT attributes per vertex that drop at most 'self.blendWeightErrorBudget'
+        of the weight of any vertex, removing the weakest weights of all vertices down to that count.
+        """
+        blendWeightLength = len(VertexAttribute.BLENDWEIGHT)
+        vertexWeights = []
+        influences = 0
+        for vertex in mesh.vertices:
+            weights = [attr.value[1] for attr in vertex.attributes
+                       if attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, blendWeightLength)]
+            weights.sort(reverse=True)
+            vertexWeights.append(weights)
+            influences = max(influences, len(weights))
+
+        if influences <= 1:
+            return
+
+        # Weights are normalized, so what's left after the strongest ones is the error
+        keptInfluences = influences
+        maxError = 0.0
+        for count in range(1, influences):
+            error = max(sum(weights[count:]) for weights in vertexWeights)
+            if error <= self.blendWeightErrorBudget:
+                keptInfluences = count
+                maxError = error
+                break
+
+        if keptInfluences == influences:
+            return
+
+        for vertex in mesh.vertices:
+            keptAttributes = []
+            blendWeights = []
+            for attr in vertex.attributes:
+                if attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, blendWeightLength):
+                    blendWeights.append(attr.value)
+                else:
+                    keptAttributes.append(attr)
+
+            blendWeights.sort(key=lambda value: value[1], reverse=True)
+            blendWeights = blendWeights[:keptInfluences]
+            weightSum = sum(value[1] for value in blendWeights)
 
-                            armatureObj = currentObjNode.find_armature()
-                            if armatureObj is not None:
-                                boneIndex = -1
-                                blendWeightIndex = 0
+            for blendWeightIndex, value in enumerate(blendWeights):
+                if weightSum > 0.0:
+                    value = [value[0], value[1] / weightSum]
+                keptAttributes.append(VertexAttribute(VertexAttribute.BLENDWEIGHT + str(blendWeightIndex), value))
 
-                                for vertexGroupIndex in range(0, len(vertexGroupsForMaterial)):
-                                    vertexGroup = vertexGroupsForMaterial[vertexGroupIndex]
+            keptAttributes.sort(key=util.attributeSort)
+            vertex.attributes = keptAttributes
 
-                                    # We can only export this ammount of bones per vertex
-                                    if blendWeightIndex >= self.bonesPerVertex:
-                                        break
+        mesh.reindexVertices()
+        Util.info("Mesh '{!s}' reduced from {:d} to {:d} blend weights per vertex (largest dropped weight {:.3f})",
+                  mesh.id, influences, keptInfluences, maxError)
 
-                                    # Search for a bone with the same name as a vertex group
-                                    bone = None
-                                    try:
-                                        bone = armatureObj.data.bones[vertexGroup.name]
-                                    except:
-                                        bone = None
-                                        pass
+    @profile('extractRigidParts')
+    def extractRigidParts(self, mesh, blObject, blArmature, partBoneNames):
+        """
+        Removes from a mesh the parts with all vertices weighted entirely to one bone. They
+        are returned as meshes, one per bone, with vertices in the space of the bone and
+        without BLENDWEIGHT attributes.
+        """
+        blendWeightLength = len(VertexAttribute.BLENDWEIGHT)
+        rigidMeshes = OrderedDict()
+
+        for meshPart in list(mesh.parts):
+            boneNames = partBoneNames.get(meshPart.id)
+            if boneNames is None or meshPart.vertices is None or len(meshPart.vertices) == 0:
+                continue
 
-                                    if bone is not None:
-                                        boneIndex = boneIndex + 1
+            # Find the bone if all vertices have a single full weight to it
+            rigidBone = None
+            for vertex in meshPart.vertices:
+                vertexBones = [attr.value for attr in vertex.attributes
+                               if attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, blendWeightLength) and attr.value[1] != 0.0]
+                if len(vertexBones) != 1 or abs(vertexBones[0][1] - 1.0) > 0.0001:
+                    rigidBone = None
+                    break
+                if rigidBone is not None and rigidBone != int(vertexBones[0][0]):
+                    rigidBone = None
+                    break
+                rigidBone = int(vertexBones[0][0])
 
-                                        try:
-                                            # We get the weight associated with this vertex group. Zeros are ignored
-                                            boneWeight = vertexGroup.weight(blLoop.vertex_index)
+            if rigidBone is None or rigidBone >= len(boneNames):
+                continue
 
-                                            if Util.floatToString(boneWeight) != zeroWeight:
-                                                blendWeightValue = [float(boneIndex), boneWeight]
-                                                attribute = VertexAttribute((blendWeightAttrName % blendWeightIndex), blendWeightValue)
+            boneName = boneNames[rigidBone]
+            rigidMesh = rigidMeshes.get(boneName)
+            if rigidMesh is None:
+                rigidMesh = Mesh()
+                rigidMesh.id = "%s_rigid_%s" % (mesh.id, boneName)
+                rigidMeshes[boneName] = rigidMesh
+
+            # Inverse of the bind transform the node part would get for this bone
+            bakeMatrix = blArmature.data.bones[boneName].matrix_local.inverted() * blObject.matrix_local
+            normalMatrix = bakeMatrix.to_3x3().inverted().transposed()
+            tangentMatrix = bakeMatrix.to_3x3()
+
+            rigidPart = MeshPart(meshPartId=meshPart.id + "_rigid", meshType=meshPart.type)
+            bakedVertices = {}
+            for vertex in meshPart.vertices:
+                bakedVertex = bakedVertices.get(id(vertex))
+                if bakedVertex is None:
+                    bakedVertex = self.bakeVertex(vertex, bakeMatrix, normalMatrix, tangentMatrix)
+                    bakedVertex.attributes = [attr for attr in bakedVertex.attributes
+                                              if not attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, blendWeightLength)]
+                    bakedVertex = rigidMesh.addVertex(bakedVertex)
+                    bakedVertices[id(vertex)] = bakedVertex
+                rigidPart.addVertex(bakedVertex)
+            rigidMesh.addPart(rigidPart)
+
+            mesh.replacePart(meshPart, [])
+            self.meshPartRigid[meshPart.id] = (rigidPart.id, "%s__%s" % (blArmature.name, boneName))
+            Util.info("Mesh part '{!s}' is rigidly bound to bone '{!s}', exporting it without blend weights", meshPart.id, boneName)
+
+        if len(rigidMeshes) > 0:
+            mesh.removeUnusedVertices()
+
+        return list(rigidMeshes.values())
+
+    @profile('partitionMeshBones')
+    def partitionMeshBones(self, mesh):
+        """
+        Splits mesh parts influenced by more than 'self.maxBonesPerPart' bones. Each new part
+        has the suffix '_bones<n>' and its BLENDWEIGHT attributes index its own list of bones.
+        """
+        blendWeightLength = len(VertexAttribute.BLENDWEIGHT)
+        vertexBones = []
+        for vertex in mesh.vertices:
+            bones = set()
+            for attr in vertex.attributes:
+                if attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, blendWeightLength) and attr.value[1] != 0.0:
+                    bones.add(int(attr.value[0]))
+            vertexBones.append(bones)
+
+        # A triangle can use the bones of all its vertices, a lower limit would give a part per triangle
+        maxBones = self.maxBonesPerPart
+        if maxBones < self.bonesPerVertex * 3:
+            maxBones = self.bonesPerVertex * 3
+            Util.warn("Max bones per part {:d} is below the {:d} bones a triangle with {:d} weights per vertex can use, splitting mesh '{!s}' at {:d}",
+                      self.maxBonesPerPart, maxBones, self.bonesPerVertex, mesh.id, maxBones)
+
+        for meshPart in list(mesh.parts):
+            indices = meshPart.getIndices()
+
+            partBones = set()
+            for index in indices:
+                partBones.update(vertexBones[index])
+            if len(partBones) <= maxBones:
+                continue
 
-                                                if not currentVertex.add(attribute):
-                                                    Util.warn("Duplicate attribute found in vertex %d (%r), ignoring..." % (id(currentVertex), attribute))
-                                                else:
-                                                    blendWeightIndex = blendWeightIndex + 1
+            groups = mesh_optimizer.partitionTrianglesByBones(indices, vertexBones, maxBones)
+            Util.info("Mesh part '{!s}' uses {:d} bones, splitting it in {:d} parts", meshPart.id, len(partBones), len(groups))
+
+            overflowTriangles = sum(len(groupIndices) // 3 for groupBones, groupIndices in groups if len(groupBones) > maxBones)
+            if overflowTriangles > 0:
+                Util.warn("{:d} triangles of mesh part '{!s}' use more than {:d} bones, their parts are over the maximum",
+                          overflowTriangles, meshPart.id, maxBones)
+
+            newParts = []
+            palettes = []
+            for groupIndex, (groupBones, groupIndices) in enumerate(groups):
+                boneSlots = dict((bone, slot) for slot, bone in enumerate(groupBones))
+                newPart = MeshPart(meshPartId="%s_bones%d" % (meshPart.id, groupIndex), meshType=meshPart.type)
+
+                remappedVertices = {}
+                for index in groupIndices:
+                    remappedVertex = remappedVertices.get(index)
+                    if remappedVertex is None:
+                        remappedVertex = mesh.addVertex(self.remapVertexBones(mesh.vertices[index], boneSlots))
+                        remappedVertices[index] = remappedVertex
+                    newPart.addVertex(remappedVertex)
+
+                newParts.append(newPart)
+                palettes.append((newPart.id, groupBones))
+
+            mesh.replacePart(meshPart, newParts)
+            self.meshPartBonePalettes[meshPart.id] = palettes
+
+        mesh.removeUnusedVertices()
+
+    def remapVertexBones(self, vertex, boneSlots):
+        """Returns a copy of a vertex with BLENDWEIGHT bone indices replaced as mapped by 'boneSlots'"""
+        remappedVertex = Vertex()
+        for attr in vertex.attributes:
+            if attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, len(VertexAttribute.BLENDWEIGHT)) and attr.value[1] != 0.0:
+                remappedVertex.attributes.append(VertexAttribute(attr.name, [float(boneSlots[int(attr.value[0])]), attr.value[1]]))
+            else:
+                remappedVertex.attributes.append(attr)
+        return remappedVertex
+
+    @profile('optimizeMeshVertexCache')
+    def optimizeMeshVertexCache(self, mesh):
+        """Reorders the triangles of each part of a mesh to lower the average cache miss ratio (ACMR)"""
+        for meshPart in mesh.parts:
+            indices = meshPart.getIndices()
+            if len(indices) < 3:
+                continue
 
-                                        except Exception:
-                                            # Util.warn("Error trying to export bone weight for vertex index %d (%r)" % (blLoop.vertex_index, boneWeightException))
-                                            pass
+            acmrBefore = mesh_optimizer.calculateACMR(indices)
+            optimizedIndices = mesh_optimizer.optimizeVertexCache(indices, len(mesh.vertices))
+            acmrAfter = mesh_optimizer.calculateACMR(optimizedIndices)
 
-                            # In the end we normalize the bone weights
-                            currentVertex.normalizeBlendWeight()
-                        ############
+            # Polygon order may already be better than what we can do
+            if acmrAfter < acmrBefore:
+                meshPart.setIndices(optimizedIndices)
+            else:
+                acmrAfter = acmrBefore
 
-                        # Sort vertex attributes to match default order for some devices
-                        currentVertex.sortAttributes()
+            Util.info("Mesh part '{!s}' vertex cache ACMR: {:.3f} -> {:.3f}", meshPart.id, acmrBefore, acmrAfter)
 
-                        # Adding vertex to global pool of vertices. If vertex is already added
-                        # (it is shared by another polygon and has no different attributes) then the
-                        # already added vertex is returned instead.
-                        currentVertex = generatedMesh.addVertex(currentVertex)
+    @profile('optimizeMeshVertexFetch')
+    def optimizeMeshVertexFetch(self, mesh):
+        """Reorders the vertices of a mesh by first use across all of its parts"""
+        indexLists = [meshPart.getIndices() for meshPart in mesh.parts]
+        order, _ = mesh_optimizer.optimizeVertexFetch(indexLists, len(mesh.vertices))
 
-                        # Make this vertex part of this mesh part.
-                        currentMeshPart.addVertex(currentVertex)
+        # Parts point to vertex objects, so their indices follow the new order
+        mesh.reorderVertices(order)
 
-                # Add current part to final mesh
-                generatedMesh.addPart(currentMeshPart)
-                Util.debug("\nFinished creating mesh part.\nMesh part data:\n###\n{!r}\n###", currentMeshPart)
+    def getLodRatios(self):
+        """Parses the LOD ratios option, returning the fractions of triangles to keep from highest to lowest"""
+        ratios = []
+        for ratioText in self.lodRatios.split(","):
+            ratioText = ratioText.strip()
+            if ratioText == "":
+                continue
 
-            # Clean cloned mesh
-            bpy.data.objects.remove(currentObjNode)
-            bpy.data.meshes.remove(currentBlMesh)
+            try:
+                ratio = float(ratioText.rstrip("%")) / 100.0
+            except ValueError:
+                Util.warn("Ignoring invalid LOD ratio '{!s}'", ratioText)
+                continue
 
-            # Normalize attributes so mesh has same number of them for all vertices
-            generatedMesh.normalizeAttributes()
+            if ratio <= 0.0 or ratio >= 1.0:
+                Util.warn("Ignoring LOD ratio '{!s}', it must be between 0 and 100", ratioText)
+                continue
 
-            # Add generated mesh to returned list
+            ratios.append(ratio)
 
-            generatedMeshes.append(generatedMesh)
+        return sorted(set(ratios), reverse=True)
 
-        # Return list of all meshes
-        return generatedMeshes
+    @profile('generateMeshLods')
+    def generateMeshLods(self, mesh):
+        """
+        Simplifies a mesh to each of the LOD ratios. Each level is a new mesh with the
+        suffix '_lod<n>' added to the ids of the mesh and its parts.
+        """
+        positions = []
+        attributes = []
+        vertexWeights = []
+        boneSlots = {}
+
+        for vertex in mesh.vertices:
+            position = None
+            values = []
+            weights = {}
+
+            for attr in vertex.attributes:
+                if attr.name == VertexAttribute.POSITION:
+                    position = attr.value
+                elif attr.name.startswith(VertexAttribute.BLENDWEIGHT, 0, len(VertexAttribute.BLENDWEIGHT)):
+                    if attr.value[1] != 0.0:
+                        boneIndex = int(attr.value[0])
+                        weights[boneIndex] = weights.get(boneIndex, 0.0) + attr.value[1]
+                        boneSlots.setdefault(boneIndex, len(boneSlots))
+                elif attr.name == VertexAttribute.NORMAL or attr.name == VertexAttribute.COLOR \
+                        or attr.name.startswith(VertexAttribute.TEXCOORD, 0, len(VertexAttribute.TEXCOORD)):
+                    values.extend(attr.value)
+
+            positions.append(position)
+            attributes.append(values)
+            vertexWeights.append(weights)
+
+        # Skin weights are compared as one weight per bone used by the mesh
+        if len(boneSlots) > 0:
+            for values, weights in zip(attributes, vertexWeights):
+                denseWeights = [0.0] * len(boneSlots)
+                for boneIndex, weight in weights.items():
+                    denseWeights[boneSlots[boneIndex]] = weight
+                values.extend(denseWeights)
+
+        indexLists = [meshPart.getIndices() for meshPart in mesh.parts]
+        triangleCount = sum(len(indices) for indices in indexLists) // 3
+
+        lodMeshes = []
+        level = 0
+        previousCount = triangleCount
+        for ratio in self.getLodRatios():
+            # Each level starts from the previous one, it's the same result for less work
+            indexLists = mesh_optimizer.simplifyTriangles(indexLists, positions, attributes, max(1, int(triangleCount * ratio)))
+
+            simplifiedCount = sum(len(indices) for indices in indexLists) // 3
+            if simplifiedCount >= previousCount:
+                Util.info("Mesh '{!s}' can't be simplified below {:d} triangles, skipping LOD ratio {:.0%}", mesh.id, simplifiedCount, ratio)
+                break
+            previousCount = simplifiedCount
+            level = level + 1
+
+            lodMesh = Mesh()
+            lodMesh.id = "%s_lod%d" % (mesh.id, level)
+
+            for meshPart, indices in zip(mesh.parts, indexLists):
+                if len(indices) == 0:
+                    continue
+
+                lodPart = MeshPart(meshPartId="%s_lod%d" % (meshPart.id, level), meshType=meshPart.type)
+                for index in indices:
+                    lodPart.addVertex(lodMesh.addVertex(mesh.vertices[index]))
+                lodMesh.addPart(lodPart)
+
+                self.meshPartLods.setdefault(meshPart.id, {})[level] = lodPart.id
+
+            Util.info("Mesh '{!s}' LOD {:d}: {:d} -> {:d} triangles", mesh.id, level, triangleCount, simplifiedCount)
+            lodMeshes.append(lodMesh)
+
+        return lodMeshes
+
+    def isStaticObject(self, blObject):
+        """Tests if an object is not deformed by an armature and neither it or its parents are animated"""
+        if blObject.find_armature() is not None:
+            return False
+
+        currentObject = blObject
+        while currentObject is not None:
+            if currentObject.type == 'ARMATURE':
+                return False
+            if currentObject.animation_data is not None and currentObject.animation_data.action is not None:
+                return False
+            currentObject = currentObject.parent
+
+        return True
+
+    def canBatchObject(self, blObject):
+        """Tests if an object can be merged in a static batch. Objects with children keep their own node."""
+        return self.isStaticObject(blObject) and (blObject.children is None or len(blObject.children) == 0)
+
+    @profile('addToStaticBatches')
+    def addToStaticBatches(self, mesh, blObject):
+        """
+        Bakes the world transform of an object into a copy of the parts of its mesh and
+        adds them to the batches of their material and attribute layout.
+        """
+        worldMatrix = blObject.matrix_world
+        normalMatrix = worldMatrix.to_3x3().inverted().transposed()
+        tangentMatrix = worldMatrix.to_3x3()
+
+        # Mirrored objects would end up with their triangles facing inward
+        flipWinding = worldMatrix.determinant() < 0.0
+
+        bakedVertices = {}
+        for meshPart, blMaterial in zip(mesh.parts, blObject.data.materials):
+            if blMaterial is None or meshPart.vertices is None or len(meshPart.vertices) < 3:
+                continue
+
+            uvLayers = self.getUVLayerMappings(blObject.data, blMaterial)
+            batchKey = (blMaterial.name, tuple(mesh.getAttributes()), tuple(tuple(uvLayer) for uvLayer in uvLayers))
+
+            batchMeshes = self.staticBatches.get(batchKey)
+            if batchMeshes is None:
+                batchMeshes = []
+                self.staticBatches[batchKey] = batchMeshes
+
+            partVertices = []
+            for vertex in meshPart.vertices:
+                bakedVertex = bakedVertices.get(id(vertex))
+                if bakedVertex is None:
+                    bakedVertex = self.bakeVertex(vertex, worldMatrix, normalMatrix, tangentMatrix)
+                    bakedVertices[id(vertex)] = bakedVertex
+                partVertices.append(bakedVertex)
+
+            if flipWinding:
+                for base in range(0, len(partVertices) - 2, 3):
+                    partVertices[base + 1], partVertices[base + 2] = partVertices[base + 2], partVertices[base + 1]
+
+            # A batch is closed when the part would take it over what short indices can address
+            newVertexCount = len(set(id(vertex) for vertex in partVertices))
+            if len(batchMeshes) == 0 or len(batchMeshes[-1].vertices) + newVertexCount > mesh_optimizer.MAX_VERTICES:
+                batchMesh = Mesh()
+                batchMesh.id = "staticBatch%d" % sum(len(meshes) for meshes in self.staticBatches.values())
+                batchMesh.addPart(MeshPart(meshPartId=batchMesh.id + "_part0", meshType=meshPart.type))
+                batchMeshes.append(batchMesh)
+
+                batchNodePart = NodePart()
+                batchNodePart.meshPartId = batchMesh.parts[0].id
+                batchNodePart.materialId = blMaterial.name
+                for uvLayer in uvLayers:
+                    batchNodePart.addUVLayer(uvLayer)
+
+                batchNode = Node()
+                batchNode.id = batchMesh.id
+                self.staticBatchNodes.append((batchNode, batchNodePart))
+
+            batchMesh = batchMeshes[-1]
+            batchPart = batchMesh.parts[0]
+            for vertex in partVertices:
+                batchPart.addVertex(batchMesh.addVertex(vertex))
+
+        self.batchedObjectNames.add(blObject.name)
+
+    def generateStaticBatchMeshes(self):
+        """Returns the meshes of all static batches"""
+        batchMeshes = []
+        for meshes in self.staticBatches.values():
+            batchMeshes.extend(meshes)
+
+        if len(batchMeshes) > 0:
+            Util.info("Merged {:d} static objects in {:d} batches", len(self.batchedObjectNames), len(batchMeshes))
+
+        return batchMeshes
+
+    def bakeVertex(self, vertex, worldMatrix, normalMatrix, tangentMatrix):
+        """Returns a copy of a vertex with position, normal, tangent and binormal in world space"""
+        bakedVertex = Vertex()
+        for attr in vertex.attributes:
+            if attr.name == VertexAttribute.POSITION:
+                value = worldMatrix * mathutils.Vector(self.revertVectorCoordinate(attr.value))
+                bakedVertex.attributes.append(VertexAttribute(attr.name, self.convertVectorCoordinate(value)))
+            elif attr.name == VertexAttribute.NORMAL:
+                value = (normalMatrix * mathutils.Vector(self.revertVectorCoordinate(attr.value))).normalized()
+                bakedVertex.attributes.append(VertexAttribute(attr.name, self.convertVectorCoordinate(value)))
+            elif attr.name == VertexAttribute.TANGENT or attr.name == VertexAttribute.BINORMAL:
+                value = (tangentMatrix * mathutils.Vector(self.revertVectorCoordinate(attr.value))).normalized()
+                bakedVertex.attributes.append(VertexAttribute(attr.name, self.convertVectorCoordinate(value)))
+            else:
+                bakedVertex.attributes.append(attr)
+        return bakedVertex
+
+    @profile('chunkStaticMesh')
+    def chunkStaticMesh(self, mesh, worldMatrix):
+        """
+        Splits a mesh in cells of a world-space grid of 'self.chunkSize' sized cells. Each cell
+        is a new mesh with the suffix '_chunk<x>_<y>_<z>' added to the ids of the mesh and its parts,
+        with vertex positions relative to the center of the cell contents.
+        """
+        indexLists = [meshPart.getIndices() for meshPart in mesh.parts]
+
+        positions = []
+        worldPositions = []
+        for vertex in mesh.vertices:
+            position = self.getVertexPosition(vertex)
+            positions.append(position)
+            worldPositions.append(worldMatrix * mathutils.Vector(self.revertVectorCoordinate(position)))
+
+        # Triangles belong to the cell of their centroid
+        triangleCells = []
+        for indices in indexLists:
+            for base in range(0, len(indices) - 2, 3):
+                triangleCells.append(tuple(
+                    int(math.floor((worldPositions[indices[base]][axis] + worldPositions[indices[base + 1]][axis]
+                                    + worldPositions[indices[base + 2]][axis]) / (3.0 * self.chunkSize)))
+                    for axis in range(3)))
+
+        chunks = mesh_optimizer.partitionIndexLists(indexLists, triangleCells)
+        if len(chunks) <= 1:
+            return [mesh]
+
+        Util.info("Mesh '{!s}' split in {:d} chunks", mesh.id, len(chunks))
+
+        chunkMeshes = []
+        for cell, (chunkVertices, chunkLists) in chunks.items():
+            suffix = "_chunk%d_%d_%d" % cell
+
+            minimum = [min(positions[index][axis] for index in chunkVertices) for axis in range(3)]
+            maximum = [max(positions[index][axis] for index in chunkVertices) for axis in range(3)]
+            center = [(minimum[axis] + maximum[axis]) * 0.5 for axis in range(3)]
+
+            chunkMesh = Mesh()
+            chunkMesh.id = mesh.id + suffix
+
+            movedVertices = []
+            for index in chunkVertices:
+                position = positions[index]
+                movedVertex = self.copyVertex(mesh.vertices[index], [position[axis] - center[axis] for axis in range(3)])
+                movedVertices.append(chunkMesh.addVertex(movedVertex))
+
+            for partPosition, indices in chunkLists:
+                originalPart = mesh.parts[partPosition]
+
+                chunkPart = MeshPart(meshPartId=originalPart.id + suffix, meshType=originalPart.type)
+                for index in indices:
+                    chunkPart.addVertex(movedVertices[index])
+                chunkMesh.addPart(chunkPart)
+
+                self.meshPartChunks.setdefault(originalPart.id, []).append((suffix, chunkPart.id, center))
+
+            chunkMeshes.append(chunkMesh)
+
+        return chunkMeshes
+
+    def getVertexPosition(self, vertex):
+        for attr in vertex.attributes:
+            if attr.name == VertexAttribute.POSITION:
+                return attr.value
+        return None
+
+    def copyVertex(self, vertex, position):
+        """Returns a vertex with the same attributes of 'vertex', except for the position"""
+        copiedVertex = Vertex()
+        for attr in vertex.attributes:
+            if attr.name == VertexAttribute.POSITION:
+                copiedVertex.attributes.append(VertexAttribute(VertexAttribute.POSITION, position))
+            else:
+                copiedVertex.attributes.append(attr)
+        return copiedVertex
+
+    @profile('splitOversizedMesh')
+    def splitOversizedMesh(self, mesh):
+        """
+        Splits a mesh with more vertices than short indices can address in several meshes.
+        Returns a list with the resulting meshes (only the mesh itself if it's small enough).
+        """
+        if len(mesh.vertices) <= mesh_optimizer.MAX_VERTICES:
+            return [mesh]
+
+        indexLists = [meshPart.getIndices() for meshPart in mesh.parts]
+        chunks = mesh_optimizer.splitIndexLists(indexLists, mesh_optimizer.MAX_VERTICES)
+
+        Util.warn("Mesh '{!s}' has {:d} vertices, splitting it in {:d} meshes", mesh.id, len(mesh.vertices), len(chunks))
+
+        splitMeshes = []
+        for chunkIndex, (chunkVertices, chunkLists) in enumerate(chunks):
+            splitMesh = Mesh()
+            splitMesh.id = "%s_split%d" % (mesh.id, chunkIndex)
+
+            for vertexPosition in chunkVertices:
+                splitMesh.addVertex(mesh.vertices[vertexPosition])
+
+            for partPosition, indices in chunkLists:
+                originalPart = mesh.parts[partPosition]
+
+                splitPart = MeshPart(meshPartId="%s_split%d" % (originalPart.id, chunkIndex), meshType=originalPart.type)
+                splitMesh.addPart(splitPart)
+                splitPart.setIndices(indices)
+
+                self.meshPartSplits.setdefault(originalPart.id, []).append(splitPart.id)
+
+            splitMeshes.append(splitMesh)
+
+        return splitMeshes
+
+    def isExportedTextureSlot(self, blTexSlot):
+        """Tests if a material texture slot is exported as a texture"""
+        return not (blTexSlot is None or blTexSlot.texture_coords != 'UV' or blTexSlot.texture.type != 'IMAGE' or blTexSlot.texture.__class__ is not bpy.types.ImageTexture)
+
+    def getExportedUVLayers(self, blMesh):
+        """
+        Returns the indices of the UV layers of a mesh that are exported as TEXCOORD attributes.
+        If 'self.stripUnusedAttributes' is set those are only the layers some material texture is mapped to.
+        """
+        if blMesh.uv_layers is None:
+            return []
+
+        if not self.stripUnusedAttributes:
+            return list(range(len(blMesh.uv_layers)))
+
+        usedUvLayers = []
+        for uvIndex in range(len(blMesh.uv_layers)):
+            for blMaterial in blMesh.materials:
+                if blMaterial is not None and len(self.getTexturesOfUVLayer(blMesh, blMaterial, uvIndex)) > 0:
+                    usedUvLayers.append(uvIndex)
+                    break
+
+        return usedUvLayers
+
+    def meshUsesNormalMaps(self, blMesh):
+        """Tests if any material of a mesh has a NORMAL or BUMP texture, which need tangents and binormals"""
+        for blMaterial in blMesh.materials:
+            if blMaterial is None:
+                continue
+
+            for blTexSlot in blMaterial.texture_slots:
+                if self.isExportedTextureSlot(blTexSlot) and blTexSlot.use_map_normal:
+                    return True
+
+        return False
+
+    def meshUsesVertexColors(self, blMesh):
+        """Tests if any material of a mesh is painted or lit by vertex colors"""
+        for blMaterial in blMesh.materials:
+            if blMaterial is not None and (blMaterial.use_vertex_color_paint or blMaterial.use_vertex_color_light):
+                return True
+
+        return False
+
+    def getUVLayerMappings(self, blMesh, blMaterial):
+        """Returns, for each exported UV layer of a mesh, the indices of the material textures mapped to it"""
+        return [self.getTexturesOfUVLayer(blMesh, blMaterial, uvIndex) for uvIndex in self.getExportedUVLayers(blMesh)]
+
+    def getTexturesOfUVLayer(self, blMesh, blMaterial, uvIndex):
+        """Returns the indices of the material textures mapped to a UV layer of a mesh"""
+        blUvLayer = blMesh.uv_layers[uvIndex]
+        currentTexCoord = []
+
+        for texIndex in range(len(blMaterial.texture_slots)):
+            blTexSlot = blMaterial.texture_slots[texIndex]
+
+            if not self.isExportedTextureSlot(blTexSlot):
+                continue
+
+            if (blTexSlot.uv_layer == blUvLayer.name or (blTexSlot.uv_layer == "" and uvIndex == 0)):
+                currentTexCoord.append(texIndex)
+
+        return currentTexCoord
+
+    def addRigidNodePart(self, node, nodePart, rigidPartId, boneNodeId):
+        """Adds a node part for a rigid mesh part to the node of 'node' parented to the bone"""
+        rigidNodeId = "%s_rigid_%s" % (node.id, boneNodeId)
+        rigidNode = None
+        for pendingBoneNodeId, pendingNode in self.rigidNodes:
+            if pendingNode.id == rigidNodeId:
+                rigidNode = pendingNode
+                break
+
+        if rigidNode is None:
+            rigidNode = Node()
+            rigidNode.id = rigidNodeId
+            self.rigidNodes.append((boneNodeId, rigidNode))
+
+        rigidNodePart = NodePart()
+        rigidNodePart.meshPartId = rigidPartId
+        rigidNodePart.materialId = nodePart.materialId
+        if nodePart.uvLayers is not None:
+            for uvLayer in nodePart.uvLayers:
+                rigidNodePart.addUVLayer(uvLayer)
+
+        for splitNodePart in self.splitNodePart(rigidNodePart):
+            rigidNode.addPart(splitNodePart)
+
+    def findNode(self, nodes, nodeId):
+        """Searches a node and its descendants by id"""
+        if nodes is None:
+            return None
+
+        for node in nodes:
+            if node.id == nodeId:
+                return node
+
+            foundNode = self.findNode(node.children, nodeId)
+            if foundNode is not None:
+                return foundNode
+
+        return None
+
+    def partitionNodePart(self, nodePart):
+        """
+        Returns the node parts for the parts a mesh part was split into by bones, each with
+        only the bones it uses, or only the node part itself if it wasn't split.
+        Node parts of meshes exported only once reference the exported mesh parts.
+        """
+        palettes = self.meshPartBonePalettes.get(nodePart.meshPartId)
+        if palettes is None:
+            partitionedNodeParts = [nodePart]
+        else:
+            partitionedNodeParts = []
+            for partId, palette in palettes:
+                partitionedNodePart = self.copyNodePart(nodePart, partId)
+                if nodePart.bones is not None:
+                    # BLENDWEIGHT attributes of the part index the palette, so every slot needs its bone
+                    missingBones = [bone for bone in palette if bone >= len(nodePart.bones)]
+                    if len(missingBones) > 0:
+                        raise ValueError("Mesh part '%s' is weighted to bones %s, but its node part only binds %d bones"
+                                         % (partId, missingBones, len(nodePart.bones)))
+                    partitionedNodePart.setBones([nodePart.bones[bone] for bone in palette])
+                partitionedNodeParts.append(partitionedNodePart)
+
+        for partitionedNodePart in partitionedNodeParts:
+            partitionedNodePart.meshPartId = self.meshPartAliases.get(partitionedNodePart.meshPartId, partitionedNodePart.meshPartId)
+
+        return partitionedNodeParts
+
+    def copyNodePart(self, nodePart, meshPartId):
+        """Returns a node part like the given one, but referencing another mesh part"""
+        copiedNodePart = NodePart()
+        copiedNodePart.meshPartId = meshPartId
+        copiedNodePart.materialId = nodePart.materialId
+
+        if nodePart.uvLayers is not None:
+            for uvLayer in nodePart.uvLayers:
+                copiedNodePart.addUVLayer(uvLayer)
+
+        if nodePart.bones is not None:
+            for bone in nodePart.bones:
+                copiedNodePart.addBone(bone)
+
+        return copiedNodePart
+
+    def splitNodePart(self, nodePart):
+        """Returns copies of a node part for each mesh part that replaced the one it references"""
+        splitPartIds = self.meshPartSplits.get(nodePart.meshPartId)
+        if splitPartIds is None:
+            return [nodePart]
+
+        return [self.copyNodePart(nodePart, splitPartId) for splitPartId in splitPartIds]
+
+    def generateChunkNodes(self, node, nodeParts):
+        """
+        Returns the child nodes holding the grid cells the node parts were split into.
+        Node parts that weren't split are added to 'node' itself.
+        """
+        chunkNodes = OrderedDict()
+        for nodePart in nodeParts:
+            chunks = self.meshPartChunks.get(nodePart.meshPartId)
+            if chunks is None:
+                for splitNodePart in self.splitNodePart(nodePart):
+                    node.addPart(splitNodePart)
+                continue
+
+            for suffix, chunkPartId, center in chunks:
+                chunkNode = chunkNodes.get(suffix)
+                if chunkNode is None:
+                    chunkNode = Node()
+                    chunkNode.id = node.id + suffix
+                    chunkNode.translation = center
+                    chunkNodes[suffix] = chunkNode
+
+                for splitNodePart in self.splitNodePart(self.copyNodePart(nodePart, chunkPartId)):
+                    chunkNode.addPart(splitNodePart)
+
+        return list(chunkNodes.values())
+
+    def generateLodNodes(self, node, nodeParts):
+        """Returns a node for each level of detail of the node parts, with the same transform as 'node'"""
+        levels = set()
+        for nodePart in nodeParts:
+            levels.update(self.meshPartLods.get(nodePart.meshPartId, {}).keys())
+
+        lodNodes = []
+        for level in sorted(levels):
+            lodNode = Node()
+            lodNode.id = "%s_lod%d" % (node.id, level)
+            lodNode.translation = node.translation
+            lodNode.rotation = node.rotation
+            lodNode.scale = node.scale
+
+            for nodePart in nodeParts:
+                lodPartId = self.meshPartLods.get(nodePart.meshPartId, {}).get(level)
+                if lodPartId is None:
+                    continue
+
+                for splitNodePart in self.splitNodePart(self.copyNodePart(nodePart, lodPartId)):
+                    lodNode.addPart(splitNodePart)
 
-    @profile('generateMaterials')
+            lodNodes.append(lodNode)
+
+        return lodNodes
+
+    @profile('generateMaterials', memory=True)
     def generateMaterials(self, context):
         """Read and returns all materials used by the exported objects"""
         generatedMaterials = []
@@ -546,7 +1750,7 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
 
         return generatedMaterials
 
-    @profile('generateNodes')
+    @profile('generateNodes', memory=True)
     def generateNodes(self, context, parent=None, parentName=""):
         """Generates object nodes that attach mesh parts, materials and bones together"""
         generatedNodes = []
@@ -575,6 +1779,10 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
                 if blNode.type == 'MESH':
                     if (self.useSelection and not blNode.select):
                         continue
+
+                    # Batched objects are drawn by the batch nodes
+                    if blNode.name in self.batchedObjectNames:
+                        continue
                 elif blNode.type == 'ARMATURE':
                     if not self.exportArmature:
                         continue
@@ -647,111 +1855,135 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
                     Util.warn("Ignored mesh %r, no materials found" % currentBlMesh)
                     continue
                 
+                # Node parts before splitting, used to generate LOD nodes
+                meshNodeParts = []
+
                 # We apply the mesh modifiers to a cloned mesh. Modifiers that duplicate
                 # vertices (like Mirror modifier) need this so when we scan vertex groups these
                 # vertices are considered real and we know which vertex groups they are weighted to
                 clonedAppliedModifiersNode = blNode.copy()
                 clonedAppliedModifiersMesh = clonedAppliedModifiersNode.to_mesh(context.scene, self.applyModifiers, 'PREVIEW', calc_tessface=False)
-                self.meshTriangulate(clonedAppliedModifiersMesh)
-                clonedAppliedModifiersNode.data = clonedAppliedModifiersMesh
+                try:
+                    self.meshTriangulate(clonedAppliedModifiersMesh)
+                    clonedAppliedModifiersNode.data = clonedAppliedModifiersMesh
 
-                for blMaterialIndex in range(0, len(currentBlMesh.materials)):
-                    currentBlMaterial = currentBlMesh.materials[blMaterialIndex]
-                    if currentBlMaterial is None:
-                        continue
+                    for blMaterialIndex in range(0, len(currentBlMesh.materials)):
+                        currentBlMaterial = currentBlMesh.materials[blMaterialIndex]
+                        if currentBlMaterial is None:
+                            continue
 
-                    nodePart = NodePart()
+                        nodePart = NodePart()
 
-                    currentBlMeshName = currentBlMesh.name
-                    nodePart.meshPartId = currentBlMeshName + "_part" + str(blMaterialIndex)
+                        currentBlMeshName = currentBlMesh.name
+                        nodePart.meshPartId = currentBlMeshName + "_part" + str(blMaterialIndex)
 
-                    nodePart.materialId = currentBlMaterial.name
+                        nodePart.materialId = currentBlMaterial.name
 
-                    # Maps material textures to the TEXCOORD attributes
-                    for uvIndex in range(len(currentBlMesh.uv_layers)):
-                        blUvLayer = currentBlMesh.uv_layers[uvIndex]
-                        currentTexCoord = []
+                        # Maps material textures to the TEXCOORD attributes
+                        for currentTexCoord in self.getUVLayerMappings(currentBlMesh, currentBlMaterial):
+                            nodePart.addUVLayer(currentTexCoord)
 
-                        for texIndex in range(len(currentBlMaterial.texture_slots)):
-                            blTexSlot = currentBlMaterial.texture_slots[texIndex]
+                        # Start writing bones
+                        if self.exportArmature and len(blNode.vertex_groups) > 0:
 
-                            if (blTexSlot is None or blTexSlot.texture_coords != 'UV' or blTexSlot.texture.type != 'IMAGE' or blTexSlot.texture.__class__ is not bpy.types.ImageTexture):
-                                continue
+                            # Getting only the vertex groups associated with this node part. We use our cloned mesh with applied modifiers for this
+                            vertexGroupsForMaterial = self.listPartVertexGroups(clonedAppliedModifiersNode, clonedAppliedModifiersMesh, blMaterialIndex)
 
-                            if (blTexSlot.uv_layer == blUvLayer.name or (blTexSlot.uv_layer == "" and uvIndex == 0)):
-                                currentTexCoord.append(texIndex)
+                            for blVertexGroup in vertexGroupsForMaterial:
+                                # Try to find an armature with a bone associated with this vertex group
+                                blArmature = blNode.find_armature()
+                                if blArmature is not None:
+                                    blArmature = blNode.parent.data
+                                    try:
+                                        bone = blArmature.bones[blVertexGroup.name]
 
-                        # Adding UV mappings to this node part
-                        nodePart.addUVLayer(currentTexCoord)
+                                        # Referencing the bone node
+                                        currentBone = Bone()
+                                        currentBone.node = ("%s__%s" % (blNode.parent.name, blVertexGroup.name))
 
-                    # Start writing bones
-                    if self.exportArmature and len(blNode.vertex_groups) > 0:
+                                        boneTransformMatrix = blNode.matrix_local.inverted() * bone.matrix_local
+                                        boneLocation, boneQuaternion, boneScale = boneTransformMatrix.decompose()
 
-                        # Getting only the vertex groups associated with this node part. We use our cloned mesh with applied modifiers for this
-                        vertexGroupsForMaterial = self.listPartVertexGroups(clonedAppliedModifiersNode, clonedAppliedModifiersMesh, blMaterialIndex)
+                                        if not self.testDefaultTransform(boneLocation):
+                                            currentBone.translation = self.convertVectorCoordinate(boneLocation)
 
-                        for blVertexGroup in vertexGroupsForMaterial:
-                            # Try to find an armature with a bone associated with this vertex group
-                            blArmature = blNode.find_armature()
-                            if blArmature is not None:
-                                blArmature = blNode.parent.data
-                                try:
-                                    bone = blArmature.bones[blVertexGroup.name]
+                                        if not self.testDefaultQuaternion(boneQuaternion):
+                                            currentBone.rotation = self.convertQuaternionCoordinate(boneQuaternion)
 
-                                    # Referencing the bone node
-                                    currentBone = Bone()
-                                    currentBone.node = ("%s__%s" % (blNode.parent.name, blVertexGroup.name))
+                                        if not self.testDefaultScale(boneScale):
+                                            currentBone.scale = self.convertScaleCoordinate(boneScale)
 
-                                    boneTransformMatrix = blNode.matrix_local.inverted() * bone.matrix_local
-                                    boneLocation, boneQuaternion, boneScale = boneTransformMatrix.decompose()
+                                        # Appending resulting bone to part
+                                        nodePart.addBone(currentBone)
 
-                                    if not self.testDefaultTransform(boneLocation):
-                                        currentBone.translation = self.convertVectorCoordinate(boneLocation)
+                                    except KeyError:
+                                        Util.warn("Vertex group %s has no corresponding bone" % (blVertexGroup.name))
+                                        pass
+                                    except:
+                                        Util.error("Unexpected error exporting bone: %s" % blVertexGroup.name)
+                                        pass
 
-                                    if not self.testDefaultQuaternion(boneQuaternion):
-                                        currentBone.rotation = self.convertQuaternionCoordinate(boneQuaternion)
+                        # Rigid parts are drawn by nodes under their bone
+                        rigidPart = self.meshPartRigid.get(nodePart.meshPartId)
+                        if rigidPart is not None:
+                            self.addRigidNodePart(currentNode, nodePart, rigidPart[0], rigidPart[1])
+                            continue
 
-                                    if not self.testDefaultScale(boneScale):
-                                        currentBone.scale = self.convertScaleCoordinate(boneScale)
+                        meshNodeParts.extend(self.partitionNodePart(nodePart))
+                finally:
+                    # Clean up cloned meshes, also if generating the node parts failed or the export was cancelled
+                    bpy.data.objects.remove(clonedAppliedModifiersNode)
+                    bpy.data.meshes.remove(clonedAppliedModifiersMesh)
 
-                                    # Appending resulting bone to part
-                                    nodePart.addBone(currentBone)
-
-                                except KeyError:
-                                    Util.warn("Vertex group %s has no corresponding bone" % (blVertexGroup.name))
-                                    pass
-                                except:
-                                    Util.error("Unexpected error exporting bone: %s" % blVertexGroup.name)
-                                    pass
-
-                    # Adding this node part to the current node
-                    currentNode.addPart(nodePart)
-                
-                # Clean up cloned meshes
-                bpy.data.objects.remove(clonedAppliedModifiersNode)
-                bpy.data.meshes.remove(clonedAppliedModifiersMesh)
+                # Adding the node parts to the current node, or to the chunks they were split into
+                chunkNodes = self.generateChunkNodes(currentNode, meshNodeParts)
 
             # If this node is a parent, export it's children
             if blNode.children is not None and len(blNode.children) > 0:
                 childNodes = self.generateNodes(context, blNode, parentName)
                 currentNode.children = childNodes
 
+            if not isinstance(blNode, bpy.types.Bone) and blNode.type == 'MESH':
+                for chunkNode in chunkNodes:
+                    currentNode.addChild(chunkNode)
+
             # Adding the current generated node to the list of nodes
             generatedNodes.append(currentNode)
 
+            # Levels of detail are siblings of the node they simplify
+            if not isinstance(blNode, bpy.types.Bone) and blNode.type == 'MESH':
+                generatedNodes.extend(self.generateLodNodes(currentNode, meshNodeParts))
+
+        if parent is None:
+            # Bone nodes are only complete now, rigid nodes can be parented to them
+            for boneNodeId, rigidNode in self.rigidNodes:
+                boneNode = self.findNode(generatedNodes, boneNodeId)
+                if boneNode is None:
+                    Util.warn("Bone node '{!s}' not exported, '{!s}' will be a root node", boneNodeId, rigidNode.id)
+                    generatedNodes.append(rigidNode)
+                else:
+                    boneNode.addChild(rigidNode)
+
+            # Static batches are root nodes, their vertices are already in world space
+            for batchNode, batchNodePart in self.staticBatchNodes:
+                for chunkNode in self.generateChunkNodes(batchNode, [batchNodePart]):
+                    batchNode.addChild(chunkNode)
+                generatedNodes.append(batchNode)
+
         return generatedNodes
 
+    @profile('generateAnimations', memory=True)
     def generateAnimations(self, context):
         # TODO Detect if certain curve uses linear interpolation. If yes then
         # we can safely just save keyframes as LibGDX also uses linear interpolation
         """If selected by the user, generates keyframed animations for the bones"""
+        return self.runSteps(self.animationSteps(context))
+
+    def animationSteps(self, context):
+        """Steps of 'generateAnimations', one per action and armature. Returns the list of animations."""
         generatedAnimations = []
         Util.info("Exporting animations")
 
-        # Save our time per currentFrameNumber (in miliseconds)
-        fps = context.scene.render.fps
-        frameTime = (1 / fps) * 1000
-
         # For each action we export currentFrameNumber data.
         # We are exporting all actions, but to avoid exporting deleted actions (actions with ZERO users)
         # each action must have at least one user. In Blender user the FAKE USER option to assign at least
@@ -783,92 +2015,19 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
                     if not doExportArmature:
                         continue
 
-                    for blBone in blArmature.data.bones:
-                        currentBone = NodeAnimation()
-                        currentBone.boneId = ("%s__%s" % (blArmature.name, blBone.name))
-
-                        translationFCurve = self.findFCurve(blAction, blBone, self.P_LOCATION)
-                        rotationFCurve = self.findFCurve(blAction, blBone, self.P_ROTATION)
-                        scaleFCurve = self.findFCurve(blAction, blBone, self.P_SCALE)
-
-                        # Rest transform of this bone, used as reference to calculate frames
-                        restTransform = self.getTransformFromBone(blBone)
-
-                        frameStart = context.scene.frame_start
-                        for currentFrameNumber in range(int(blAction.frame_range[0]), int(blAction.frame_range[1] + 1)):
-                            currentKeyframe = Keyframe()
-
-                            translationVector = [0.0] * 3
-                            rotationVector = [0.0] * 4
-                            rotationVector[0] = 1.0
-                            scaleVector = [1.0] * 3
-
-                            mustEvaluateTranslation = self.mustEvaluateKeyframe(translationFCurve, float(currentFrameNumber))
-                            if translationFCurve is not None and translationFCurve != ([None] * 3) and mustEvaluateTranslation:
-                                if translationFCurve[0] is not None:
-                                    translationVector[0] = translationFCurve[0].evaluate(currentFrameNumber)
-                                if translationFCurve[1] is not None:
-                                    translationVector[1] = translationFCurve[1].evaluate(currentFrameNumber)
-                                if translationFCurve[2] is not None:
-                                    translationVector[2] = translationFCurve[2].evaluate(currentFrameNumber)
-
-                            mustEvaluateRotation = self.mustEvaluateKeyframe(rotationFCurve, float(currentFrameNumber))
-                            if rotationFCurve is not None and rotationFCurve != ([None] * 4) and mustEvaluateRotation:
-                                if rotationFCurve[0] is not None:
-                                    rotationVector[0] = rotationFCurve[0].evaluate(currentFrameNumber)
-                                if rotationFCurve[1] is not None:
-                                    rotationVector[1] = rotationFCurve[1].evaluate(currentFrameNumber)
-                                if rotationFCurve[2] is not None:
-                                    rotationVector[2] = rotationFCurve[2].evaluate(currentFrameNumber)
-                                if rotationFCurve[3] is not None:
-                                    rotationVector[3] = rotationFCurve[3].evaluate(currentFrameNumber)
-
-                            mustEvaluateScale = self.mustEvaluateKeyframe(scaleFCurve, float(currentFrameNumber))
-                            if scaleFCurve is not None and scaleFCurve != ([None] * 3) and mustEvaluateScale:
-                                if scaleFCurve[0] is not None:
-                                    scaleVector[0] = scaleFCurve[0].evaluate(currentFrameNumber)
-                                if scaleFCurve[1] is not None:
-                                    scaleVector[1] = scaleFCurve[1].evaluate(currentFrameNumber)
-                                if scaleFCurve[2] is not None:
-                                    scaleVector[2] = scaleFCurve[2].evaluate(currentFrameNumber)
-
-                            poseTransform = self.createTransformMatrix(translationVector, rotationVector, scaleVector)
-                            translationVector, rotationVector, scaleVector = (restTransform * poseTransform).decompose()
-
-                            # If one of the transform attributes had to be evaluated above then this
-                            # is a keyframe, otherwise it's on rest pose and we don't need the keyframe
-                            if mustEvaluateTranslation:
-                                currentKeyframe.translation = list(translationVector)
-
-                            if mustEvaluateScale:
-                                currentKeyframe.scale = list(scaleVector)
-
-                            if mustEvaluateRotation:
-                                currentKeyframe.rotation = list(rotationVector)
-
-                            # If we have at least one attribute changed in that currentFrameNumber, we store it
-                            if currentKeyframe.translation is not None \
-                                    or currentKeyframe.rotation is not None \
-                                    or currentKeyframe.scale is not None:
-                                currentKeyframe.keytime = (currentFrameNumber - frameStart) * frameTime
-                                currentBone.addKeyframe(currentKeyframe)
-
-                        # If there is at least one currentFrameNumber for this bone, add it's data
-                        if currentBone.keyframes is not None and len(currentBone.keyframes) > 0:
-                            # We operated with Blender coordinates the entire time, now we convert
-                            # to the target coordinates
-                            for currentFrameNumber in currentBone.keyframes:
-                                if currentFrameNumber.translation is not None:
-                                    currentFrameNumber.translation = self.convertVectorCoordinate(currentFrameNumber.translation)
-
-                                if currentFrameNumber.rotation is not None:
-                                    currentFrameNumber.rotation = self.convertQuaternionCoordinate(currentFrameNumber.rotation)
-
-                                if currentFrameNumber.scale is not None:
-                                    currentFrameNumber.scale = self.convertScaleCoordinate(currentFrameNumber.scale)
-
-                            # Finally add bone node to animation
-                            currentAnimation.addBone(currentBone)
+                    yield "Exporting action '%s' of '%s'" % (blAction.name, blArmature.name)
+
+                    self.exportMetrics.countActionFrames(blAction.name, int(blAction.frame_range[1]) - int(blAction.frame_range[0]) + 1)
+
+                    # Bone animations are taken from a cache if the action and the bones didn't change
+                    with span("action", "%s/%s" % (blAction.name, blArmature.name)):
+                        boneAnimations = self.getCachedResult(("animation", blAction.name, blArmature.name, self.optionsCacheKey),
+                                                              [blAction.name, blArmature.name, blArmature.data.name, context.scene.name],
+                                                              lambda: self.getAnimationCacheKey(context, blAction, blArmature),
+                                                              lambda: self.generateArmatureAnimation(context, blAction, blArmature))
+
+                    for currentBone in boneAnimations:
+                        currentAnimation.addBone(currentBone)
 
                 # If this action animates at least one bone, add it to the list of actions
                 if currentAnimation.bones is not None and len(currentAnimation.bones) > 0:
@@ -877,6 +2036,88 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
         # Finally return the generated animations
         return generatedAnimations
 
+    @profile('generateArmatureAnimation')
+    def generateArmatureAnimation(self, context, blAction, blArmature):
+        """Returns the keyframes an action sets on each bone of an armature"""
+        boneAnimations = []
+
+        # Save our time per currentFrameNumber (in miliseconds)
+        fps = context.scene.render.fps
+        frameTime = (1 / fps) * 1000
+
+        for blBone in blArmature.data.bones:
+            currentBone = NodeAnimation()
+            currentBone.boneId = ("%s__%s" % (blArmature.name, blBone.name))
+
+            translationFCurve = self.findFCurve(blAction, blBone, self.P_LOCATION)
+            rotationFCurve = self.findFCurve(blAction, blBone, self.P_ROTATION)
+            scaleFCurve = self.findFCurve(blAction, blBone, self.P_SCALE)
+
+            # Rest transform of this bone, used as reference to calculate frames
+            restTransform = self.getTransformFromBone(blBone)
+
+            frameStart = context.scene.frame_start
+            for currentFrameNumber in range(int(blAction.frame_range[0]), int(blAction.frame_range[1] + 1)):
+                translationVector = [0.0] * 3
+                rotationVector = [0.0] * 4
+                rotationVector[0] = 1.0
+                scaleVector = [1.0] * 3
+
+                mustEvaluateTranslation = self.mustEvaluateKeyframe(translationFCurve, float(currentFrameNumber))
+                if translationFCurve is not None and translationFCurve != ([None] * 3) and mustEvaluateTranslation:
+                    if translationFCurve[0] is not None:
+                        translationVector[0] = translationFCurve[0].evaluate(currentFrameNumber)
+                    if translationFCurve[1] is not None:
+                        translationVector[1] = translationFCurve[1].evaluate(currentFrameNumber)
+                    if translationFCurve[2] is not None:
+                        translationVector[2] = translationFCurve[2].evaluate(currentFrameNumber)
+
+                mustEvaluateRotation = self.mustEvaluateKeyframe(rotationFCurve, float(currentFrameNumber))
+                if rotationFCurve is not None and rotationFCurve != ([None] * 4) and mustEvaluateRotation:
+                    if rotationFCurve[0] is not None:
+                        rotationVector[0] = rotationFCurve[0].evaluate(currentFrameNumber)
+                    if rotationFCurve[1] is not None:
+                        rotationVector[1] = rotationFCurve[1].evaluate(currentFrameNumber)
+                    if rotationFCurve[2] is not None:
+                        rotationVector[2] = rotationFCurve[2].evaluate(currentFrameNumber)
+                    if rotationFCurve[3] is not None:
+                        rotationVector[3] = rotationFCurve[3].evaluate(currentFrameNumber)
+
+                mustEvaluateScale = self.mustEvaluateKeyframe(scaleFCurve, float(currentFrameNumber))
+                if scaleFCurve is not None and scaleFCurve != ([None] * 3) and mustEvaluateScale:
+                    if scaleFCurve[0] is not None:
+                        scaleVector[0] = scaleFCurve[0].evaluate(currentFrameNumber)
+                    if scaleFCurve[1] is not None:
+                        scaleVector[1] = scaleFCurve[1].evaluate(currentFrameNumber)
+                    if scaleFCurve[2] is not None:
+                        scaleVector[2] = scaleFCurve[2].evaluate(currentFrameNumber)
+
+                # If one of the transform attributes had to be evaluated above then this
+                # is a keyframe, otherwise it's on rest pose and we don't need the keyframe
+                if not (mustEvaluateTranslation or mustEvaluateRotation or mustEvaluateScale):
+                    continue
+
+                poseTransform = self.createTransformMatrix(translationVector, rotationVector, scaleVector)
+                translationVector, rotationVector, scaleVector = (restTransform * poseTransform).decompose()
+
+                currentBone.addKeyframe((currentFrameNumber - frameStart) * frameTime,
+                                        translation=translationVector if mustEvaluateTranslation else None,
+                                        rotation=rotationVector if mustEvaluateRotation else None,
+                                        scale=scaleVector if mustEvaluateScale else None)
+
+            # If there is at least one currentFrameNumber for this bone, add it's data
+            if currentBone.keyframeCount > 0:
+                # We operated with Blender coordinates the entire time, now we convert
+                # each track to the target coordinates at once
+                currentBone.translations = self.convertTrackCoordinate(currentBone.translations, self.vector3AxisMapper, ("x", "y", "z"))
+                currentBone.rotations = self.convertTrackCoordinate(currentBone.rotations, self.vector4AxisMapper, ("x", "y", "z", "w"))
+                currentBone.scales = self.convertTrackCoordinate(currentBone.scales, self.vector3AxisMapper, ("x", "y", "z"), keepSign=False)
+
+                # Finally add bone node to animation
+                boneAnimations.append(currentBone)
+
+        return boneAnimations
+
     # ## UTILITY METHODS
     def getCompatiblePath(self, path):
         baseFolder = bpy.path.abspath("//")
@@ -945,6 +2186,13 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
         newCo = [(co[self.vector3AxisMapper["x"]["coPos"]] * self.vector3AxisMapper["x"]["sign"]), (co[self.vector3AxisMapper["y"]["coPos"]] * self.vector3AxisMapper["y"]["sign"]), (co[self.vector3AxisMapper["z"]["coPos"]] * self.vector3AxisMapper["z"]["sign"])]
         return newCo
 
+    def revertVectorCoordinate(self, co):
+        """Converts a vector from the destination axis back to Blender axis (Z-up)"""
+        newCo = [0.0, 0.0, 0.0]
+        for axisIndex, axis in enumerate(("x", "y", "z")):
+            newCo[self.vector3AxisMapper[axis]["coPos"]] = co[axisIndex] * self.vector3AxisMapper[axis]["sign"]
+        return newCo
+
     def convertQuaternionCoordinate(self, co):
         """
         Converts quaternions from Blender axis (Z-up) to the destination axis (usually Z-forward Y-up)
@@ -954,6 +2202,21 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
         return [(co[self.vector4AxisMapper["x"]["coPos"]] * self.vector4AxisMapper["x"]["sign"]), (co[self.vector4AxisMapper["y"]["coPos"]] * self.vector4AxisMapper["y"]["sign"]),
                 (co[self.vector4AxisMapper["z"]["coPos"]] * self.vector4AxisMapper["z"]["sign"]), (co[self.vector4AxisMapper["w"]["coPos"]] * self.vector4AxisMapper["w"]["sign"])]
 
+    def convertTrackCoordinate(self, track, axisMapper, axes, keepSign=True):
+        """
+        Converts an array of vectors laid out one after another, like 'convertVectorCoordinate',
+        'convertQuaternionCoordinate' or (with 'keepSign' unset) 'convertScaleCoordinate' convert each
+        of them. Each destination axis is copied from its source axis as one strided slice.
+        """
+        width = len(axes)
+        convertedTrack = array('d', track)
+        for axisIndex, axis in enumerate(axes):
+            axisValues = track[axisMapper[axis]["coPos"]::width]
+            if keepSign and axisMapper[axis]["sign"] < 0.0:
+                axisValues = array('d', map(operator.neg, axisValues))
+            convertedTrack[axisIndex::width] = axisValues
+        return convertedTrack
+
     def convertScaleCoordinate(self, co):
         """
         Converts Blender axis (Z-up) to the destination axis (usually Z-forward Y-up)
@@ -1090,6 +2353,194 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
             and transform[1] == 0.0 \
             and transform[2] == 0.0
 
+    def getOptionsCacheKey(self):
+        """Values of the export options that change exported data, part of every cache key"""
+        return repr([(name, getattr(self, name)) for name in self.order if name not in self.cacheIgnoredOptions]
+                    + [self.axis_forward, self.axis_up])
+
+    def watchExportedFile(self, context):
+        """Registers the exported file with the watcher, with the datablocks it was exported from"""
+        options = dict((name, getattr(self, name)) for name in self.order if name != "check_existing")
+        options["axis_forward"] = self.axis_forward
+        options["axis_up"] = self.axis_up
+
+        # Only what changed since is read again, and the watcher needs the export done when the operator returns
+        options["useSessionCache"] = True
+        options["exportInBackground"] = False
+
+        dependencies = set()
+        for blObject in bpy.data.objects:
+            if self.useSelection and not blObject.select:
+                continue
+
+            dependencies.add(blObject.name)
+            if blObject.type == 'MESH':
+                dependencies.update(self.getMeshDependencies(blObject))
+            elif blObject.data is not None:
+                dependencies.add(blObject.data.name)
+
+        if self.exportAnimation:
+            dependencies.update(blAction.name for blAction in bpy.data.actions)
+
+        watch_mode.WATCHER.watch(self.filepath, self.bl_idname, options, dependencies, not self.useSelection, self.watchDelay)
+
+    def getCachedResult(self, sessionKey, dependencies, getCacheKey, build):
+        """
+        Returns what 'build' returns, unless the session cache or the export cache already have it.
+        The session cache finds results by 'sessionKey' and drops them when a datablock named in
+        'dependencies' changes. 'getCacheKey' is only called if the export cache is used.
+        """
+        if self.useSessionCache:
+            value = export_cache.SESSION_CACHE.get(sessionKey)
+            if value is not None:
+                return value
+
+        cacheKey = None
+        value = None
+        if self.exportCache is not None:
+            cacheKey = getCacheKey()
+            value = self.exportCache.get(cacheKey)
+
+        if value is None:
+            value = build()
+            if value is None:
+                return None
+
+            if cacheKey is not None:
+                self.exportCache.put(cacheKey, value)
+
+        if self.useSessionCache:
+            export_cache.SESSION_CACHE.put(sessionKey, dependencies, value)
+
+        return value
+
+    def getMeshDependencies(self, blObject):
+        """Names of the datablocks 'buildMesh' reads for an object"""
+        dependencies = [blObject.name, blObject.data.name]
+        dependencies.extend(blMaterial.name for blMaterial in blObject.data.materials if blMaterial is not None)
+
+        armature = blObject.find_armature()
+        if armature is not None:
+            dependencies.extend((armature.name, armature.data.name))
+
+        if self.applyModifiers:
+            for modifier in blObject.modifiers:
+                for rnaProperty in modifier.bl_rna.properties:
+                    if rnaProperty.type == 'POINTER' and rnaProperty.identifier != "rna_type":
+                        value = getattr(modifier, rnaProperty.identifier)
+                        if isinstance(value, bpy.types.ID):
+                            dependencies.append(value.name)
+
+        return dependencies
+
+    def getMeshCacheKey(self, blObject, rigidArmature):
+        """Hash of everything 'buildMesh' reads to build the mesh of an object"""
+        blMesh = blObject.data
+        cacheKey = export_cache.CacheKey("mesh", self.optionsCacheKey, blMesh.name, rigidArmature is not None)
+        self.addMeshDataToCacheKey(cacheKey, blMesh)
+
+        # Modifiers are applied to the exported mesh, so their settings and the objects they
+        # use matter too
+        if self.applyModifiers:
+            for modifier in blObject.modifiers:
+                cacheKey.add(modifier.name, modifier.type, modifier.show_viewport)
+                if modifier.show_viewport:
+                    self.addRnaToCacheKey(cacheKey, modifier, set([blObject.name]))
+
+        # Weights are read from vertex groups named after bones
+        armature = blObject.find_armature()
+        if self.exportArmature and armature is not None:
+            cacheKey.add([bone.name for bone in armature.data.bones], [vertexGroup.name for vertexGroup in blObject.vertex_groups])
+
+            groupIndices = array('i')
+            groupWeights = array('f')
+            for blVertex in blMesh.vertices:
+                groupIndices.append(len(blVertex.groups))
+                for groupElement in blVertex.groups:
+                    groupIndices.append(groupElement.group)
+                    groupWeights.append(groupElement.weight)
+            cacheKey.addBuffer(groupIndices)
+            cacheKey.addBuffer(groupWeights)
+
+        # Materials decide which attributes are exported
+        cacheKey.add([(blMaterial.name, blMaterial.type) if blMaterial is not None else None for blMaterial in blMesh.materials],
+                     self.getExportedUVLayers(blMesh), self.meshUsesNormalMaps(blMesh), self.meshUsesVertexColors(blMesh))
+
+        return cacheKey.hexdigest()
+
+    def addMeshDataToCacheKey(self, cacheKey, blMesh):
+        cacheKey.add(len(blMesh.vertices), len(blMesh.loops), len(blMesh.polygons))
+        self.addCollectionToCacheKey(cacheKey, blMesh.vertices, "co", 3)
+        self.addCollectionToCacheKey(cacheKey, blMesh.vertices, "normal", 3)
+        self.addCollectionToCacheKey(cacheKey, blMesh.loops, "vertex_index", 1, 'i')
+        self.addCollectionToCacheKey(cacheKey, blMesh.loops, "normal", 3)
+        for polygonAttribute in ("loop_start", "loop_total", "material_index", "use_smooth"):
+            self.addCollectionToCacheKey(cacheKey, blMesh.polygons, polygonAttribute, 1, 'i')
+        self.addCollectionToCacheKey(cacheKey, blMesh.polygons, "normal", 3)
+
+        for uvLayer in blMesh.uv_layers:
+            cacheKey.add(uvLayer.name)
+            self.addCollectionToCacheKey(cacheKey, uvLayer.data, "uv", 2)
+
+        colorMap = blMesh.vertex_colors.active
+        if colorMap is not None:
+            cacheKey.add(colorMap.name)
+            self.addCollectionToCacheKey(cacheKey, colorMap.data, "color", 3)
+
+        if blMesh.shape_keys is not None:
+            for keyBlock in blMesh.shape_keys.key_blocks:
+                cacheKey.add(keyBlock.name, keyBlock.value, keyBlock.mute)
+                self.addCollectionToCacheKey(cacheKey, keyBlock.data, "co", 3)
+
+    def addCollectionToCacheKey(self, cacheKey, collection, attribute, size, typecode='f'):
+        """Adds one attribute of all items of a Blender collection"""
+        buffer = array(typecode, [0]) * (len(collection) * size)
+        collection.foreach_get(attribute, buffer)
+        cacheKey.addBuffer(buffer)
+
+    def addRnaToCacheKey(self, cacheKey, blStruct, visitedObjects):
+        """Adds the properties of a Blender struct, like a modifier, and the objects it points to"""
+        for rnaProperty in blStruct.bl_rna.properties:
+            if rnaProperty.identifier == "rna_type" or rnaProperty.type == 'COLLECTION':
+                continue
+
+            value = getattr(blStruct, rnaProperty.identifier)
+            if rnaProperty.type == 'POINTER':
+                if isinstance(value, bpy.types.Object):
+                    cacheKey.add(rnaProperty.identifier, value.name, [tuple(row) for row in value.matrix_world])
+                    if value.name in visitedObjects:
+                        continue
+                    visitedObjects.add(value.name)
+
+                    if value.type == 'MESH':
+                        self.addMeshDataToCacheKey(cacheKey, value.data)
+                    elif value.type == 'ARMATURE' and value.pose is not None:
+                        cacheKey.add([[tuple(row) for row in poseBone.matrix] for poseBone in value.pose.bones])
+                else:
+                    cacheKey.add(rnaProperty.identifier, getattr(value, "name", None))
+            elif getattr(rnaProperty, "is_array", False):
+                cacheKey.add(rnaProperty.identifier, tuple(value))
+            else:
+                cacheKey.add(rnaProperty.identifier, value)
+
+    def getAnimationCacheKey(self, context, blAction, blArmature):
+        """Hash of everything 'generateArmatureAnimation' reads"""
+        scene = context.scene
+        cacheKey = export_cache.CacheKey("animation", self.optionsCacheKey, blArmature.name, scene.render.fps, scene.frame_start,
+                                         tuple(blAction.frame_range))
+
+        cacheKey.add([(bone.name, bone.parent.name if bone.parent is not None else None, [tuple(row) for row in bone.matrix_local])
+                      for bone in blArmature.data.bones])
+
+        for fcurve in blAction.fcurves:
+            cacheKey.add(fcurve.data_path, fcurve.array_index, fcurve.extrapolation,
+                         [(keyframe.interpolation, tuple(keyframe.co), tuple(keyframe.handle_left), tuple(keyframe.handle_right))
+                          for keyframe in fcurve.keyframe_points])
+            for fcurveModifier in fcurve.modifiers:
+                self.addRnaToCacheKey(cacheKey, fcurveModifier, set())
+
+        return cacheKey.hexdigest()
+
     def setupAxisConversion(self, axisForward, axisUp):
 
         self.vector3AxisMapper["x"] = {}
@@ -1238,37 +2689,3 @@ class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
                 self.vector4AxisMapper["y"]["coPos"] = 1
                 self.vector3AxisMapper["y"]["sign"] = 1.0
                 self.vector4AxisMapper["y"]["sign"] = 1.0
-
-
-class G3DBExporterOperator(bpy.types.Operator, G3DBaseExporterOperator):
-    bl_idname = "export_json_g3d.g3db"
-    bl_label = "G3DB Exporter"
-    bl_options = {'PRESET'}
-
-    filename_ext = ".g3db"
-    
-    oldFormatJson = BoolProperty(
-        name="Use Old UBJSON Datatypes",
-        description="Use the old UBJSON datatype sizes. LibGDX loads the old format by default.",
-        default=True
-    )
-    
-    order = [
-        "filepath",
-        "check_existing",
-        "useSelection",
-        "applyModifiers",
-        "exportArmature",
-        "bonesPerVertex",
-        "exportAnimation",
-        "generateTangentBinormal",
-        "oldFormatJson",
-    ]
-
-
-class G3DJExporterOperator(bpy.types.Operator, G3DBaseExporterOperator):
-    bl_idname = "export_json_g3d.g3dj"
-    bl_label = "G3DJ Exporter"
-    bl_options = {'PRESET'}
-
-    filename_ext = ".g3dj"
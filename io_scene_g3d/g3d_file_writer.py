@@ -19,6 +19,7 @@
 # <pep8 compliant>
 
 import json
+import os
 
 from collections import OrderedDict
 
@@ -26,13 +27,35 @@ from io_scene_g3d import util, simpleubjson
 from io_scene_g3d.util import Util
 from io_scene_g3d.domain_classes import G3DModel
 from io_scene_g3d.g3dj_json_encoder import G3DJsonEncoder
-from io_scene_g3d.profile import profile
+from io_scene_g3d.profile import profile, span
+
+
+def writeFileAtomically(filepath, data, mode):
+    """
+    Writes 'data' to a temporary file next to 'filepath' and renames it over the
+    target, so programs reloading the file never read it half written.
+    """
+    temporaryPath = "%s.%d.tmp" % (filepath, os.getpid())
+    try:
+        with open(temporaryPath, mode) as output_file:
+            output_file.write(data)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        os.replace(temporaryPath, filepath)
+    except Exception:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
 
 class G3DBaseWriter(object):
 
     ordered = True
 
-    @profile('export')
+    # Bytes each top level section ("meshes", "nodes", ...) took in the last written file
+    sectionBytes = None
+
+    @profile('mountJsonOutput', memory=True)
     def mountJsonOutput(self, g3dModel):
         if g3dModel is None or not isinstance(g3dModel, G3DModel):
             raise TypeError("'g3dModel' must be of type G3DModel")
@@ -56,10 +79,9 @@ class G3DBaseWriter(object):
 
                 meshSection["attributes"] = mesh.getAttributes()
 
-                meshSection["vertices"] = []
-                for vertex in mesh.vertices:
-                    for attr in vertex.attributes:
-                        meshSection["vertices"].extend(Util.limitFloatListPrecision(attr.value))
+                # The exporter packs meshes as it finishes them, this only packs meshes built elsewhere
+                mesh.pack()
+                meshSection["vertices"] = mesh.buffer.tolist()
 
                 meshSection["parts"] = []
                 for part in mesh.parts:
@@ -70,12 +92,7 @@ class G3DBaseWriter(object):
 
                     partSection["id"] = part.id
                     partSection["type"] = part.type
-                    partSection["indices"] = []
-
-                    if part.vertices is not None:
-                        for vertex in part.vertices:
-                            vertexIndex = mesh.getVertexIndex(vertex)
-                            partSection["indices"].append(vertexIndex)
+                    partSection["indices"] = part.indices.tolist()
 
                     meshSection["parts"].append(partSection)
 
@@ -159,25 +176,32 @@ class G3DBaseWriter(object):
                         boneSection["boneId"] = bone.boneId
                         boneSection["keyframes"] = []
 
-                        if bone.keyframes is not None:
-                            for keyframe in bone.keyframes:
-                                if self.ordered:
-                                    keyframeSection = OrderedDict()
-                                else:
-                                    keyframeSection = {}
+                        # Tracks are converted to lists once and sliced for each keyframe
+                        translations = bone.translations.tolist()
+                        rotations = bone.rotations.tolist()
+                        scales = bone.scales.tolist()
+                        translationMask = bone.translationMask
+                        rotationMask = bone.rotationMask
+                        scaleMask = bone.scaleMask
+
+                        for index, keytime in enumerate(bone.keytimes.tolist()):
+                            if self.ordered:
+                                keyframeSection = OrderedDict()
+                            else:
+                                keyframeSection = {}
 
-                                keyframeSection["keytime"] = keyframe.keytime
+                            keyframeSection["keytime"] = keytime
 
-                                if keyframe.translation is not None:
-                                    keyframeSection["translation"] = keyframe.translation
+                            if translationMask[index]:
+                                keyframeSection["translation"] = translations[index * 3:index * 3 + 3]
 
-                                if keyframe.rotation is not None:
-                                    keyframeSection["rotation"] = keyframe.rotation
+                            if rotationMask[index]:
+                                keyframeSection["rotation"] = rotations[index * 4:index * 4 + 4]
 
-                                if keyframe.scale is not None:
-                                    keyframeSection["scale"] = keyframe.scale
+                            if scaleMask[index]:
+                                keyframeSection["scale"] = scales[index * 3:index * 3 + 3]
 
-                                boneSection["keyframes"].append(keyframeSection)
+                            boneSection["keyframes"].append(keyframeSection)
 
                         animationSection["bones"].append(boneSection)
 
@@ -254,13 +278,30 @@ class G3DJWriter(G3DBaseWriter):
 
     ordered = True
 
+    @profile('G3DJWriter.export', memory=True)
     def export(self, g3dModel, filepath):
         baseModel = self.mountJsonOutput(g3dModel)
 
-        output_file = open(filepath, 'w')
-        json_output = json.dumps(baseModel, indent=2, sort_keys=False, cls=G3DJsonEncoder, float_round=util.FLOAT_ROUND)
-        output_file.write(json_output)
-        output_file.close()
+        with span("encodeJson", memory=True):
+            json_output = json.dumps(baseModel, indent=2, sort_keys=False, cls=G3DJsonEncoder, float_round=util.FLOAT_ROUND)
+            self.sectionBytes = self.measureSections(baseModel, json_output)
+
+        with span("writeFile", memory=True):
+            writeFileAtomically(filepath, json_output, 'w')
+
+    def measureSections(self, baseModel, jsonOutput):
+        """
+        Finds where each top level key starts in the indented output. Escaping keeps line breaks
+        out of strings, so only top level keys start a line with two spaces of indentation.
+        """
+        starts = []
+        position = 0
+        for key in baseModel:
+            position = jsonOutput.index('\n  %s: ' % json.dumps(key), position)
+            starts.append(position)
+        starts.append(len(jsonOutput))
+
+        return OrderedDict((key, starts[keyIndex + 1] - starts[keyIndex]) for keyIndex, key in enumerate(baseModel))
 
 
 class G3DBWriter(G3DBaseWriter):
@@ -272,16 +313,32 @@ class G3DBWriter(G3DBaseWriter):
     def __init__(self, old_format=True):
         self.oldFormat = old_format
 
+    @profile('G3DBWriter.export', memory=True)
     def export(self, g3dModel, filepath):
         baseModel = self.mountJsonOutput(g3dModel)
 
-        output_file = open(filepath, 'wb')
-        
-        simpleubjson.old_format_json = self.oldFormat
-        outputdata = simpleubjson.encode(data=baseModel)
-        output_file.write(outputdata)
-        output_file.close()
+        with span("encodeUbjson", memory=True):
+            outputdata = self.encodeSections(baseModel)
+
+        with span("writeFile", memory=True):
+            writeFileAtomically(filepath, outputdata, 'wb')
 
         if util.LOG_LEVEL >= util._DEBUG_:
-            simpleubjson.set_datatype_format(self.oldFormat)
-            simpleubjson.pprint(outputdata)
+            simpleubjson.pprint(outputdata, old_format=self.oldFormat)
+
+    def encodeSections(self, baseModel):
+        """
+        Encodes the model one top level section at a time, counting the bytes of each. UBJSON
+        values don't depend on what contains them, so the output is the same as encoding it whole.
+        """
+        emptyObject = simpleubjson.encode(data=OrderedDict(), old_format=self.oldFormat)
+
+        self.sectionBytes = OrderedDict()
+        sections = []
+        for key, value in baseModel.items():
+            # Leave out the braces of the single key object
+            section = memoryview(simpleubjson.encode(data=OrderedDict([(key, value)]), old_format=self.oldFormat))[1:-1]
+            self.sectionBytes[key] = len(section)
+            sections.append(section)
+
+        return emptyObject[:1] + bytes().join(sections) + emptyObject[1:]
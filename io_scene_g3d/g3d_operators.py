@@ -0,0 +1,382 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Operators of the export menu. They only hold the export options, the exporter
+itself (g3d_exporter) and everything it imports load on the first export, so
+enabling the add-on and starting Blender stay fast.
+"""
+
+import bpy
+from bpy.props import BoolProperty, IntProperty, FloatProperty, StringProperty
+from bpy_extras.io_utils import ExportHelper, orientation_helper_factory
+
+IOG3DOrientationHelper = orientation_helper_factory("IOG3DOrientationHelper", axis_forward='-Z', axis_up='Y')
+
+
+class G3DBaseExporterOperator(ExportHelper, IOG3DOrientationHelper):
+    # Exporter running the current export
+    exporter = None
+
+    filename_ext = ""
+
+    useSelection = BoolProperty(
+        name="Selection Only",
+        description="Export only selected objects",
+        default=False
+    )
+    
+    applyModifiers = BoolProperty(
+        name="Apply Modifiers",
+        description="Apply modifiers to each mesh before exporting, doesn't affect original meshes",
+        default=True
+    )
+
+    exportArmature = BoolProperty(
+        name="Export Armatures",
+        description="Export armature nodes (bones)",
+        default=True
+    )
+
+    bonesPerVertex = IntProperty(
+        name="Bone Weights per Vertex",
+        description="Maximum number of BLENDWEIGHT attributes per vertex. LibGDX default is 4.",
+        default=4,
+        soft_min=1, soft_max=8
+    )
+
+    blendWeightThreshold = FloatProperty(
+        name="Blend Weight Threshold",
+        description="Bone weights below this value are not exported",
+        default=0.01,
+        min=0.0, max=1.0
+    )
+
+    blendWeightErrorBudget = FloatProperty(
+        name="Blend Weight Error Budget",
+        description="Largest total weight that can be dropped from a vertex so its mesh uses fewer BLENDWEIGHT attributes",
+        default=0.05,
+        min=0.0, max=1.0
+    )
+
+    maxBonesPerPart = IntProperty(
+        name="Max Bones per Part",
+        description="Split skinned mesh parts so each uses at most this many bones, no fewer than three times "
+                    "the bone weights per vertex. 0 doesn't split parts.",
+        default=0,
+        min=0, soft_max=64
+    )
+
+    bakeRigidParts = BoolProperty(
+        name="Bake Rigid Parts",
+        description="Export mesh parts weighted entirely to one bone without blend weights, as nodes parented to the bone",
+        default=False
+    )
+
+    exportAnimation = BoolProperty(
+        name="Export Actions as Animations",
+        description="Export bone actions as animations",
+        default=True,
+    )
+
+    generateTangentBinormal = BoolProperty(
+        name="Calculate Tangent and Binormal Vectors",
+        description="Calculate and export tangent and binormal vectors for normal mapping. Requires UV mapping the mesh.",
+        default=False
+    )
+
+    stripUnusedAttributes = BoolProperty(
+        name="Strip Unused Attributes",
+        description="Don't export UV layers, tangents and vertex colors no material of the mesh uses",
+        default=False
+    )
+
+    weldVertices = BoolProperty(
+        name="Weld Vertices",
+        description="Merge vertices whose position, normal and UV are equal within the weld tolerances",
+        default=False
+    )
+
+    weldPositionTolerance = FloatProperty(
+        name="Weld Distance",
+        description="Largest distance between welded vertices",
+        default=0.0001,
+        min=0.0, precision=5
+    )
+
+    weldNormalAngle = FloatProperty(
+        name="Weld Normal Angle",
+        description="Largest angle in degrees between normals of welded vertices",
+        default=1.0,
+        min=0.0, max=180.0
+    )
+
+    weldUvTolerance = FloatProperty(
+        name="Weld UV Distance",
+        description="Largest difference between UV coordinates of welded vertices",
+        default=0.0001,
+        min=0.0, precision=5
+    )
+
+    optimizeVertexCache = BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder the triangles of each mesh part so the GPU can reuse recently transformed vertices",
+        default=False
+    )
+
+    optimizeVertexFetch = BoolProperty(
+        name="Optimize Vertex Fetch",
+        description="Reorder mesh vertices by the order they are first used by the mesh parts",
+        default=False
+    )
+
+    generateLods = BoolProperty(
+        name="Generate LODs",
+        description="Export simplified copies of each mesh, with matching nodes, as levels of detail",
+        default=False
+    )
+
+    lodRatios = StringProperty(
+        name="LOD Ratios",
+        description="Comma separated percentages of triangles kept by each level of detail",
+        default="50,25,10"
+    )
+
+    chunkStaticMeshes = BoolProperty(
+        name="Chunk Static Meshes",
+        description="Split meshes of objects that can't move or deform in world-space grid cells, each with its own node",
+        default=False
+    )
+
+    chunkSize = FloatProperty(
+        name="Chunk Size",
+        description="Size of the world-space grid cells used to split static meshes",
+        default=10.0,
+        min=0.01
+    )
+
+    mergeIdenticalMeshes = BoolProperty(
+        name="Merge Identical Meshes",
+        description="Export meshes with the same content only once, even if they are different mesh datablocks",
+        default=True
+    )
+
+    batchStaticMeshes = BoolProperty(
+        name="Batch Static Meshes",
+        description="Merge objects that can't move or deform into world-space meshes, one node per material",
+        default=False
+    )
+
+    useSessionCache = BoolProperty(
+        name="Reuse Results in Session",
+        description="Keep meshes and animations in memory between exports, recomputing only those of objects changed since",
+        default=False
+    )
+
+    sessionCacheSize = IntProperty(
+        name="Session Cache Size (MB)",
+        description="Memory used to keep meshes and animations between exports",
+        default=256,
+        min=1
+    )
+
+    useExportCache = BoolProperty(
+        name="Use Export Cache",
+        description="Keep meshes and animations on disk between exports, only recomputing those whose data or export options changed",
+        default=False
+    )
+
+    exportCacheDirectory = StringProperty(
+        name="Export Cache Folder",
+        description="Folder of the export cache, it must not be writable by other users. If empty a folder in the Blender user data is used",
+        default="",
+        subtype='DIR_PATH'
+    )
+
+    exportCacheSize = IntProperty(
+        name="Export Cache Size (MB)",
+        description="Least recently used entries are deleted when the export cache grows above this size",
+        default=512,
+        min=1
+    )
+
+    exportInBackground = BoolProperty(
+        name="Export in Background",
+        description="Export in small steps with a progress bar, keeping Blender responsive. Press Esc to cancel.",
+        default=False
+    )
+
+    watchForChanges = BoolProperty(
+        name="Watch for Changes",
+        description="Export this file again, with the same options, whenever objects exported to it change",
+        default=False
+    )
+
+    watchDelay = FloatProperty(
+        name="Watch Delay",
+        description="Seconds without further changes before a watched file is exported again",
+        default=1.0,
+        min=0.0, soft_max=10.0
+    )
+
+    profileExport = BoolProperty(
+        name="Profile Export",
+        description="Write the time taken by each export stage next to the exported file, as JSON and as a Chrome trace",
+        default=False
+    )
+
+    writeExportReport = BoolProperty(
+        name="Write Export Report",
+        description="Write statistics of the exported model (vertices, indices, bones, keyframes, bytes per section) "
+                    "next to the exported file as JSON",
+        default=False
+    )
+
+    trackMemory = BoolProperty(
+        name="Track Memory",
+        description="Add the Python heap used by each export stage, and where it was allocated, to the export report. "
+                    "Slows the export down a lot",
+        default=False
+    )
+    
+    # This is overriden by the G3DB subclass of this exporter. For the G3DJ this isn't
+    # used and is here with it's default value to pass to methods.
+    oldFormatJson = True
+
+    order = [
+        "filepath",
+        "check_existing",
+        "useSelection",
+        "applyModifiers",
+        "exportArmature",
+        "bonesPerVertex",
+        "blendWeightThreshold",
+        "blendWeightErrorBudget",
+        "maxBonesPerPart",
+        "bakeRigidParts",
+        "exportAnimation",
+        "generateTangentBinormal",
+        "stripUnusedAttributes",
+        "weldVertices",
+        "weldPositionTolerance",
+        "weldNormalAngle",
+        "weldUvTolerance",
+        "optimizeVertexCache",
+        "optimizeVertexFetch",
+        "generateLods",
+        "lodRatios",
+        "chunkStaticMeshes",
+        "chunkSize",
+        "mergeIdenticalMeshes",
+        "batchStaticMeshes",
+        "useSessionCache",
+        "sessionCacheSize",
+        "useExportCache",
+        "exportCacheDirectory",
+        "exportCacheSize",
+        "exportInBackground",
+        "watchForChanges",
+        "watchDelay",
+        "profileExport",
+        "writeExportReport",
+        "trackMemory",
+    ]
+
+    # Options that don't change exported data, left out of cache keys
+    cacheIgnoredOptions = ("filepath", "check_existing", "useSessionCache", "sessionCacheSize", "useExportCache",
+                           "exportCacheDirectory", "exportCacheSize", "exportInBackground", "watchForChanges",
+                           "watchDelay", "profileExport", "writeExportReport",
+                           "trackMemory")
+
+    def execute(self, context):
+        from io_scene_g3d import g3d_exporter
+        self.exporter = g3d_exporter.G3DExporter(self)
+        return self.finishStep(self.exporter.execute(context))
+
+    def modal(self, context, event):
+        return self.finishStep(self.exporter.modal(context, event))
+
+    def finishStep(self, result):
+        """Lets go of the exporter, and the model it holds, once the export ended"""
+        if 'RUNNING_MODAL' not in result and 'PASS_THROUGH' not in result:
+            self.exporter = None
+        return result
+
+
+class G3DBExporterOperator(bpy.types.Operator, G3DBaseExporterOperator):
+    bl_idname = "export_json_g3d.g3db"
+    bl_label = "G3DB Exporter"
+    bl_options = {'PRESET'}
+
+    filename_ext = ".g3db"
+    
+    oldFormatJson = BoolProperty(
+        name="Use Old UBJSON Datatypes",
+        description="Use the old UBJSON datatype sizes. LibGDX loads the old format by default.",
+        default=True
+    )
+    
+    order = [
+        "filepath",
+        "check_existing",
+        "useSelection",
+        "applyModifiers",
+        "exportArmature",
+        "bonesPerVertex",
+        "blendWeightThreshold",
+        "blendWeightErrorBudget",
+        "maxBonesPerPart",
+        "bakeRigidParts",
+        "exportAnimation",
+        "generateTangentBinormal",
+        "stripUnusedAttributes",
+        "weldVertices",
+        "weldPositionTolerance",
+        "weldNormalAngle",
+        "weldUvTolerance",
+        "optimizeVertexCache",
+        "optimizeVertexFetch",
+        "generateLods",
+        "lodRatios",
+        "chunkStaticMeshes",
+        "chunkSize",
+        "mergeIdenticalMeshes",
+        "batchStaticMeshes",
+        "useSessionCache",
+        "sessionCacheSize",
+        "useExportCache",
+        "exportCacheDirectory",
+        "exportCacheSize",
+        "exportInBackground",
+        "watchForChanges",
+        "watchDelay",
+        "profileExport",
+        "writeExportReport",
+        "trackMemory",
+        "oldFormatJson",
+    ]
+
+
+class G3DJExporterOperator(bpy.types.Operator, G3DBaseExporterOperator):
+    bl_idname = "export_json_g3d.g3dj"
+    bl_label = "G3DJ Exporter"
+    bl_options = {'PRESET'}
+
+    filename_ext = ".g3dj"
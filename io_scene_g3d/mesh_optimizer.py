@@ -0,0 +1,636 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Index buffer optimizations. Functions here work on plain lists of triangle
+indices so they don't depend on how meshes are stored.
+"""
+
+import heapq
+import math
+from collections import OrderedDict
+
+# Size of the simulated cache used to rank triangles
+CACHE_SIZE = 32
+
+# Size of the FIFO cache used to report ACMR, close to the post-transform
+# caches of mobile GPUs
+ACMR_CACHE_SIZE = 16
+
+# Short indices can address at most this many vertices
+MAX_VERTICES = 65535
+
+# How much attribute differences (UV, normal, blend weights) weight against
+# geometric error when simplifying, relative to the size of the mesh
+ATTRIBUTE_WEIGHT = 0.01
+
+# Simplification won't rotate a triangle's normal further than this (cosine)
+_MIN_NORMAL_DOT = 0.2
+
+# Scoring constants from Tom Forsyth's "Linear-Speed Vertex Cache Optimisation"
+_CACHE_DECAY_POWER = 1.5
+_LAST_TRIANGLE_SCORE = 0.75
+_VALENCE_BOOST_SCALE = 2.0
+_VALENCE_BOOST_POWER = 0.5
+_MAX_VALENCE = 32
+
+
+def _buildScoreTables():
+    cacheScores = [0.0] * CACHE_SIZE
+    for cachePosition in range(CACHE_SIZE):
+        if cachePosition < 3:
+            # Vertices of the last triangle get a fixed score so we don't
+            # favour reusing the exact same edge over and over
+            cacheScores[cachePosition] = _LAST_TRIANGLE_SCORE
+        else:
+            scaler = 1.0 / (CACHE_SIZE - 3)
+            cacheScores[cachePosition] = (1.0 - (cachePosition - 3) * scaler) ** _CACHE_DECAY_POWER
+
+    valenceScores = [0.0] * (_MAX_VALENCE + 1)
+    for valence in range(1, _MAX_VALENCE + 1):
+        valenceScores[valence] = _VALENCE_BOOST_SCALE * (valence ** -_VALENCE_BOOST_POWER)
+
+    return cacheScores, valenceScores
+
+_CACHE_SCORES, _VALENCE_SCORES = _buildScoreTables()
+
+
+def _vertexScore(cachePosition, remainingValence):
+    if remainingValence == 0:
+        # Vertex has no triangles left, it's no use
+        return -1.0
+
+    score = _VALENCE_SCORES[min(remainingValence, _MAX_VALENCE)]
+    if cachePosition >= 0:
+        score += _CACHE_SCORES[cachePosition]
+    return score
+
+
+def calculateACMR(indices, cacheSize=ACMR_CACHE_SIZE):
+    """
+    Returns the average cache miss ratio (transformed vertices per triangle)
+    of a triangle list using a FIFO cache of 'cacheSize' entries.
+    """
+    triangleCount = len(indices) // 3
+    if triangleCount == 0:
+        return 0.0
+
+    cache = set()
+    fifo = [None] * cacheSize
+    fifoPosition = 0
+    misses = 0
+
+    for index in indices:
+        if index not in cache:
+            misses += 1
+            evicted = fifo[fifoPosition]
+            if evicted is not None:
+                cache.discard(evicted)
+            fifo[fifoPosition] = index
+            fifoPosition = (fifoPosition + 1) % cacheSize
+            cache.add(index)
+
+    return misses / float(triangleCount)
+
+
+def optimizeVertexCache(indices, vertexCount):
+    """
+    Reorders the triangles of a triangle list so consecutive triangles reuse
+    recently transformed vertices (Tom Forsyth's linear-speed algorithm).
+
+    Returns a new index list. Triangle winding is kept.
+    """
+    triangleCount = len(indices) // 3
+    if triangleCount == 0:
+        return list(indices)
+
+    # Triangles using each vertex, as a flattened adjacency list
+    valence = [0] * vertexCount
+    for index in indices:
+        valence[index] += 1
+
+    offsets = [0] * (vertexCount + 1)
+    for vertex in range(vertexCount):
+        offsets[vertex + 1] = offsets[vertex] + valence[vertex]
+
+    vertexTriangles = [0] * len(indices)
+    fill = offsets[:vertexCount]
+    for position, index in enumerate(indices):
+        vertexTriangles[fill[index]] = position // 3
+        fill[index] += 1
+
+    # Triangles still to be emitted per vertex live at the start of each slice
+    remaining = valence[:]
+    vertexScores = [_vertexScore(-1, remaining[vertex]) for vertex in range(vertexCount)]
+
+    triangleScores = [0.0] * triangleCount
+    for triangle in range(triangleCount):
+        base = triangle * 3
+        triangleScores[triangle] = vertexScores[indices[base]] + vertexScores[indices[base + 1]] + vertexScores[indices[base + 2]]
+
+    emitted = [False] * triangleCount
+    result = []
+    cache = []
+
+    bestTriangle = max(range(triangleCount), key=triangleScores.__getitem__)
+    nextUnemitted = 0
+
+    for _ in range(triangleCount):
+        if bestTriangle < 0:
+            # No cached vertex has triangles left, continue with the next
+            # triangle in original order
+            while emitted[nextUnemitted]:
+                nextUnemitted += 1
+            bestTriangle = nextUnemitted
+
+        base = bestTriangle * 3
+        triangleVertices = (indices[base], indices[base + 1], indices[base + 2])
+        result.extend(triangleVertices)
+        emitted[bestTriangle] = True
+
+        # Remove the triangle from the adjacency of its vertices
+        for vertex in triangleVertices:
+            start = offsets[vertex]
+            end = start + remaining[vertex]
+            for position in range(start, end):
+                if vertexTriangles[position] == bestTriangle:
+                    vertexTriangles[position] = vertexTriangles[end - 1]
+                    vertexTriangles[end - 1] = bestTriangle
+                    remaining[vertex] -= 1
+                    break
+
+        # Move the triangle vertices to the front of the simulated cache
+        newCache = []
+        for vertex in triangleVertices:
+            if vertex not in newCache:
+                newCache.append(vertex)
+        for vertex in cache:
+            if vertex not in triangleVertices:
+                newCache.append(vertex)
+
+        for vertex in newCache[CACHE_SIZE:]:
+            vertexScores[vertex] = _vertexScore(-1, remaining[vertex])
+
+        cache = newCache[:CACHE_SIZE]
+        for cachePosition, vertex in enumerate(cache):
+            vertexScores[vertex] = _vertexScore(cachePosition, remaining[vertex])
+
+        # Rescore triangles touching the cache and pick the best one
+        bestTriangle = -1
+        bestScore = -1.0
+        for vertex in cache:
+            start = offsets[vertex]
+            for position in range(start, start + remaining[vertex]):
+                triangle = vertexTriangles[position]
+                triangleBase = triangle * 3
+                score = vertexScores[indices[triangleBase]] + vertexScores[indices[triangleBase + 1]] + vertexScores[indices[triangleBase + 2]]
+                if score > bestScore:
+                    bestScore = score
+                    bestTriangle = triangle
+
+    return result
+
+
+def optimizeVertexFetch(indexLists, vertexCount):
+    """
+    Computes a vertex order where vertices appear in the order they are first
+    used by the given index lists, read one after the other. Vertices not
+    referenced by any list are kept at the end in their original order.
+
+    Returns a tuple with the new order (old position of each vertex in its new
+    position) and the index lists rewritten to that order.
+    """
+    remap = [-1] * vertexCount
+    order = []
+
+    for indices in indexLists:
+        for index in indices:
+            if remap[index] < 0:
+                remap[index] = len(order)
+                order.append(index)
+
+    for vertex in range(vertexCount):
+        if remap[vertex] < 0:
+            remap[vertex] = len(order)
+            order.append(vertex)
+
+    remappedLists = [[remap[index] for index in indices] for indices in indexLists]
+    return order, remappedLists
+
+
+def splitIndexLists(indexLists, maxVertices=MAX_VERTICES):
+    """
+    Splits the triangles of the given index lists into chunks referencing at
+    most 'maxVertices' vertices each. Triangles are taken in order, so chunks
+    keep the locality of the (ideally cache optimized) input.
+
+    Returns a list of chunks. Each chunk is a tuple with the original position
+    of every vertex in the chunk and a list of (list position, chunk indices)
+    for the index lists that have triangles in it.
+    """
+    if maxVertices < 3:
+        raise ValueError("'maxVertices' must allow at least one triangle")
+
+    chunks = []
+    chunkVertices = []
+    chunkRemap = {}
+    chunkLists = []
+
+    for listPosition, indices in enumerate(indexLists):
+        currentIndices = None
+
+        for base in range(0, len(indices) - 2, 3):
+            triangle = indices[base:base + 3]
+            newVertices = len(set(index for index in triangle if index not in chunkRemap))
+
+            if len(chunkVertices) + newVertices > maxVertices:
+                chunks.append((chunkVertices, chunkLists))
+                chunkVertices = []
+                chunkRemap = {}
+                chunkLists = []
+                currentIndices = None
+
+            if currentIndices is None:
+                currentIndices = []
+                chunkLists.append((listPosition, currentIndices))
+
+            for index in triangle:
+                localIndex = chunkRemap.get(index)
+                if localIndex is None:
+                    localIndex = len(chunkVertices)
+                    chunkRemap[index] = localIndex
+                    chunkVertices.append(index)
+                currentIndices.append(localIndex)
+
+    if len(chunkLists) > 0:
+        chunks.append((chunkVertices, chunkLists))
+
+    return chunks
+
+
+def partitionIndexLists(indexLists, triangleGroups):
+    """
+    Splits the triangles of the given index lists in groups. 'triangleGroups' has
+    the group of each triangle, in the order triangles are found reading the lists
+    one after the other. Vertices used by triangles of several groups are repeated
+    in each of them.
+
+    Returns an OrderedDict with a chunk per group, in the order groups are first
+    found, shaped like the chunks of 'splitIndexLists'.
+    """
+    groups = OrderedDict()
+    remaps = {}
+    triangle = 0
+
+    for listPosition, indices in enumerate(indexLists):
+        for base in range(0, len(indices) - 2, 3):
+            group = triangleGroups[triangle]
+            triangle += 1
+
+            chunk = groups.get(group)
+            if chunk is None:
+                chunk = ([], [])
+                groups[group] = chunk
+                remaps[group] = {}
+            chunkVertices, chunkLists = chunk
+            chunkRemap = remaps[group]
+
+            if len(chunkLists) == 0 or chunkLists[-1][0] != listPosition:
+                chunkLists.append((listPosition, []))
+            currentIndices = chunkLists[-1][1]
+
+            for index in indices[base:base + 3]:
+                localIndex = chunkRemap.get(index)
+                if localIndex is None:
+                    localIndex = len(chunkVertices)
+                    chunkRemap[index] = localIndex
+                    chunkVertices.append(index)
+                currentIndices.append(localIndex)
+
+    return groups
+
+
+def weldVertices(positions, normals, uvs, keys, positionTolerance, minNormalDot, uvTolerance):
+    """
+    Finds vertices that are equal within tolerances. Positions are bucketed in a
+    uniform grid of 'positionTolerance' sized cells, so only vertices in the 27
+    cells around a vertex are compared.
+
+    'normals' (unit vectors) and 'uvs' (flat lists of all UV values) may be None.
+    Vertices must have equal 'keys', which hold every other attribute.
+
+    Returns, for each vertex, the position of the first vertex it's welded to
+    (itself if none).
+    """
+    remap = list(range(len(positions)))
+    if positionTolerance <= 0.0:
+        return remap
+
+    cellSize = positionTolerance
+    toleranceSquared = positionTolerance * positionTolerance
+    grid = {}
+
+    for vertex, position in enumerate(positions):
+        cell = (int(math.floor(position[0] / cellSize)), int(math.floor(position[1] / cellSize)), int(math.floor(position[2] / cellSize)))
+
+        found = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for candidate in grid.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), ()):
+                        if keys[candidate] != keys[vertex]:
+                            continue
+
+                        other = positions[candidate]
+                        distance = (position[0] - other[0]) ** 2 + (position[1] - other[1]) ** 2 + (position[2] - other[2]) ** 2
+                        if distance > toleranceSquared:
+                            continue
+
+                        if normals is not None:
+                            normal = normals[vertex]
+                            otherNormal = normals[candidate]
+                            if normal[0] * otherNormal[0] + normal[1] * otherNormal[1] + normal[2] * otherNormal[2] < minNormalDot:
+                                continue
+
+                        if uvs is not None and any(abs(a - b) > uvTolerance for a, b in zip(uvs[vertex], uvs[candidate])):
+                            continue
+
+                        found = candidate
+                        break
+                    if found is not None:
+                        break
+                if found is not None:
+                    break
+            if found is not None:
+                break
+
+        if found is None:
+            grid.setdefault(cell, []).append(vertex)
+        else:
+            remap[vertex] = found
+
+    return remap
+
+
+def removeDegenerateTriangles(indices):
+    """Returns the index list without triangles that use the same vertex more than once"""
+    result = []
+    for base in range(0, len(indices) - 2, 3):
+        a, b, c = indices[base], indices[base + 1], indices[base + 2]
+        if a != b and b != c and a != c:
+            result.extend((a, b, c))
+    return result
+
+
+def partitionTrianglesByBones(indices, vertexBones, maxBones):
+    """
+    Groups triangles so each group is influenced by at most 'maxBones' bones.
+    'vertexBones' has the set of bones influencing each vertex. A triangle goes to
+    a group already having all of its bones, or else to the group sharing most
+    bones with it that still has room for the rest, so triangles deformed by the
+    same bones stay together.
+
+    Returns a list of (sorted bones of the group, group indices). Triangles
+    influenced by more than 'maxBones' bones that no group covers share one
+    group per set of bones, the only groups over the limit.
+    """
+    groups = []
+    overflowGroups = {}
+
+    for base in range(0, len(indices) - 2, 3):
+        triangle = indices[base:base + 3]
+        triangleBones = vertexBones[triangle[0]] | vertexBones[triangle[1]] | vertexBones[triangle[2]]
+
+        bestGroup = None
+        bestShared = -1
+        for group in groups:
+            groupBones = group[0]
+            shared = len(triangleBones & groupBones)
+            if shared == len(triangleBones):
+                # Adds no bones, whatever the size of the group
+                bestGroup = group
+                break
+            if shared > bestShared and len(groupBones) + len(triangleBones) - shared <= maxBones:
+                bestGroup = group
+                bestShared = shared
+
+        if bestGroup is None:
+            if len(triangleBones) > maxBones:
+                overflowKey = frozenset(triangleBones)
+                bestGroup = overflowGroups.get(overflowKey)
+                if bestGroup is None:
+                    bestGroup = (set(triangleBones), [])
+                    overflowGroups[overflowKey] = bestGroup
+                    groups.append(bestGroup)
+            else:
+                bestGroup = (set(), [])
+                groups.append(bestGroup)
+
+        bestGroup[0].update(triangleBones)
+        bestGroup[1].extend(triangle)
+
+    return [(sorted(groupBones), groupIndices) for groupBones, groupIndices in groups]
+
+
+def _planeQuadric(p0, p1, p2):
+    """
+    Returns the area weighted error quadric of the triangle plane as
+    [aa, ab, ac, ad, bb, bc, bd, cc, cd, dd, area]
+    """
+    e1 = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+    e2 = (p2[0] - p0[0], p2[1] - p0[1], p2[2] - p0[2])
+    nx = e1[1] * e2[2] - e1[2] * e2[1]
+    ny = e1[2] * e2[0] - e1[0] * e2[2]
+    nz = e1[0] * e2[1] - e1[1] * e2[0]
+
+    length = (nx * nx + ny * ny + nz * nz) ** 0.5
+    if length == 0.0:
+        return None
+
+    area = length * 0.5
+    a, b, c = nx / length, ny / length, nz / length
+    d = -(a * p0[0] + b * p0[1] + c * p0[2])
+
+    return [area * a * a, area * a * b, area * a * c, area * a * d,
+            area * b * b, area * b * c, area * b * d,
+            area * c * c, area * c * d,
+            area * d * d, area]
+
+
+def _quadricError(q1, q2, p):
+    x, y, z = p[0], p[1], p[2]
+    aa, ab, ac, ad, bb, bc, bd, cc, cd, dd = [q1[i] + q2[i] for i in range(10)]
+    error = (aa * x * x + 2.0 * ab * x * y + 2.0 * ac * x * z + 2.0 * ad * x
+             + bb * y * y + 2.0 * bc * y * z + 2.0 * bd * y
+             + cc * z * z + 2.0 * cd * z + dd)
+    return max(error, 0.0)
+
+
+def _triangleNormal(p0, p1, p2):
+    e1 = (p1[0] - p0[0], p1[1] - p0[1], p1[2] - p0[2])
+    e2 = (p2[0] - p0[0], p2[1] - p0[1], p2[2] - p0[2])
+    return (e1[1] * e2[2] - e1[2] * e2[1],
+            e1[2] * e2[0] - e1[0] * e2[2],
+            e1[0] * e2[1] - e1[1] * e2[0])
+
+
+def simplifyTriangles(indexLists, positions, attributes, targetTriangleCount, attributeWeight=ATTRIBUTE_WEIGHT):
+    """
+    Reduces the triangles of the given index lists to about 'targetTriangleCount'
+    collapsing edges by quadric error (Garland and Heckbert), always moving a vertex
+    onto one of its neighbours so no new vertices are created.
+
+    'attributes' has a sequence of floats per vertex (UV, normal, blend weights...).
+    Collapsing vertices with different attributes costs more, and vertices on
+    borders of the index topology (UV seams, hard edges, open edges) or used by
+    more than one index list are never moved.
+
+    Returns the simplified index lists, referencing the same vertices.
+    """
+    triangles = []
+    triangleLists = []
+    for listPosition, indices in enumerate(indexLists):
+        for base in range(0, len(indices) - 2, 3):
+            triangles.append([indices[base], indices[base + 1], indices[base + 2]])
+            triangleLists.append(listPosition)
+
+    aliveCount = len(triangles)
+    if aliveCount <= targetTriangleCount:
+        return [list(indices) for indices in indexLists]
+
+    vertexCount = len(positions)
+    alive = [True] * len(triangles)
+    adjacency = [set() for _ in range(vertexCount)]
+    quadrics = [[0.0] * 11 for _ in range(vertexCount)]
+    vertexLists = [-1] * vertexCount
+    locked = [False] * vertexCount
+    edgeUses = {}
+
+    for triangle, vertices in enumerate(triangles):
+        quadric = _planeQuadric(positions[vertices[0]], positions[vertices[1]], positions[vertices[2]])
+        listPosition = triangleLists[triangle]
+
+        for corner in range(3):
+            vertex = vertices[corner]
+            adjacency[vertex].add(triangle)
+
+            if quadric is not None:
+                vertexQuadric = quadrics[vertex]
+                for i in range(11):
+                    vertexQuadric[i] += quadric[i]
+
+            if vertexLists[vertex] < 0:
+                vertexLists[vertex] = listPosition
+            elif vertexLists[vertex] != listPosition:
+                locked[vertex] = True
+
+            other = vertices[(corner + 1) % 3]
+            edge = (vertex, other) if vertex < other else (other, vertex)
+            edgeUses[edge] = edgeUses.get(edge, 0) + 1
+
+    for edge, uses in edgeUses.items():
+        if uses == 1:
+            locked[edge[0]] = True
+            locked[edge[1]] = True
+    edgeUses = None
+
+    # Attribute error is scaled so it's comparable with geometric error
+    minimum = [min(position[axis] for position in positions) for axis in range(3)] if vertexCount > 0 else [0.0] * 3
+    maximum = [max(position[axis] for position in positions) for axis in range(3)] if vertexCount > 0 else [0.0] * 3
+    extent = max(maximum[axis] - minimum[axis] for axis in range(3))
+    attributeScale = attributeWeight * extent * extent
+
+    versions = [0] * vertexCount
+    heap = []
+
+    def neighbours(vertex):
+        result = set()
+        for triangle in adjacency[vertex]:
+            result.update(triangles[triangle])
+        result.discard(vertex)
+        return result
+
+    def pushCandidates(source):
+        if locked[source]:
+            return
+        for target in neighbours(source):
+            cost = _quadricError(quadrics[source], quadrics[target], positions[target])
+            if attributeScale > 0.0:
+                difference = sum((a - b) * (a - b) for a, b in zip(attributes[source], attributes[target]))
+                cost += attributeScale * quadrics[source][10] * difference
+            heapq.heappush(heap, (cost, source, target, versions[source], versions[target]))
+
+    def flipsTriangle(source, target):
+        targetPosition = positions[target]
+        for triangle in adjacency[source]:
+            vertices = triangles[triangle]
+            if target in vertices:
+                continue
+
+            points = [positions[vertex] for vertex in vertices]
+            before = _triangleNormal(points[0], points[1], points[2])
+            points[vertices.index(source)] = targetPosition
+            after = _triangleNormal(points[0], points[1], points[2])
+
+            dot = before[0] * after[0] + before[1] * after[1] + before[2] * after[2]
+            lengths = ((before[0] ** 2 + before[1] ** 2 + before[2] ** 2) * (after[0] ** 2 + after[1] ** 2 + after[2] ** 2)) ** 0.5
+            if lengths == 0.0 or dot < _MIN_NORMAL_DOT * lengths:
+                return True
+        return False
+
+    for vertex in range(vertexCount):
+        pushCandidates(vertex)
+
+    while aliveCount > targetTriangleCount and len(heap) > 0:
+        cost, source, target, sourceVersion, targetVersion = heapq.heappop(heap)
+        if sourceVersion != versions[source] or targetVersion != versions[target] or len(adjacency[source]) == 0:
+            continue
+
+        if flipsTriangle(source, target):
+            continue
+
+        for triangle in list(adjacency[source]):
+            vertices = triangles[triangle]
+            if target in vertices:
+                alive[triangle] = False
+                aliveCount -= 1
+                for vertex in vertices:
+                    adjacency[vertex].discard(triangle)
+            else:
+                vertices[vertices.index(source)] = target
+                adjacency[target].add(triangle)
+        adjacency[source] = set()
+
+        sourceQuadric = quadrics[source]
+        targetQuadric = quadrics[target]
+        for i in range(11):
+            targetQuadric[i] += sourceQuadric[i]
+
+        changed = neighbours(target)
+        changed.add(target)
+        for vertex in changed:
+            versions[vertex] += 1
+        for vertex in changed:
+            pushCandidates(vertex)
+
+    simplifiedLists = [[] for _ in indexLists]
+    for triangle, vertices in enumerate(triangles):
+        if alive[triangle]:
+            simplifiedLists[triangleLists[triangle]].extend(vertices)
+
+    return simplifiedLists
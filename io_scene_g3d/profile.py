@@ -16,43 +16,355 @@
 
 # <pep8 compliant>
 
+"""
+Hierarchical profiler of the export stages.
+
+Stages are spans opened with the 'profile' decorator or the 'span' context
+manager. Spans nest, so an export reads as a tree (export > generateMeshes >
+mesh 'Cube' > buildMesh > weldMeshVertices), and spans of the same stage with
+the same detail under the same parent are added up. While the profiler isn't
+running both cost a single flag check.
+
+Spans opened with 'memory=True' are also stages of the MemoryTracker, which
+records the Python heap with tracemalloc when they start and end.
+"""
+
+import json
+import os
+import threading
 import time
-prof = {}
+import tracemalloc
+from collections import OrderedDict
+
+# Nanosecond clock, emulated on Python versions before 3.7
+_clock = getattr(time, "perf_counter_ns", None) or (lambda: int(time.perf_counter() * 1000000000))
+
+
+class SpanNode(object):
+    """Accumulated time of a stage under a given parent stage"""
+
+    def __init__(self, name, detail=None):
+        self.name = name
+        self.detail = detail
+        self.calls = 0
+        self.totalNs = 0
+        self.children = OrderedDict()
+
+    @property
+    def label(self):
+        if self.detail is None:
+            return self.name
+        return "%s '%s'" % (self.name, self.detail)
+
+    def child(self, name, detail):
+        key = (name, detail)
+        node = self.children.get(key)
+        if node is None:
+            node = SpanNode(name, detail)
+            self.children[key] = node
+        return node
+
+    def toDict(self):
+        childrenNs = sum(child.totalNs for child in self.children.values())
+        result = OrderedDict()
+        result["name"] = self.name
+        if self.detail is not None:
+            result["detail"] = self.detail
+        result["calls"] = self.calls
+        result["totalMs"] = self.totalNs / 1000000.0
+        result["selfMs"] = (self.totalNs - childrenNs) / 1000000.0
+        if len(self.children) > 0:
+            result["children"] = [child.toDict() for child in self.children.values()]
+        return result
+
+
+class _Span(object):
+
+    __slots__ = ("name", "detail", "memory")
+
+    def __init__(self, name, detail, memory):
+        self.name = name
+        self.detail = detail
+        # Recursive stages (ex: generateNodes) are only tracked at the outermost call
+        self.memory = memory and MEMORY_TRACKER.enabled and not MEMORY_TRACKER.isActive(name)
+
+    def __enter__(self):
+        if self.memory:
+            MEMORY_TRACKER.enter(self.name)
+        if PROFILER.enabled:
+            PROFILER.enter(self.name, self.detail)
+        return self
+
+    def __exit__(self, *args):
+        if PROFILER.enabled:
+            PROFILER.exit()
+        if self.memory:
+            MEMORY_TRACKER.exit()
+        return False
+
+
+class _NullSpan(object):
+    """Span used while the profiler isn't running"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler(object):
+
+    def __init__(self):
+        self.enabled = False
+        self.root = SpanNode("root")
+        self.events = []
+        self._startNs = 0
+        self._local = threading.local()
+
+    def start(self):
+        """Clears previous results and starts recording spans"""
+        self.root = SpanNode("root")
+        self.events = []
+        self._local = threading.local()
+        self._startNs = _clock()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            # Spans of other threads (ex: the background file writer) start at the top
+            stack = [(self.root, 0)]
+            self._local.stack = stack
+        return stack
+
+    def enter(self, name, detail=None):
+        stack = self._stack()
+        stack.append((stack[-1][0].child(name, detail), _clock()))
+
+    def exit(self):
+        stack = self._stack()
+        if len(stack) <= 1:
+            return
+
+        node, startNs = stack.pop()
+        endNs = _clock()
+        node.calls += 1
+        node.totalNs += endNs - startNs
+        self.events.append((node.label, startNs, endNs, threading.get_ident()))
+
+    def stageTotals(self):
+        """Total time and calls of each stage name, whatever the parent stage and detail"""
+        totals = OrderedDict()
+
+        def visit(node, activeNames):
+            for child in node.children.values():
+                # Recursive stages are only counted at the outermost span
+                if child.name not in activeNames:
+                    calls, totalNs = totals.get(child.name, (0, 0))
+                    totals[child.name] = (calls + child.calls, totalNs + child.totalNs)
+                visit(child, activeNames | {child.name})
+
+        visit(self.root, frozenset())
+        return totals
+
+    def toDict(self):
+        result = OrderedDict()
+        result["stages"] = OrderedDict((name, OrderedDict([("calls", calls), ("totalMs", totalNs / 1000000.0)]))
+                                       for name, (calls, totalNs) in self.stageTotals().items())
+        result["spans"] = [child.toDict() for child in self.root.children.values()]
+        return result
+
+    def toChromeTrace(self):
+        """Recorded spans in the Trace Event Format read by chrome://tracing and Perfetto"""
+        pid = os.getpid()
+        traceEvents = []
+        for label, startNs, endNs, threadId in sorted(self.events, key=lambda event: event[1]):
+            traceEvents.append(OrderedDict([("name", label),
+                                            ("ph", "X"),
+                                            ("ts", (startNs - self._startNs) / 1000.0),
+                                            ("dur", (endNs - startNs) / 1000.0),
+                                            ("pid", pid),
+                                            ("tid", threadId)]))
+        return OrderedDict([("traceEvents", traceEvents), ("displayTimeUnit", "ms")])
+
+    def writeReports(self, filepath):
+        """Writes the span tree to '<filepath>.profile.json' and a Chrome trace to '<filepath>.trace.json'"""
+        with open(filepath + ".profile.json", "w") as profileFile:
+            json.dump(self.toDict(), profileFile, indent=2)
+
+        with open(filepath + ".trace.json", "w") as traceFile:
+            json.dump(self.toChromeTrace(), traceFile)
+
+    def printStats(self):
+        '''Prints the span tree to the console.'''
+        print('=== Execution Statistics ===')
+        print('Times are in milliseconds.')
+        print('{:<55} {:>6} {:>9} {:>9}'.format('STAGE', 'CALLS', 'SUM(ms)', 'SELF(ms)'))
+
+        def visit(node, depth):
+            for child in node.children.values():
+                childrenNs = sum(grandChild.totalNs for grandChild in child.children.values())
+                print('{:<55} {:>6} {:>9.1f} {:>9.1f}'.format(
+                    ('  ' * depth + child.label)[:55], child.calls,
+                    child.totalNs / 1000000.0,
+                    (child.totalNs - childrenNs) / 1000000.0))
+                visit(child, depth + 1)
+
+        visit(self.root, 0)
+
+
+PROFILER = Profiler()
+
+
+class MemoryTracker(object):
+    """
+    Python heap at the start and end of export stages, the peak reached during each
+    stage and the code that allocated the memory a stage added. Tracing slows Python
+    down a lot, so it only runs while an export asks for it.
+
+    The snapshots kept to find allocation sites are on the traced heap as well, so
+    their size is left out of every number. Each stage measures its own peak, except
+    on Python versions before 3.9, which can't reset it; there the peak of a stage is
+    the highest heap since the export started.
+    """
+
+    # Allocation sites listed for each stage
+    TOP_SITES = 10
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = []
+        self._stack = []
+        self._overhead = 0
+        self._startedTracing = False
+
+    def start(self):
+        self.stages = []
+        self._stack = []
+        self._overhead = 0
+        self._startedTracing = not tracemalloc.is_tracing()
+        if self._startedTracing:
+            tracemalloc.start()
+        self.enabled = True
+
+    def stop(self):
+        if self.enabled and self._startedTracing:
+            tracemalloc.stop()
+        self.enabled = False
+        self._stack = []
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),
+                                                          tracemalloc.Filter(False, __file__),
+                                                          tracemalloc.Filter(False, "<frozen importlib._bootstrap>")))
+
+    def _closeInterval(self):
+        """Adds the peak since the last stage boundary to the innermost stage and returns the current heap"""
+        current, peak = tracemalloc.get_traced_memory()
+        if len(self._stack) > 0:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak - self._overhead)
+        return current - self._overhead
+
+    def _openInterval(self):
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+    def isActive(self, name):
+        return any(entry["name"] == name for entry in self._stack)
+
+    def enter(self, name):
+        startBytes = self._closeInterval()
+
+        path = name if len(self._stack) == 0 else self._stack[-1]["path"] + "/" + name
+        snapshot = self._snapshot()
+        overhead = tracemalloc.get_traced_memory()[0] - self._overhead - startBytes
+        self._overhead += overhead
+
+        self._stack.append({"name": name, "path": path, "snapshot": snapshot, "overhead": overhead,
+                            "start": startBytes, "peak": startBytes})
+        self._openInterval()
+
+    def exit(self):
+        if len(self._stack) == 0:
+            return
+
+        endBytes = self._closeInterval()
+        entry = self._stack.pop()
+
+        stage = OrderedDict()
+        stage["stage"] = entry["path"]
+        stage["startBytes"] = entry["start"]
+        stage["endBytes"] = endBytes
+        stage["peakBytes"] = entry["peak"]
+        stage["topAllocations"] = self.topAllocations(self._snapshot(), entry["snapshot"])
+        self.stages.append(stage)
+
+        entry["snapshot"] = None
+        self._overhead -= entry["overhead"]
+        if len(self._stack) > 0:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], entry["peak"])
+        self._openInterval()
+
+    def topAllocations(self, endSnapshot, startSnapshot):
+        """Source lines that allocated the most memory still held at the end of a stage"""
+        sites = []
+        for statistic in endSnapshot.compare_to(startSnapshot, "lineno"):
+            if statistic.size_diff <= 0:
+                continue
+
+            frame = statistic.traceback[0]
+            site = OrderedDict()
+            site["site"] = "%s:%d" % ("/".join(frame.filename.replace("\\", "/").split("/")[-2:]), frame.lineno)
+            site["bytes"] = statistic.size_diff
+            site["blocks"] = statistic.count_diff
+            sites.append(site)
+            if len(sites) >= self.TOP_SITES:
+                break
+        return sites
+
+    def highestPeak(self):
+        """Stage with the highest peak, or None"""
+        return max(self.stages, key=lambda stage: stage["peakBytes"]) if len(self.stages) > 0 else None
+
+
+MEMORY_TRACKER = MemoryTracker()
+
+
+def span(name, detail=None, memory=False):
+    """
+    Context manager timing a stage. 'detail' tells apart spans of the same stage, like
+    the object being exported. If 'memory' is set the stage is also tracked by the MemoryTracker.
+    """
+    if not PROFILER.enabled and not (memory and MEMORY_TRACKER.enabled):
+        return _NULL_SPAN
+    return _Span(name, detail, memory)
 
 
 class profile:
-    '''Function decorator for code profiling.'''
+    '''Function decorator timing each call as a span of the given name.'''
 
-    def __init__(self, name):
+    def __init__(self, name, memory=False):
         self.name = name
+        self.memory = memory
 
     def __call__(self, fun):
+        name = self.name
+        memory = self.memory
+
         def profile_fun(*args, **kwargs):
-            start = time.clock()
-            try:
+            if not PROFILER.enabled and not (memory and MEMORY_TRACKER.enabled):
                 return fun(*args, **kwargs)
-            finally:
-                duration = time.clock() - start
-                if fun not in prof:
-                    prof[fun] = [self.name, duration, 1]
-                else:
-                    prof[fun][1] += duration
-                    prof[fun][2] += 1
-        return profile_fun
 
+            with _Span(name, None, memory):
+                return fun(*args, **kwargs)
 
-def print_stats():
-    '''Prints profiling results to the console. Run from a Python controller.'''
-
-    def timekey(stat):
-        return stat[1] / float(stat[2])
-    stats = sorted(prof.values(), key=timekey, reverse=True)
-
-    print('=== Execution Statistics ===')
-    print('Times are in milliseconds.')
-    print('{:<55} {:>6} {:>7} {:>6}'.format('FUNCTION', 'CALLS', 'SUM(ms)', 'AV(ms)'))
-    for stat in stats:
-        print('{:<55} {:>6} {:>7.0f} {:>6.2f}'.format(
-            stat[0], stat[2],
-            stat[1] * 1000,
-            (stat[1] / float(stat[2])) * 1000))
+        profile_fun.__name__ = fun.__name__
+        profile_fun.__doc__ = fun.__doc__
+        return profile_fun
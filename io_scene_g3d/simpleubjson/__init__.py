@@ -38,13 +38,7 @@ _DRAFT8_DEPRECATED = ('Draft-8 specification is too old and deprecated.'
                       ' Please upgrade your data to fit Draft-9 spec.')
 
 
-old_format_json = True
-
-def set_datatype_format(old_format=True):
-    old_format_json = old_format
-    inspect.output_old_format = old_format_json
-
-def decode(data, allow_noop=False, spec='draft9'):
+def decode(data, allow_noop=False, spec='draft9', old_format=True):
     """Decodes input stream of UBJSON data to Python object.
 
     :param data: `.read([size])`-able object or source string.
@@ -54,6 +48,9 @@ def decode(data, allow_noop=False, spec='draft9'):
     :param spec: UBJSON specification. Supported Draft-8 and Draft-9
                  specifications by ``draft-8`` or ``draft-9`` keys.
     :type spec: str
+    :param old_format: Read integers using the old UBJSON datatype sizes
+                       (the ones LibGDX writes by default).
+    :type old_format: bool
 
     :return: Decoded Python object. See mapping table below.
     """
@@ -63,12 +60,12 @@ def decode(data, allow_noop=False, spec='draft9'):
     #    return _draft8_decoder(data, allow_noop).decode_next()
     # elif spec.lower() in ['draft9', 'draft-9']:
     if spec.lower() in ['draft9', 'draft-9']:
-        return _draft9_decoder(data, allow_noop).decode_next()
+        return _draft9_decoder(data, allow_noop, old_format).decode_next()
     else:
         raise ValueError('Unknown or unsupported specification %s' % spec)
 
 
-def encode(data, output=None, default=None, spec='draft-9'):
+def encode(data, output=None, default=None, spec='draft-9', old_format=True):
     """Encodes Python object to Universal Binary JSON data.
 
     :param data: Python object.
@@ -81,6 +78,9 @@ def encode(data, output=None, default=None, spec='draft-9'):
     :param spec: UBJSON specification. Supported Draft-8 and Draft-9
                  specifications by ``draft-8`` or ``draft-9`` keys.
     :type spec: str
+    :param old_format: Write integers using the old UBJSON datatype sizes
+                       (the ones LibGDX reads by default).
+    :type old_format: bool
 
     :return: Encoded Python object. See mapping table below.
              If `output` param is specified, all data would be written into it
@@ -91,9 +91,7 @@ def encode(data, output=None, default=None, spec='draft-9'):
     #    res = _draft8_encoder(default).encode_next(data)
     # elif spec.lower() in ['draft9', 'draft-9']:
     if spec.lower() in ['draft9', 'draft-9']:
-        current_encoder = _draft9_encoder(default)
-        current_encoder.old_format_json = old_format_json
-        res = current_encoder.encode_next(data)
+        res = _draft9_encoder(default, old_format).encode_next(data)
     else:
         raise ValueError('Unknown or unsupported specification %s' % spec)
     if output:
@@ -109,14 +109,14 @@ class Draft9Decoder(object):
         Unsized objects are represented as list of 2-element tuple with object
         key and value.
     """
-    
-    old_format_json = True
-    
+
     dispatch = {}
 
-    def __init__(self, source, allow_noop=False):
-        self.old_format_json = True
-        
+    def __init__(self, source, allow_noop=False, old_format_json=True):
+        # Datatype format is kept per instance so decoders running on
+        # different threads never see each other's settings
+        self.old_format_json = old_format_json
+
         if isinstance(source, unicode):
             source = source.encode('utf-8')
         if isinstance(source, bytes):
@@ -365,13 +365,13 @@ class Draft9Encoder(object):
         Dict keys should have string type or :exc:`simpleubjson.EncodeError`
         will be raised.
     """
-    
-    old_format_json = True
 
     dispatch = {}
 
-    def __init__(self, default=None):
-        self.old_format_json = True
+    def __init__(self, default=None, old_format_json=True):
+        # Datatype format is kept per instance so encoders running on
+        # different threads never see each other's settings
+        self.old_format_json = old_format_json
         self._default = default or self.default
 
     def default(self, obj):
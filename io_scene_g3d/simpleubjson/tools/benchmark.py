@@ -9,206 +9,252 @@
 
 # <pep8 compliant>
 
-import os
-import getopt
-import pickle
-import sys
-import time
-import simpleubjson
-try:
-    import json
-except ImportError:
-    json = None
-try:
-    import simplejson
-except ImportError:
-    simplejson = None
-try:
-    import ujson
-except ImportError:
-    ujson = None
-try:
-    import erlport
-except ImportError:
-    erlport = None
-
-
-def timeit(func):
-    def wrapper(*args, **kwargs):
-        start = time.time()
-        func(*args, **kwargs)
-        return time.time() - start
-    return wrapper
-
-
-def load_case(name):
-    fname = os.path.join(os.path.dirname(__file__), '../tests/data', name)
-    data = open(fname).read()
-    return json.loads(data)
-
-
-def format_results(lib, version, msg, total, count):
-    return '    * [%s @ %s] %s in %f (%f / call)' % (lib, version, msg, total,
-                                                     (total / float(count)))
-
-
-def run_test(func, times, *args, **kwargs):
-    tfunc = timeit(lambda: func(*args, **kwargs))
-    return sum(tfunc() for i in range(times))
-
-
-def make_benchmark(name, count):
-    data = load_case(name)
-
-    src = simpleubjson.encode(data, spec='draft-8')
-    total = run_test(simpleubjson.decode, count, src, spec='draft-8')
-    print(format_results('simpleubjson',  simpleubjson.__version__,
-                         'Decoded Draft-8', total, count))
-
-    total = run_test(simpleubjson.encode, count, data, spec='draft-8')
-    print(format_results('simpleubjson',  simpleubjson.__version__,
-                         'Encoded Draft-8', total, count))
-
-    print
-
-    src = simpleubjson.encode(data, spec='draft-9')
-
-    # func = lambda *a, **k: list(simpleubjson.decode(*a, **k))
-    def func(*a, **k): return list(simpleubjson.decode(*a, **k))
-    total = run_test(func, count, src, spec='draft-9')
-    print(format_results('simpleubjson',  simpleubjson.__version__,
-                         'Decoded Draft-9', total, count))
-
-    total = run_test(simpleubjson.encode, count, data, spec='draft-9')
-    print(format_results('simpleubjson',  simpleubjson.__version__,
-                         'Encoded Draft-9', total, count))
-
-    if json:
-
-        print
-
-        total = run_test(json.loads, count, json.dumps(data))
-        print(format_results('json_stdlib', json.__version__,
-                             'Decoded', total, count))
-
-        total = run_test(json.dumps, count, data)
-        print(format_results('json_stdlib', json.__version__,
-                             'Encoded', total, count))
-
-    if simplejson:
-
-        print
-
-        simplejson._toggle_speedups(True)
-        total = run_test(simplejson.loads, count, simplejson.dumps(data))
-        print(format_results('simplejson_c', simplejson.__version__,
-                             'Decoded', total, count))
+"""UBJSON codec benchmark on synthetic payloads shaped like G3DB models.
 
-        simplejson._toggle_speedups(True)
-        total = run_test(simplejson.dumps, count, data)
-        print(format_results('simplejson_c', simplejson.__version__,
-                             'Encoded', total, count))
+Run from the ``io_scene_g3d`` folder::
 
-        print
+    python -m simpleubjson.tools.benchmark -o results.json
+    python -m simpleubjson.tools.benchmark -b results.json
+"""
 
-        simplejson._toggle_speedups(False)
-        total = run_test(simplejson.loads, count, simplejson.dumps(data))
-        print(format_results('simplejson_py', simplejson.__version__,
-                             'Decoded', total, count))
-
-        simplejson._toggle_speedups(False)
-        total = run_test(simplejson.dumps, count, data)
-        print(format_results('simplejson_py', simplejson.__version__,
-                             'Encoded', total, count))
-
-    if ujson:
-
-        print
-
-        total = run_test(ujson.decode, count, ujson.encode(data))
-        print(format_results('ujson', ujson.__version__,
-                             'Decoded', total, count))
-
-        total = run_test(ujson.encode, count, data)
-        print(format_results('ujson', ujson.__version__,
-                             'Encoded', total, count))
-
-    if erlport:
-
-        print
-
-        total = run_test(erlport.decode, count, erlport.encode(data))
-        print(format_results('erlport', erlport.__version__,
-                             'Decoded', total, count))
-
-        total = run_test(erlport.encode, count, data)
-        print(format_results('erlport', erlport.__version__,
-                             'Encoded', total, count))
-
-    print
-
-    total = run_test(pickle.loads, count, pickle.dumps(data))
-    print(format_results('pickle', pickle.__version__,
-                         'Decoded', total, count))
-
-    total = run_test(pickle.dumps, count, data)
-    print(format_results('pickle', pickle.__version__,
-                         'Encoded', total, count))
-
-
-def test_1(count):
-    print('* [test_1] CouchDB4k.compact.json %d times' % count)
-    make_benchmark('CouchDB4k.compact.json', count)
-    print
-    print
-
-
-def test_2(count):
-    print('* [test_2] MediaContent.compact.json %d times' % count)
-    make_benchmark('MediaContent.compact.json', count)
-    print
-    print
-
-
-def test_3(count):
-    print('* [test_3] TwitterTimeline.compact.json %d times' % count)
-    make_benchmark('TwitterTimeline.compact.json', count)
-    print
-    print
-
-
-def run(count):
-    print('sys.version : %r' % (sys.version,))
-    print('sys.platform : %r' % (sys.platform,))
-    test_1(count)
-    test_2(count)
-    test_3(count)
+import getopt
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from .. import encode, decode, __version__
+
+
+def make_vertices_case(scale):
+    """A mesh with a large interleaved float vertex array (stride of 8 floats)"""
+    rnd = random.Random(1)
+    vertex_count = 4000 * scale
+    mesh = OrderedDict()
+    mesh["attributes"] = ["POSITION", "NORMAL", "TEXCOORD0"]
+    mesh["vertices"] = [rnd.uniform(-100.0, 100.0) for _ in range(vertex_count * 8)]
+    mesh["parts"] = []
+    return OrderedDict([("version", [0, 1]), ("meshes", [mesh])])
+
+
+def make_indices_case(scale):
+    """Mesh parts holding long index arrays, mostly above the int8 range"""
+    rnd = random.Random(2)
+    vertex_count = 20000
+    parts = []
+    for part_index in range(4):
+        part = OrderedDict()
+        part["id"] = "mesh_part%d" % part_index
+        part["type"] = "TRIANGLES"
+        part["indices"] = [rnd.randrange(vertex_count) for _ in range(6000 * scale)]
+        parts.append(part)
+    mesh = OrderedDict([("attributes", ["POSITION"]), ("vertices", []), ("parts", parts)])
+    return OrderedDict([("version", [0, 1]), ("meshes", [mesh])])
+
+
+def make_nodes_case(scale):
+    """A deep node tree, like the one generated for long bone chains"""
+    rnd = random.Random(3)
+    counter = [0]
+
+    def make_node(depth):
+        counter[0] += 1
+        node = OrderedDict()
+        node["id"] = "Armature__bone%d" % counter[0]
+        node["rotation"] = [rnd.uniform(-1.0, 1.0) for _ in range(4)]
+        node["translation"] = [rnd.uniform(-1.0, 1.0) for _ in range(3)]
+        if depth > 0:
+            node["children"] = [make_node(depth - 1) for _ in range(2)]
+        return node
+
+    nodes = [make_node(8) for _ in range(scale)]
+    return OrderedDict([("version", [0, 1]), ("nodes", nodes)])
+
+
+def make_keyframes_case(scale):
+    """Many small keyframe objects, as written for baked bone animations"""
+    rnd = random.Random(4)
+    bones = []
+    for bone_index in range(20):
+        keyframes = []
+        for frame in range(100 * scale):
+            keyframe = OrderedDict()
+            keyframe["keytime"] = frame * 33.333333
+            keyframe["rotation"] = [rnd.uniform(-1.0, 1.0) for _ in range(4)]
+            keyframe["translation"] = [rnd.uniform(-1.0, 1.0) for _ in range(3)]
+            keyframes.append(keyframe)
+        bones.append(OrderedDict([("boneId", "Armature__bone%d" % bone_index), ("keyframes", keyframes)]))
+    animation = OrderedDict([("id", "Action"), ("bones", bones)])
+    return OrderedDict([("version", [0, 1]), ("animations", [animation])])
+
+
+CASES = OrderedDict([
+    ("vertices", make_vertices_case),
+    ("indices", make_indices_case),
+    ("nodes", make_nodes_case),
+    ("keyframes", make_keyframes_case),
+])
+
+FORMATS = OrderedDict([
+    ("old", True),
+    ("new", False),
+])
+
+
+def count_values(data):
+    """Counts scalar values (and object keys) inside a payload"""
+    if isinstance(data, dict):
+        return sum(1 + count_values(value) for value in data.values())
+    elif isinstance(data, (list, tuple)):
+        return sum(count_values(value) for value in data)
+    return 1
+
+
+def materialize(data):
+    """Decoded containers are generators, walk them so decoding really happens"""
+    return list(data)
+
+
+def measure(func, rounds):
+    """Returns best wall time of the given rounds and the peak traced memory of one run"""
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def make_result(case, format_name, operation, seconds, peak, size, values):
+    result = OrderedDict()
+    result["case"] = case
+    result["format"] = format_name
+    result["operation"] = operation
+    result["seconds"] = seconds
+    result["bytes"] = size
+    result["values"] = values
+    result["mb_per_s"] = (size / 1048576.0) / seconds if seconds > 0 else 0.0
+    result["values_per_s"] = values / seconds if seconds > 0 else 0.0
+    result["peak_memory_bytes"] = peak
+    return result
+
+
+def run(rounds, scale, cases=None):
+    results = []
+    for case, factory in CASES.items():
+        if cases and case not in cases:
+            continue
+
+        data = factory(scale)
+        values = count_values(data)
+
+        for format_name, old_format_json in FORMATS.items():
+            encoded = encode(data, old_format=old_format_json)
+
+            seconds, peak = measure(lambda: encode(data, old_format=old_format_json), rounds)
+            results.append(make_result(case, format_name, 'encode', seconds, peak, len(encoded), values))
+
+            seconds, peak = measure(lambda: materialize(decode(encoded, old_format=old_format_json)), rounds)
+            results.append(make_result(case, format_name, 'decode', seconds, peak, len(encoded), values))
+
+    report = OrderedDict()
+    report["python"] = sys.version
+    report["platform"] = platform.platform()
+    report["simpleubjson"] = __version__
+    report["rounds"] = rounds
+    report["scale"] = scale
+    report["results"] = results
+    return report
+
+
+def print_report(report, baseline=None):
+    previous = {}
+    if baseline is not None:
+        for result in baseline["results"]:
+            previous[(result["case"], result["format"], result["operation"])] = result
+
+    print('sys.version : %r' % (report["python"],))
+    print('sys.platform : %r' % (report["platform"],))
+    print('{:<10} {:<4} {:<7} {:>10} {:>9} {:>13} {:>11} {:>9}'.format(
+        'CASE', 'FMT', 'OP', 'BYTES', 'MB/s', 'VALUES/s', 'PEAK(KiB)', 'CHANGE'))
+
+    for result in report["results"]:
+        change = ''
+        old = previous.get((result["case"], result["format"], result["operation"]))
+        if old is not None and old["seconds"] > 0:
+            change = '{:+.1f}%'.format((result["seconds"] / old["seconds"] - 1.0) * 100.0)
+
+        print('{:<10} {:<4} {:<7} {:>10d} {:>9.2f} {:>13.0f} {:>11.1f} {:>9}'.format(
+            result["case"], result["format"], result["operation"],
+            result["bytes"], result["mb_per_s"], result["values_per_s"],
+            result["peak_memory_bytes"] / 1024.0, change))
 
 
 def main():
-    """benchmark.py - UBJSON vs JSON performance test script.
+    """benchmark.py - UBJSON codec performance test on G3D shaped payloads.
 
     Usage:
-        -h, --help      Prints this help
-        -c, --count=    Rounds per test.
-                        Default: 1000.
+        -h, --help          Prints this help
+        -r, --rounds=       Rounds per test, best time is kept.
+                            Default: 5.
+        -s, --scale=        Multiplies the size of every payload.
+                            Default: 1.
+        -c, --case=         Only run this case (vertices, indices, nodes,
+                            keyframes). May be repeated.
+        -o, --output=       Save results as JSON to this file.
+        -b, --baseline=     Compare timings with a previously saved JSON file.
     """
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'hc:', ['help', 'count='])
+        opts, args = getopt.getopt(sys.argv[1:], 'hr:s:c:o:b:',
+                                   ['help', 'rounds=', 'scale=', 'case=', 'output=', 'baseline='])
     except getopt.GetoptError:
         print(main.__doc__)
         sys.exit(2)
-    count = 100000
+    rounds = 5
+    scale = 1
+    cases = []
+    output = None
+    baseline = None
     for key, value in opts:
-        print(key, value)
         if key in ('-h', '--help'):
             print(main.__doc__)
             sys.exit()
-        elif key in ('-c', '--count'):
-            count = int(value)
+        elif key in ('-r', '--rounds'):
+            rounds = int(value)
+        elif key in ('-s', '--scale'):
+            scale = int(value)
+        elif key in ('-c', '--case'):
+            if value not in CASES:
+                print('Unknown case %s' % value)
+                sys.exit(2)
+            cases.append(value)
+        elif key in ('-o', '--output'):
+            output = value
+        elif key in ('-b', '--baseline'):
+            with open(value) as baseline_file:
+                baseline = json.load(baseline_file)
         else:
             assert False, 'unhandled option %s' % key
-    run(count)
+
+    report = run(rounds, scale, cases)
+    print_report(report, baseline)
+
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
 
 if __name__ == '__main__':
     main()
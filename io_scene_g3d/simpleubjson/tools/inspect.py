@@ -11,14 +11,12 @@
 
 import sys
 # from ..draft8 import Draft8Decoder
-from ..draft9 import Draft9Decoder
+from ..draft9 import Draft9Decoder, Draft9Encoder
 from ..exceptions import EarlyEndOfStreamError
-import io_scene_g3d
 
-output_old_format = True
 
 def pprint(data, output=sys.stdout, allow_noop=True,
-           indent=' ' * 4, max_level=None, spec='draft-9'):
+           indent=' ' * 4, max_level=None, spec='draft-9', old_format=True):
     """Pretty prints ubjson data using the handy [ ]-notation to represent it in
     readable form. Example::
 
@@ -38,6 +36,8 @@ def pprint(data, output=sys.stdout, allow_noop=True,
     :param spec: UBJSON specification. Supported Draft-8 and Draft-9
                  specifications by ``draft-8`` or ``draft-9`` keys.
     :type spec: str
+    :param old_format: Inspect data written with the old UBJSON datatype sizes.
+    :type old_format: bool
     """
     def maybe_write(data, level):
         if max_level is None or level <= max_level:
@@ -70,8 +70,9 @@ def pprint(data, output=sys.stdout, allow_noop=True,
                 value = decoder.dispatch[tag](decoder, tag, length, value)
                 pattern = '[%s] [%s] [%s] [%s]\n'
                 # very dirty hack to show size as marker and value
-                _decoder = Draft9Decoder(io_scene_g3d.simpleubjson.encode(length, spec=spec))
-                _decoder.old_format_json = output_old_format
+                _encoder = Draft9Encoder(old_format_json=old_format)
+                _decoder = Draft9Decoder(_encoder.encode_next(length),
+                                         old_format_json=old_format)
                 tlv = _decoder.next_tlv()
                 args = tuple([utag, tlv[0].decode(), tlv[2], value])
                 maybe_write(pattern % args, level)
@@ -81,8 +82,7 @@ def pprint(data, output=sys.stdout, allow_noop=True,
         # inspect = inspect_draft8
     # elif spec.lower() in ['draft9', 'draft-9']:
     if spec.lower() in ['draft9', 'draft-9']:
-        decoder = Draft9Decoder(data, allow_noop)
-        decoder.old_format_json = output_old_format
+        decoder = Draft9Decoder(data, allow_noop, old_format)
         inspect = inspect_draft9
     else:
         raise ValueError('Unknown or unsupported specification %s' % spec)
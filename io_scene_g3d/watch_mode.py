@@ -0,0 +1,186 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+"""
+Watch mode. Files exported with 'Watch for Changes' are exported again, with
+the same options, when a datablock that went into them changes. A file is only
+exported once no change touched it for its watch delay, so a burst of edits
+leads to a single export. Saving the .blend file exports pending files at once.
+"""
+
+import time
+from collections import OrderedDict
+
+import bpy
+
+from io_scene_g3d import export_cache
+from io_scene_g3d.util import Util
+
+# Seconds between checks for files due to be exported, where Blender has application timers
+CHECK_INTERVAL = 0.25
+
+
+# Exports in progress, background exports paused between steps included. They share the
+# profiler and other module state, so watched files wait until none is running.
+_runningExports = set()
+
+
+def exportStarted(exporter):
+    _runningExports.add(exporter)
+
+
+def exportEnded(exporter):
+    _runningExports.discard(exporter)
+
+
+def isExportRunning():
+    return len(_runningExports) > 0
+
+
+class WatchTarget(object):
+    """A watched file and how to export it again"""
+
+    def __init__(self, filepath, operatorId, options, dependencies, watchesNewObjects, delay):
+        self.filepath = filepath
+        self.operatorId = operatorId
+        self.options = options
+        self.dependencies = frozenset(dependencies)
+        self.watchesNewObjects = watchesNewObjects
+        self.delay = delay
+
+        # Time of the last change not exported yet
+        self.changedAt = None
+
+
+class ExportWatcher(object):
+
+    def __init__(self):
+        self.targets = OrderedDict()
+        self._exporting = False
+
+    def watch(self, filepath, operatorId, options, dependencies, watchesNewObjects, delay):
+        """Starts watching a file, or updates what it depends on after it was exported again"""
+        self.targets[filepath] = WatchTarget(filepath, operatorId, options, dependencies, watchesNewObjects, delay)
+
+    def unwatch(self, filepath):
+        self.targets.pop(filepath, None)
+
+    def clear(self):
+        self.targets.clear()
+
+    def markChanged(self, names):
+        """Flags files depending on any of the changed datablock names"""
+        # Exports create and delete temporary datablocks, which aren't edits
+        if self._exporting:
+            return
+
+        now = time.monotonic()
+        for target in self.targets.values():
+            if not target.dependencies.isdisjoint(names):
+                target.changedAt = now
+            elif target.watchesNewObjects and any(name in bpy.data.objects for name in names - target.dependencies):
+                target.changedAt = now
+
+    def exportDueTargets(self, force=False):
+        """
+        Exports changed files that had no changes for their delay, or all changed files if 'force' is set.
+        While another export runs they stay flagged, and are exported on a later check.
+        """
+        if self._exporting or isExportRunning():
+            return
+
+        now = time.monotonic()
+        for target in list(self.targets.values()):
+            if target.changedAt is None or (not force and now - target.changedAt < target.delay):
+                continue
+
+            target.changedAt = None
+            self.exportTarget(target)
+
+    def exportTarget(self, target):
+        Util.info("Exporting changed file {!s}", target.filepath)
+
+        category, name = target.operatorId.split(".")
+        self._exporting = True
+        try:
+            getattr(getattr(bpy.ops, category), name)(**target.options)
+        except Exception as exportError:
+            Util.error("Watch mode couldn't export {!s}: {!r}", target.filepath, exportError)
+        finally:
+            self._exporting = False
+
+
+WATCHER = ExportWatcher()
+
+
+@bpy.app.handlers.persistent
+def _onDataChange(scene, depsgraph=None):
+    if len(WATCHER.targets) == 0:
+        return
+
+    changedNames = export_cache.changedDatablockNames(scene, depsgraph)
+    if len(changedNames) > 0:
+        WATCHER.markChanged(changedNames)
+
+    # Blender 2.7x has no application timers, but calls this handler all the time
+    if not hasattr(bpy.app, "timers"):
+        WATCHER.exportDueTargets()
+
+
+@bpy.app.handlers.persistent
+def _onSave(*args):
+    WATCHER.exportDueTargets(force=True)
+
+
+@bpy.app.handlers.persistent
+def _onLoad(*args):
+    """Watched files belong to the .blend file that was open"""
+    WATCHER.clear()
+
+
+def _checkTargets():
+    WATCHER.exportDueTargets()
+    return CHECK_INTERVAL
+
+
+def _handlerLists():
+    handlers = bpy.app.handlers
+    updateHandlers = handlers.depsgraph_update_post if hasattr(handlers, "depsgraph_update_post") else handlers.scene_update_post
+    return [(updateHandlers, _onDataChange), (handlers.save_post, _onSave), (handlers.load_post, _onLoad)]
+
+
+def registerHandlers():
+    for handlerList, handler in _handlerLists():
+        if handler not in handlerList:
+            handlerList.append(handler)
+
+    if hasattr(bpy.app, "timers") and not bpy.app.timers.is_registered(_checkTargets):
+        bpy.app.timers.register(_checkTargets, first_interval=CHECK_INTERVAL, persistent=True)
+
+
+def unregisterHandlers():
+    for handlerList, handler in _handlerLists():
+        if handler in handlerList:
+            handlerList.remove(handler)
+
+    if hasattr(bpy.app, "timers") and bpy.app.timers.is_registered(_checkTargets):
+        bpy.app.timers.unregister(_checkTargets)
+
+    WATCHER.clear()
@@ -0,0 +1,53 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Stand-in for Blender's 'bmesh' module. Benchmark scenes are generated
+already triangulated, so triangulation keeps the mesh as it is.
+"""
+
+
+class BMesh(object):
+
+    def __init__(self):
+        self.mesh = None
+        self.faces = []
+
+    def from_mesh(self, mesh):
+        self.mesh = mesh
+        self.faces = list(mesh.polygons)
+
+    def to_mesh(self, mesh):
+        pass
+
+    def free(self):
+        self.mesh = None
+        self.faces = []
+
+
+class _Ops(object):
+
+    def triangulate(self, bm, faces=None, quad_method=0, ngon_method=0):
+        return {"faces": faces}
+
+
+def new():
+    return BMesh()
+
+
+ops = _Ops()
@@ -0,0 +1,136 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Headless stand-in for Blender's 'bpy' module, just enough to run the
+exporter outside of Blender. Scenes are built with the 'scenes' module of
+the benchmark package.
+"""
+
+import os
+import sys
+
+from . import props, types
+
+
+class _Data(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.objects = types.Collection()
+        self.meshes = types.Collection()
+        self.materials = types.Collection()
+        self.armatures = types.Collection()
+        self.actions = types.Collection()
+        self.scenes = types.Collection()
+        self.filepath = ""
+
+
+class _ObjectOps(object):
+
+    def mode_set(self, mode='OBJECT'):
+        return {'FINISHED'}
+
+
+class _OperatorCategory(object):
+    pass
+
+
+class _Ops(object):
+
+    def __init__(self):
+        self.object = _ObjectOps()
+
+    def _register(self, operatorClass):
+        """Makes a registered operator callable as bpy.ops.<category>.<name>(**properties)"""
+        categoryName, name = operatorClass.bl_idname.split(".")
+        if not hasattr(self, categoryName):
+            setattr(self, categoryName, _OperatorCategory())
+
+        def callOperator(**properties):
+            operator = operatorClass()
+            for key, value in properties.items():
+                setattr(operator, key, value)
+            return operator.execute(context)
+
+        setattr(getattr(self, categoryName), name, callOperator)
+
+
+class _Path(object):
+
+    def abspath(self, path):
+        if path.startswith("//"):
+            return os.path.join(os.path.dirname(data.filepath), path[2:])
+        return path
+
+    def basename(self, path):
+        return os.path.basename(path[2:] if path.startswith("//") else path)
+
+
+class _Utils(object):
+
+    def register_module(self, module):
+        for moduleName, moduleObject in list(sys.modules.items()):
+            if moduleObject is not None and (moduleName == module or moduleName.startswith(module + ".")):
+                for value in list(vars(moduleObject).values()):
+                    if isinstance(value, type) and issubclass(value, types.Operator) and "." in value.bl_idname:
+                        self.register_class(value)
+
+    def unregister_module(self, module):
+        pass
+
+    def register_class(self, cls):
+        if issubclass(cls, types.Operator):
+            ops._register(cls)
+
+    def unregister_class(self, cls):
+        pass
+
+
+class _Handlers(object):
+
+    def __init__(self):
+        self.save_post = []
+        self.load_post = []
+        self.undo_post = []
+        self.redo_post = []
+        self.scene_update_post = []
+
+    @staticmethod
+    def persistent(function):
+        """Keeps a handler registered when a file is loaded"""
+        function._bpy_persistent = True
+        return function
+
+
+class _App(object):
+
+    def __init__(self):
+        self.version = (2, 76, 0)
+        self.background = True
+        self.handlers = _Handlers()
+
+
+data = _Data()
+ops = _Ops()
+path = _Path()
+utils = _Utils()
+app = _App()
+context = None
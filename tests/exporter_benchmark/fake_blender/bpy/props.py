@@ -0,0 +1,48 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Property definitions evaluate to their default value, so operator classes
+can be instantiated directly and read their options as plain attributes.
+"""
+
+
+def _property(default=None, **kwargs):
+    return default
+
+
+def BoolProperty(default=False, **kwargs):
+    return _property(default)
+
+
+def IntProperty(default=0, **kwargs):
+    return _property(default)
+
+
+def FloatProperty(default=0.0, **kwargs):
+    return _property(default)
+
+
+def StringProperty(default="", **kwargs):
+    return _property(default)
+
+
+def EnumProperty(default=None, items=(), **kwargs):
+    if default is None and len(items) > 0:
+        default = items[0][0]
+    return _property(default)
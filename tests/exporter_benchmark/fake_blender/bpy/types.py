@@ -0,0 +1,454 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Blender data types used by the exporter, reduced to the attributes and
+methods it actually touches.
+"""
+
+import mathutils
+
+
+class Operator(object):
+    bl_idname = ""
+    bl_label = ""
+    bl_options = set()
+
+    def report(self, level, message):
+        print("[%s] %s" % ("|".join(sorted(level)), message))
+
+
+class _Menu(object):
+
+    def __init__(self):
+        self.functions = []
+
+    def append(self, function):
+        self.functions.append(function)
+
+    def remove(self, function):
+        self.functions.remove(function)
+
+
+INFO_MT_file_export = _Menu()
+
+
+class Collection(list):
+    """bpy_prop_collection look-alike: a list that can also be searched by name"""
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for item in self:
+                if item.name == key:
+                    return item
+            raise KeyError("bpy_prop_collection[key]: key \"%s\" not found" % key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return any(element.name == item for element in self)
+        return super().__contains__(item)
+
+    def remove(self, item):
+        for index in range(len(self)):
+            if super().__getitem__(index) is item:
+                del self[index]
+                return
+
+    def foreach_get(self, attribute, sequence):
+        """Copies an attribute of every item into a flat sequence"""
+        position = 0
+        for item in self:
+            value = getattr(item, attribute)
+            for component in (value if hasattr(value, "__iter__") else (value,)):
+                sequence[position] = component
+                position += 1
+
+
+class MeshVertex(object):
+
+    def __init__(self, index, co, normal):
+        self.index = index
+        self.co = mathutils.Vector(co)
+        self.normal = mathutils.Vector(normal)
+        self.groups = []
+
+
+class VertexGroupElement(object):
+
+    def __init__(self, group, weight):
+        self.group = group
+        self.weight = weight
+
+
+class MeshLoop(object):
+
+    def __init__(self, index, vertexIndex, normal):
+        self.index = index
+        self.vertex_index = vertexIndex
+        self.normal = mathutils.Vector(normal)
+        self.tangent = mathutils.Vector((0.0, 0.0, 0.0))
+        self.bitangent = mathutils.Vector((0.0, 0.0, 0.0))
+
+
+class MeshPolygon(object):
+
+    def __init__(self, index, loopStart, loopTotal, materialIndex, normal, useSmooth=True):
+        self.index = index
+        self.loop_start = loopStart
+        self.loop_total = loopTotal
+        self.material_index = materialIndex
+        self.normal = mathutils.Vector(normal)
+        self.use_smooth = useSmooth
+
+    @property
+    def loop_indices(self):
+        return range(self.loop_start, self.loop_start + self.loop_total)
+
+
+class MeshUVLoop(object):
+
+    def __init__(self, uv):
+        self.uv = mathutils.Vector(uv)
+
+
+class MeshUVLoopLayer(object):
+
+    def __init__(self, name, uvs):
+        self.name = name
+        self.data = Collection(MeshUVLoop(uv) for uv in uvs)
+
+
+class MeshLoopColor(object):
+
+    def __init__(self, color):
+        self.color = mathutils.Vector(color)
+
+
+class MeshLoopColorLayer(object):
+
+    def __init__(self, name, colors):
+        self.name = name
+        self.data = Collection(MeshLoopColor(color) for color in colors)
+
+
+class LoopColors(Collection):
+
+    @property
+    def active(self):
+        return self[0] if len(self) > 0 else None
+
+
+class Mesh(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.users = 1
+        self.vertices = Collection()
+        self.loops = Collection()
+        self.polygons = Collection()
+        self.uv_layers = Collection()
+        self.vertex_colors = LoopColors()
+        self.materials = []
+        self.shape_keys = None
+
+    def copy(self, name=None):
+        clone = Mesh(name or self.name)
+        clone.vertices = self.vertices
+        clone.polygons = self.polygons
+        clone.uv_layers = self.uv_layers
+        clone.vertex_colors = self.vertex_colors
+        clone.materials = list(self.materials)
+
+        # Loops get tangents written into them, so those are not shared
+        clone.loops = Collection(MeshLoop(loop.index, loop.vertex_index, loop.normal) for loop in self.loops)
+        return clone
+
+    def calc_tangents(self, uvmap=""):
+        for loop in self.loops:
+            normal = loop.normal
+            tangent = mathutils.Vector((1.0, 0.0, 0.0))
+            if abs(normal.dot(tangent)) > 0.9:
+                tangent = mathutils.Vector((0.0, 1.0, 0.0))
+            tangent = (tangent - normal * normal.dot(tangent)).normalized()
+            loop.tangent = tangent
+            loop.bitangent = normal.cross(tangent)
+
+    def free_tangents(self):
+        pass
+
+
+class VertexGroup(object):
+
+    def __init__(self, name, index, owner=None):
+        self.name = name
+        self.index = index
+        self.owner = owner
+        self.weights = {}
+
+    def add(self, indices, weight, mode='REPLACE'):
+        for vertexIndex in indices:
+            self.weights[vertexIndex] = weight
+
+            # Blender stores the weights in the mesh vertices too
+            if self.owner is not None:
+                groups = self.owner.data.vertices[vertexIndex].groups
+                groups[:] = [element for element in groups if element.group != self.index]
+                groups.append(VertexGroupElement(self.index, weight))
+
+    def weight(self, vertexIndex):
+        try:
+            return self.weights[vertexIndex]
+        except KeyError:
+            raise RuntimeError("Error: Vertex not in group")
+
+
+class VertexGroups(Collection):
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+
+    def new(self, name="Group"):
+        vertexGroup = VertexGroup(name, len(self), self.owner)
+        self.append(vertexGroup)
+        return vertexGroup
+
+
+class Bone(object):
+
+    def __init__(self, name, parent=None, matrixLocal=None):
+        self.name = name
+        self.parent = parent
+        self.children = Collection()
+        self.matrix_local = matrixLocal if matrixLocal is not None else mathutils.Matrix()
+        if parent is not None:
+            parent.children.append(self)
+
+
+class Armature(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.users = 1
+        self.bones = Collection()
+
+
+class Image(object):
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+
+class Texture(object):
+    type = 'NONE'
+
+
+class ImageTexture(Texture):
+    type = 'IMAGE'
+
+    def __init__(self, name, filepath):
+        self.name = name
+        self.image = Image(filepath)
+        self.use_normal_map = False
+
+
+class MaterialTextureSlot(object):
+
+    def __init__(self, texture, uvLayer=""):
+        self.name = texture.name
+        self.texture = texture
+        self.texture_coords = 'UV'
+        self.uv_layer = uvLayer
+        self.use_map_color_diffuse = True
+        self.use_map_normal = False
+        self.use_map_ambient = False
+        self.use_map_emit = False
+        self.use_map_diffuse = False
+        self.use_map_alpha = False
+        self.use_map_color_spec = False
+        self.use_map_specular = False
+
+
+class Material(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.users = 1
+        self.type = 'SURFACE'
+        self.specular_shader = 'COOKTORR'
+        self.diffuse_color = mathutils.Vector((0.8, 0.8, 0.8))
+        self.diffuse_intensity = 0.8
+        self.specular_color = mathutils.Vector((1.0, 1.0, 1.0))
+        self.specular_intensity = 0.5
+        self.specular_alpha = 1.0
+        self.specular_hardness = 50
+        self.mirror_color = mathutils.Vector((1.0, 1.0, 1.0))
+        self.use_transparency = False
+        self.alpha = 1.0
+        self.use_vertex_color_paint = False
+        self.use_vertex_color_light = False
+        self.texture_slots = [None] * 18
+
+
+class FCurveKeyframe(object):
+
+    def __init__(self, frame, value, interpolation='LINEAR'):
+        self.co = mathutils.Vector((frame, value))
+        self.handle_left = mathutils.Vector((frame, value))
+        self.handle_right = mathutils.Vector((frame, value))
+        self.interpolation = interpolation
+
+
+class FCurve(object):
+
+    def __init__(self, dataPath, arrayIndex):
+        self.data_path = dataPath
+        self.array_index = arrayIndex
+        self.extrapolation = 'CONSTANT'
+        self.keyframe_points = []
+        self.modifiers = []
+
+    def evaluate(self, frame):
+        """Interpolates linearly between keyframes, CONSTANT holds the previous value"""
+        points = self.keyframe_points
+        if len(points) == 0:
+            return 0.0
+        if frame <= points[0].co[0]:
+            return points[0].co[1]
+
+        for index in range(1, len(points)):
+            previous = points[index - 1]
+            current = points[index]
+            if frame <= current.co[0]:
+                if previous.interpolation == 'CONSTANT' and frame < current.co[0]:
+                    return previous.co[1]
+                factor = (frame - previous.co[0]) / (current.co[0] - previous.co[0])
+                return previous.co[1] + (current.co[1] - previous.co[1]) * factor
+
+        return points[-1].co[1]
+
+
+class Action(object):
+
+    def __init__(self, name, frameRange):
+        self.name = name
+        self.users = 1
+        self.frame_range = mathutils.Vector(frameRange)
+        self.fcurves = []
+
+
+class AnimData(object):
+
+    def __init__(self, action=None):
+        self.action = action
+
+
+class Modifier(object):
+
+    def __init__(self, name, modifierType):
+        self.name = name
+        self.type = modifierType
+        self.show_viewport = True
+        self.show_render = True
+
+
+class Object(object):
+
+    def __init__(self, name, data=None, objectType='MESH'):
+        self.name = name
+        self.type = objectType
+        self.data = data
+        self.users = 1
+        self.select = True
+        self.hide = False
+        self.parent = None
+        self.children = Collection()
+        self.vertex_groups = VertexGroups(self)
+        self.modifiers = Collection()
+        self.animation_data = None
+        self.matrix_world = mathutils.Matrix()
+        self.matrix_local = mathutils.Matrix()
+
+    def setParent(self, parent):
+        self.parent = parent
+        parent.children.append(self)
+        self.matrix_world = parent.matrix_world * self.matrix_local
+
+    def copy(self):
+        clone = Object(self.name + ".001", self.data, self.type)
+        clone.select = self.select
+        clone.parent = self.parent
+        clone.vertex_groups = self.vertex_groups
+        clone.modifiers = self.modifiers
+        clone.animation_data = self.animation_data
+        clone.matrix_world = self.matrix_world
+        clone.matrix_local = self.matrix_local
+        return clone
+
+    def find_armature(self):
+        if self.parent is not None and self.parent.type == 'ARMATURE':
+            return self.parent
+        return None
+
+    def to_mesh(self, scene, apply_modifiers, settings, calc_tessface=True, calc_undeformed=False):
+        # Imported here to avoid a circular import with the bpy package
+        import bpy
+        mesh = self.data.copy(self.data.name + ".001")
+        bpy.data.meshes.append(mesh)
+        return mesh
+
+
+class World(object):
+
+    def __init__(self):
+        self.ambient_color = mathutils.Vector((0.05, 0.05, 0.05))
+
+
+class RenderSettings(object):
+
+    def __init__(self):
+        self.fps = 30
+
+
+class Scene(object):
+
+    def __init__(self, name="Scene"):
+        self.name = name
+        self.render = RenderSettings()
+        self.world = World()
+        self.frame_start = 1
+        self.frame_end = 250
+        self.objects = Collection()
+
+
+class Context(object):
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.window_manager = None
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.scene.objects if obj.select]
@@ -0,0 +1,38 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+import os
+
+
+class ExportHelper(object):
+    filepath = ""
+    check_existing = True
+    filename_ext = ""
+
+    def invoke(self, context, event):
+        return {'RUNNING_MODAL'}
+
+
+def orientation_helper_factory(name, axis_forward='Y', axis_up='Z'):
+    return type(name, (object,), {"axis_forward": axis_forward, "axis_up": axis_up})
+
+
+def path_reference(filepath, base_src, base_dst, mode='AUTO', copy_subdir="", copy_set=None, library=None):
+    if mode == 'RELATIVE' and filepath.startswith("//"):
+        return filepath[2:]
+    return os.path.basename(filepath) if mode == 'STRIP' else filepath
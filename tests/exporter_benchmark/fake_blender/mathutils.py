@@ -0,0 +1,242 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Minimal pure Python stand-in for Blender's 'mathutils' module.
+
+Only implements what the exporter uses, following the Blender 2.7x API
+where '*' is the matrix product.
+"""
+
+import math
+
+
+class Vector(list):
+
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        super().__init__(float(v) for v in values)
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector(a * other for a in self)
+        return self.dot(other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vector(-a for a in self)
+
+    def dot(self, other):
+        return sum(a * b for a, b in zip(self, other))
+
+    def cross(self, other):
+        return Vector((self[1] * other[2] - self[2] * other[1],
+                       self[2] * other[0] - self[0] * other[2],
+                       self[0] * other[1] - self[1] * other[0]))
+
+    @property
+    def length(self):
+        return math.sqrt(self.dot(self))
+
+    def normalized(self):
+        length = self.length
+        if length == 0.0:
+            return Vector(self)
+        return Vector(a / length for a in self)
+
+    def copy(self):
+        return Vector(self)
+
+    @property
+    def x(self):
+        return self[0]
+
+    @property
+    def y(self):
+        return self[1]
+
+    @property
+    def z(self):
+        return self[2]
+
+
+class Quaternion(list):
+    """Quaternion stored as [w, x, y, z] like Blender"""
+
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0)):
+        super().__init__(float(v) for v in values)
+
+    def normalized(self):
+        length = math.sqrt(sum(a * a for a in self))
+        if length == 0.0:
+            return Quaternion(self)
+        return Quaternion(a / length for a in self)
+
+    def to_matrix(self):
+        w, x, y, z = self
+        return Matrix(((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - z * w), 2.0 * (x * z + y * w)),
+                       (2.0 * (x * y + z * w), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - x * w)),
+                       (2.0 * (x * z - y * w), 2.0 * (y * z + x * w), 1.0 - 2.0 * (x * x + y * y))))
+
+    @property
+    def w(self):
+        return self[0]
+
+
+class Matrix(object):
+    """Row major square matrix"""
+
+    def __init__(self, rows=((1.0, 0.0, 0.0, 0.0), (0.0, 1.0, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))):
+        self._rows = [[float(v) for v in row] for row in rows]
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[1.0 if row == col else 0.0 for col in range(size)] for row in range(size)])
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = cls.Identity(4)
+        for axis in range(3):
+            matrix[axis][3] = vector[axis]
+        return matrix
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        return self._rows[index]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __repr__(self):
+        return "Matrix(%r)" % (self._rows,)
+
+    def __add__(self, other):
+        return Matrix([[a + b for a, b in zip(rowA, rowB)] for rowA, rowB in zip(self._rows, other)])
+
+    def __mul__(self, other):
+        size = len(self._rows)
+        if isinstance(other, Matrix):
+            return Matrix([[sum(self._rows[row][k] * other[k][col] for k in range(size))
+                            for col in range(size)] for row in range(size)])
+
+        # Matrix * Vector. A 4x4 matrix transforms 3D points like Blender does
+        values = list(other)
+        if size == 4 and len(values) == 3:
+            values.append(1.0)
+            return Vector(sum(self._rows[row][k] * values[k] for k in range(4)) for row in range(3))
+        return Vector(sum(self._rows[row][k] * values[k] for k in range(size)) for row in range(size))
+
+    def copy(self):
+        return Matrix(self._rows)
+
+    def transposed(self):
+        size = len(self._rows)
+        return Matrix([[self._rows[col][row] for col in range(size)] for row in range(size)])
+
+    def to_3x3(self):
+        return Matrix([row[:3] for row in self._rows[:3]])
+
+    def to_4x4(self):
+        if len(self._rows) == 4:
+            return self.copy()
+        rows = [row[:] + [0.0] for row in self._rows]
+        rows.append([0.0, 0.0, 0.0, 1.0])
+        return Matrix(rows)
+
+    def to_translation(self):
+        return Vector((self._rows[0][3], self._rows[1][3], self._rows[2][3]))
+
+    def determinant(self):
+        m = self.to_3x3()
+        return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+                - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+                + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+    def inverted(self):
+        """Gauss-Jordan inversion"""
+        size = len(self._rows)
+        work = [row[:] + [1.0 if rowIndex == col else 0.0 for col in range(size)]
+                for rowIndex, row in enumerate(self._rows)]
+
+        for col in range(size):
+            pivot = max(range(col, size), key=lambda r: abs(work[r][col]))
+            if abs(work[pivot][col]) < 1e-12:
+                raise ValueError("Matrix is not invertible")
+            work[col], work[pivot] = work[pivot], work[col]
+
+            pivotValue = work[col][col]
+            work[col] = [v / pivotValue for v in work[col]]
+
+            for row in range(size):
+                if row != col and work[row][col] != 0.0:
+                    factor = work[row][col]
+                    work[row] = [a - factor * b for a, b in zip(work[row], work[col])]
+
+        return Matrix([row[size:] for row in work])
+
+    def decompose(self):
+        """Returns location, rotation and scale like Blender's Matrix.decompose()"""
+        location = self.to_translation()
+
+        columns = [[self._rows[row][col] for row in range(3)] for col in range(3)]
+        scale = [math.sqrt(sum(v * v for v in column)) for column in columns]
+        if self.determinant() < 0.0:
+            scale = [-s for s in scale]
+
+        rot = [[columns[col][row] / scale[col] if scale[col] != 0.0 else 0.0 for col in range(3)] for row in range(3)]
+
+        return location, _matrixToQuaternion(rot), Vector(scale)
+
+
+def _matrixToQuaternion(m):
+    trace = m[0][0] + m[1][1] + m[2][2]
+
+    if trace > 0.0:
+        s = 0.5 / math.sqrt(trace + 1.0)
+        w = 0.25 / s
+        x = (m[2][1] - m[1][2]) * s
+        y = (m[0][2] - m[2][0]) * s
+        z = (m[1][0] - m[0][1]) * s
+    elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[0][0] - m[1][1] - m[2][2])
+        w = (m[2][1] - m[1][2]) / s
+        x = 0.25 * s
+        y = (m[0][1] + m[1][0]) / s
+        z = (m[0][2] + m[2][0]) / s
+    elif m[1][1] > m[2][2]:
+        s = 2.0 * math.sqrt(1.0 + m[1][1] - m[0][0] - m[2][2])
+        w = (m[0][2] - m[2][0]) / s
+        x = (m[0][1] + m[1][0]) / s
+        y = 0.25 * s
+        z = (m[1][2] + m[2][1]) / s
+    else:
+        s = 2.0 * math.sqrt(1.0 + m[2][2] - m[0][0] - m[1][1])
+        w = (m[1][0] - m[0][1]) / s
+        x = (m[0][2] + m[2][0]) / s
+        y = (m[1][2] + m[2][1]) / s
+        z = 0.25 * s
+
+    return Quaternion((w, x, y, z))
@@ -0,0 +1,336 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Headless benchmark of the exporter stages.
+
+Runs G3DExporter.startExport against generated scenes using the
+stand-in Blender modules in 'fake_blender', times every generate* stage and
+the file writers and compares the numbers against stored baselines.
+
+A baseline recorded on this machine with this Python is compared in seconds.
+Timings from anywhere else aren't comparable in seconds, so then each stage
+is compared by its share of the total export time instead::
+
+    python tests/exporter_benchmark/run.py
+    python tests/exporter_benchmark/run.py -p large -b tests/exporter_benchmark/baselines.json
+"""
+
+import getopt
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "fake_blender"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(BENCHMARK_DIR)))
+
+import scenes
+from io_scene_g3d import util, g3d_exporter, g3d_file_writer, g3d_operators
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baselines.json")
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_SECONDS = 0.005
+
+# Narrowest stage column of the results table
+STAGE_COLUMN = 24
+
+OPERATORS = OrderedDict([
+    ("g3dj", g3d_operators.G3DJExporterOperator),
+    ("g3db", g3d_operators.G3DBExporterOperator),
+])
+
+WRITER_METHODS = [
+    (g3d_file_writer.G3DBaseWriter, "mountJsonOutput"),
+    (g3d_file_writer.G3DJWriter, "export"),
+    (g3d_file_writer.G3DBWriter, "export"),
+]
+
+
+class StageTimer(object):
+    """Accumulates wall time of wrapped callables. Recursive calls are only counted once."""
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self._depth = {}
+
+    def wrap(self, name, function):
+        def timedFunction(*args, **kwargs):
+            depth = self._depth.get(name, 0)
+            self._depth[name] = depth + 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._depth[name] = depth
+                if depth == 0:
+                    self.timings[name] = self.timings.get(name, 0.0) + (time.perf_counter() - start)
+        return timedFunction
+
+
+def runExport(operatorClass, context, filepath):
+    """Runs one export, returning the time taken by each stage"""
+    timer = StageTimer()
+
+    operator = operatorClass()
+    operator.filepath = filepath
+    exporter = g3d_exporter.G3DExporter(operator)
+
+    for name in dir(g3d_exporter.G3DExporter):
+        if name.startswith("generate") and callable(getattr(exporter, name)):
+            setattr(exporter, name, timer.wrap(name, getattr(exporter, name)))
+
+    originals = []
+    for writerClass, methodName in WRITER_METHODS:
+        original = writerClass.__dict__[methodName]
+        originals.append((writerClass, methodName, original))
+        stageName = methodName if methodName != "export" else writerClass.__name__ + ".export"
+        setattr(writerClass, methodName, timer.wrap(stageName, original))
+
+    try:
+        start = time.perf_counter()
+        exporter.startExport(context)
+        timer.timings["total"] = time.perf_counter() - start
+    finally:
+        for writerClass, methodName, original in originals:
+            setattr(writerClass, methodName, original)
+
+    return timer.timings
+
+
+def runPreset(name, sizes, rounds, outputDir, result=None):
+    """
+    Exports a preset scene in every format 'rounds' times, keeping the best time of each stage.
+    Formats take turns, so a slow spell of the machine doesn't hit all rounds of one format.
+    Times of an earlier 'result' of the preset are kept if they are better.
+    """
+    context = scenes.buildScene(**sizes)
+    if result is None:
+        result = OrderedDict()
+        result["sizes"] = sizes
+        result["formats"] = OrderedDict()
+
+    for _ in range(rounds):
+        for formatName, operatorClass in OPERATORS.items():
+            filepath = os.path.join(outputDir, "%s.%s" % (name, formatName))
+
+            formatResult = result["formats"].get(formatName)
+            if formatResult is None:
+                formatResult = OrderedDict([("stages", OrderedDict()), ("bytes", 0)])
+                result["formats"][formatName] = formatResult
+
+            best = formatResult["stages"]
+            for stage, seconds in runExport(operatorClass, context, filepath).items():
+                if stage not in best or seconds < best[stage]:
+                    best[stage] = seconds
+            formatResult["bytes"] = os.path.getsize(filepath)
+
+    return result
+
+
+def machineId():
+    """Identifies where timings were taken, only timings from the same machine and Python compare in seconds"""
+    return "%s|%s|%s" % (platform.node(), platform.platform(), sys.version)
+
+
+def isSameMachine(baseline):
+    return baseline.get("machine") == machineId()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of (preset, format, stage, old value, new value) that got slower than allowed.
+    Values are seconds for a baseline of this machine, otherwise fractions of the total time.
+    """
+    sameMachine = isSameMachine(baseline)
+    regressions = []
+    for preset, presetResult in results["presets"].items():
+        oldPreset = baseline.get("presets", {}).get(preset)
+        if oldPreset is None or oldPreset.get("sizes") != presetResult["sizes"]:
+            continue
+
+        for formatName, formatResult in presetResult["formats"].items():
+            oldStages = oldPreset["formats"].get(formatName, {}).get("stages", {})
+            oldTotal = oldStages.get("total")
+            total = formatResult["stages"].get("total")
+            for stage, seconds in formatResult["stages"].items():
+                oldSeconds = oldStages.get(stage)
+                if oldSeconds is None or seconds < MIN_SECONDS:
+                    continue
+
+                if sameMachine:
+                    oldValue, value = oldSeconds, seconds
+                elif stage == "total" or not oldTotal or not total:
+                    continue
+                else:
+                    oldValue, value = oldSeconds / oldTotal, seconds / total
+
+                if value > oldValue * (1.0 + tolerance):
+                    regressions.append((preset, formatName, stage, oldValue, value))
+    return regressions
+
+
+def printResults(results, baseline=None):
+    stageWidth = max([STAGE_COLUMN] + [len(stage) for presetResult in results["presets"].values()
+                                       for formatResult in presetResult["formats"].values()
+                                       for stage in formatResult["stages"]])
+    rowFormat = '{:<8} {:<5} {:<%d} {:>10} {:>10} {:>9}' % stageWidth
+    print(rowFormat.format('PRESET', 'FMT', 'STAGE', 'SECONDS', 'BASELINE', 'CHANGE'))
+    for preset, presetResult in results["presets"].items():
+        oldPreset = None
+        if baseline is not None:
+            oldPreset = baseline.get("presets", {}).get(preset)
+            if oldPreset is not None and oldPreset.get("sizes") != presetResult["sizes"]:
+                oldPreset = None
+
+        for formatName, formatResult in presetResult["formats"].items():
+            oldStages = {}
+            if oldPreset is not None:
+                oldStages = oldPreset["formats"].get(formatName, {}).get("stages", {})
+
+            for stage, seconds in formatResult["stages"].items():
+                oldSeconds = oldStages.get(stage)
+                oldText = ''
+                change = ''
+                if oldSeconds is not None:
+                    oldText = '{:.4f}'.format(oldSeconds)
+                    if oldSeconds > 0:
+                        change = '{:+.1f}%'.format((seconds / oldSeconds - 1.0) * 100.0)
+                print(rowFormat.format(preset, formatName, stage, '{:.4f}'.format(seconds), oldText, change))
+            print(rowFormat.format(preset, formatName, 'bytes written', formatResult["bytes"], '', '').rstrip())
+
+
+def main():
+    """run.py - Headless benchmark of the G3D exporter stages.
+
+    Usage:
+        -h, --help              Prints this help
+        -p, --preset=           Scene preset to run (small, medium, large).
+                                May be repeated. Default: small and medium.
+        -r, --rounds=           Rounds per preset, best time is kept. Default: 3.
+        -o, --output=           Save results as JSON to this file.
+        -b, --baseline=         Compare with this results file.
+                                Default: baselines.json next to this script.
+        -t, --tolerance=        Allowed slowdown in percent before a stage is
+                                reported as a regression. Default: 50.
+        -s, --save-baseline     Write the results as the new baseline.
+
+        Custom scene (replaces presets): --meshes=N --loops=M --materials=K
+        --bones=B --actions=A --frames=F
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hp:r:o:b:t:s',
+                                   ['help', 'preset=', 'rounds=', 'output=', 'baseline=', 'tolerance=',
+                                    'save-baseline', 'meshes=', 'loops=', 'materials=', 'bones=',
+                                    'actions=', 'frames='])
+    except getopt.GetoptError:
+        print(main.__doc__)
+        sys.exit(2)
+
+    presets = []
+    custom = {}
+    rounds = 3
+    output = None
+    baselinePath = DEFAULT_BASELINE
+    tolerance = 0.5
+    saveBaseline = False
+    for key, value in opts:
+        if key in ('-h', '--help'):
+            print(main.__doc__)
+            sys.exit()
+        elif key in ('-p', '--preset'):
+            if value not in scenes.PRESETS:
+                print('Unknown preset %s' % value)
+                sys.exit(2)
+            presets.append(value)
+        elif key in ('-r', '--rounds'):
+            rounds = int(value)
+        elif key in ('-o', '--output'):
+            output = value
+        elif key in ('-b', '--baseline'):
+            baselinePath = value
+        elif key in ('-t', '--tolerance'):
+            tolerance = float(value) / 100.0
+        elif key in ('-s', '--save-baseline'):
+            saveBaseline = True
+        else:
+            custom[key[2:]] = int(value)
+
+    if custom:
+        sizes = dict(scenes.PRESETS["small"])
+        sizes.update(custom)
+        selected = OrderedDict([("custom", sizes)])
+    else:
+        selected = OrderedDict((name, scenes.PRESETS[name]) for name in (presets or ["small", "medium"]))
+
+    # Keep the exporter quiet, console output would be part of the timings
+    util.LOG_LEVEL = util._ERROR_
+
+    results = OrderedDict()
+    results["python"] = sys.version
+    results["platform"] = platform.platform()
+    results["machine"] = machineId()
+    results["presets"] = OrderedDict()
+
+    baseline = None
+    if os.path.exists(baselinePath) and not saveBaseline:
+        with open(baselinePath) as baselineFile:
+            baseline = json.load(baselineFile)
+
+    outputDir = tempfile.mkdtemp(prefix="g3d_benchmark_")
+    try:
+        for name, sizes in selected.items():
+            results["presets"][name] = runPreset(name, sizes, rounds, outputDir)
+
+        # Presets that look slower run again, a regression must show in the best times of both runs
+        if baseline is not None:
+            for name in sorted(set(regression[0] for regression in compare(results, baseline, tolerance))):
+                runPreset(name, selected[name], rounds, outputDir, results["presets"][name])
+    finally:
+        shutil.rmtree(outputDir, ignore_errors=True)
+
+    printResults(results, baseline)
+
+    if output is not None:
+        with open(output, 'w') as outputFile:
+            json.dump(results, outputFile, indent=2)
+
+    if saveBaseline:
+        with open(baselinePath, 'w') as baselineFile:
+            json.dump(results, baselineFile, indent=2)
+        print('Baseline saved to %s' % baselinePath)
+    elif baseline is not None:
+        regressions = compare(results, baseline, tolerance)
+        if isSameMachine(baseline):
+            for preset, formatName, stage, oldSeconds, seconds in regressions:
+                print('REGRESSION %s/%s %s: %.4fs -> %.4fs' % (preset, formatName, stage, oldSeconds, seconds))
+        else:
+            print('Baseline recorded on another machine or Python, stages are compared by their share of the total time')
+            for preset, formatName, stage, oldShare, share in regressions:
+                print('REGRESSION %s/%s %s: %.1f%% -> %.1f%% of the total' % (preset, formatName, stage, oldShare * 100.0, share * 100.0))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
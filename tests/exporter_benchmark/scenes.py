@@ -0,0 +1,160 @@
+#################################################################################
+# Copyright 2014 See AUTHORS file.
+#
+# Licensed under the GNU General Public License Version 3.0 (the "LICENSE");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.gnu.org/licenses/gpl-3.0.txt
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#################################################################################
+
+# <pep8 compliant>
+
+"""
+Generators of parameterized scenes for the fake 'bpy' module.
+
+A scene has N mesh objects of about M loops each, K materials shared by
+all meshes, an armature of B bones every mesh is skinned to and A actions
+of F frames animating every bone.
+"""
+
+import math
+import random
+
+import bpy
+import mathutils
+from bpy import types
+
+# Named scene sizes, used as keys of the stored baselines
+PRESETS = {
+    "small": {"meshes": 2, "loops": 1500, "materials": 2, "bones": 8, "actions": 2, "frames": 30},
+    "medium": {"meshes": 4, "loops": 6000, "materials": 3, "bones": 16, "actions": 4, "frames": 60},
+    "large": {"meshes": 8, "loops": 24000, "materials": 4, "bones": 32, "actions": 8, "frames": 120},
+}
+
+
+def buildGridMesh(name, loops, materialCount, rnd):
+    """Triangulated height field with about 'loops' loops, one band of rows per material"""
+    size = max(1, int(math.sqrt(loops / 6.0)))
+    mesh = types.Mesh(name)
+
+    for y in range(size + 1):
+        for x in range(size + 1):
+            height = rnd.uniform(-0.05, 0.05)
+            normal = mathutils.Vector((rnd.uniform(-0.1, 0.1), rnd.uniform(-0.1, 0.1), 1.0)).normalized()
+            mesh.vertices.append(types.MeshVertex(len(mesh.vertices), (x * 0.1, y * 0.1, height), normal))
+
+    uvs = []
+    for y in range(size):
+        materialIndex = (y * materialCount) // size
+        for x in range(size):
+            corner = y * (size + 1) + x
+            quad = (corner, corner + 1, corner + size + 2, corner + size + 1)
+            for triangle in ((quad[0], quad[1], quad[2]), (quad[0], quad[2], quad[3])):
+                loopStart = len(mesh.loops)
+                for vertexIndex in triangle:
+                    vertex = mesh.vertices[vertexIndex]
+                    mesh.loops.append(types.MeshLoop(len(mesh.loops), vertexIndex, vertex.normal))
+                    uvs.append((vertex.co[0] / (size * 0.1), vertex.co[1] / (size * 0.1)))
+
+                # Every eighth row is flat shaded so split normals also show up
+                mesh.polygons.append(types.MeshPolygon(len(mesh.polygons), loopStart, 3, materialIndex,
+                                                       (0.0, 0.0, 1.0), useSmooth=(y % 8 != 0)))
+
+    mesh.uv_layers.append(types.MeshUVLoopLayer("UVMap", uvs))
+    return mesh
+
+
+def buildArmature(boneCount):
+    armatureData = types.Armature("Armature")
+    bpy.data.armatures.append(armatureData)
+
+    for boneIndex in range(boneCount):
+        parent = armatureData.bones[(boneIndex - 1) // 2] if boneIndex > 0 else None
+        matrix = mathutils.Matrix.Translation((0.1 * (boneIndex % 4), 0.0, 0.1 * boneIndex))
+        armatureData.bones.append(types.Bone("Bone%03d" % boneIndex, parent, matrix))
+
+    armature = types.Object("Armature", armatureData, 'ARMATURE')
+    bpy.data.objects.append(armature)
+    return armature
+
+
+def skinMesh(meshObject, armature):
+    """Weights every vertex to two neighbour bones"""
+    bones = armature.data.bones
+    for bone in bones:
+        meshObject.vertex_groups.new(bone.name)
+
+    for vertex in meshObject.data.vertices:
+        boneIndex = int((vertex.co[0] + vertex.co[1]) * 10.0) % len(bones)
+        meshObject.vertex_groups[boneIndex].add([vertex.index], 0.7)
+        meshObject.vertex_groups[(boneIndex + 1) % len(bones)].add([vertex.index], 0.3)
+
+    meshObject.setParent(armature)
+
+
+def buildAction(name, armature, frameCount, interpolation, rnd):
+    action = types.Action(name, (1.0, float(frameCount)))
+
+    for bone in armature.data.bones:
+        for prop, size, rest in (("location", 3, 0.0), ("rotation_quaternion", 4, None)):
+            for arrayIndex in range(size):
+                fcurve = types.FCurve("pose.bones[\"%s\"].%s" % (bone.name, prop), arrayIndex)
+                for frame in range(1, frameCount + 1, 10):
+                    if rest is None:
+                        value = 1.0 if arrayIndex == 0 else rnd.uniform(-0.2, 0.2)
+                    else:
+                        value = rnd.uniform(-0.1, 0.1)
+                    fcurve.keyframe_points.append(types.FCurveKeyframe(frame, value, interpolation))
+                action.fcurves.append(fcurve)
+
+    bpy.data.actions.append(action)
+    return action
+
+
+def buildScene(meshes=2, loops=1500, materials=2, bones=8, actions=2, frames=30, seed=1):
+    """Replaces the contents of 'bpy.data' with a generated scene and returns a context for it"""
+    rnd = random.Random(seed)
+    bpy.data.reset()
+
+    scene = types.Scene()
+    bpy.data.scenes.append(scene)
+
+    blMaterials = []
+    for materialIndex in range(materials):
+        material = types.Material("Material%02d" % materialIndex)
+        material.texture_slots[0] = types.MaterialTextureSlot(
+            types.ImageTexture("Texture%02d" % materialIndex, "//texture%02d.png" % materialIndex))
+        bpy.data.materials.append(material)
+        blMaterials.append(material)
+
+    armature = buildArmature(bones) if bones > 0 else None
+    if armature is not None:
+        scene.objects.append(armature)
+
+    for meshIndex in range(meshes):
+        mesh = buildGridMesh("Mesh%03d" % meshIndex, loops, materials, rnd)
+        mesh.materials = list(blMaterials)
+        bpy.data.meshes.append(mesh)
+
+        meshObject = types.Object("Object%03d" % meshIndex, mesh, 'MESH')
+        meshObject.matrix_local = mathutils.Matrix.Translation((meshIndex * 2.0, 0.0, 0.0))
+        meshObject.matrix_world = meshObject.matrix_local
+        if armature is not None:
+            skinMesh(meshObject, armature)
+
+        bpy.data.objects.append(meshObject)
+        scene.objects.append(meshObject)
+
+    if armature is not None:
+        for actionIndex in range(actions):
+            interpolation = 'BEZIER' if actionIndex % 2 == 0 else 'LINEAR'
+            buildAction("Action%02d" % actionIndex, armature, frames, interpolation, rnd)
+
+    return types.Context(scene)